@@ -1,13 +1,25 @@
+import logging
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import APIKeyHeader
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from app.db import models, database
 from app.auth.auth_handler import SECRET_KEY, ALGORITHM
+from app.auth.user_cache import CachedUser, user_cache
+
+logger = logging.getLogger(__name__)
 
 # Dependency to extract the token from the "Authorization" header
 api_key_header = APIKeyHeader(name="Authorization", auto_error=True)
 
+# Verified identity carried by an access token; enough for role checks and ownership filters
+@dataclass(frozen=True)
+class TokenClaims:
+    id: int
+    email: str
+    role: str
+
 # Dependency that provides a database session
 def get_db():
     db = database.SessionLocal()
@@ -16,56 +28,80 @@ def get_db():
     finally:
         db.close()
 
-# Dependency to validate a JWT token and return the corresponding user
-def get_current_user(token: str = Depends(api_key_header), db: Session = Depends(get_db)):
-    # Exception raised when credentials are invalid or missing
-    credentials_exception = HTTPException(
+# Exception raised when credentials are invalid or missing
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+# Decode and verify a JWT, checking it is of the expected type ("access" or "refresh")
+def decode_token(jwt_token: str, expected_type: str = "access") -> TokenClaims:
     try:
-        # Debug print of raw Authorization header
-        print("\nRaw Authorization Header:", token)
+        # Decode JWT using secret key and algorithm
+        payload = jwt.decode(jwt_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        # Log any JWT decoding errors and raise unauthorized exception
+        logger.info("auth rejected", extra={"reason": "jwt_error", "error": str(e)})
+        raise credentials_exception()
 
-        # Ensure token starts with "Bearer " prefix
-        if not token.startswith("Bearer "):
-            print("Token missing 'Bearer ' prefix")
-            raise credentials_exception
+    # Extract email (sub), user id and role from payload
+    email = payload.get("sub")
+    user_id = payload.get("uid")
+    role = payload.get("role")
 
-        # Extract JWT from the header value
-        jwt_token = token.split(" ")[1]
+    # Validate presence of required payload fields; tokens issued before the
+    # uid claim existed are rejected and the client logs in again
+    if email is None or user_id is None or role is None:
+        logger.info("auth rejected", extra={"reason": "missing_claims"})
+        raise credentials_exception()
 
-        # Decode JWT using secret key and algorithm
-        payload = jwt.decode(jwt_token, SECRET_KEY, algorithms=[ALGORITHM])
-        print("Decoded JWT Payload:", payload)
+    if payload.get("type", "access") != expected_type:
+        logger.info("auth rejected", extra={"reason": "wrong_token_type"})
+        raise credentials_exception()
 
-        # Extract email (sub) and role from payload
-        email: str = payload.get("sub")
-        role: str = payload.get("role")
+    return TokenClaims(id=user_id, email=email, role=role)
 
-        # Log the user lookup attempt
-        print("Looking up user with email:", email)
+# Dependency returning the verified claims of the bearer token, without touching the DB
+def get_token_claims(token: str = Depends(api_key_header)) -> TokenClaims:
+    # Ensure token starts with "Bearer " prefix
+    if not token.startswith("Bearer "):
+        logger.info("auth rejected", extra={"reason": "missing_bearer_prefix"})
+        raise credentials_exception()
 
-        # Validate presence of required payload fields
-        if email is None or role is None:
-            print("Missing 'sub' or 'role' in payload")
-            raise credentials_exception
+    # Extract JWT from the header value
+    return decode_token(token.split(" ")[1])
 
-    except JWTError as e:
-        # Log any JWT decoding errors and raise unauthorized exception
-        print("JWT Decode Error:", str(e))
-        raise credentials_exception
+# Dependency factory authorizing from token claims alone, e.g.
+# `current_user: TokenClaims = Depends(require_role("Admin"))`
+def require_role(*roles: str, detail: str = "You do not have permission to perform this action."):
+    def role_checker(claims: TokenClaims = Depends(get_token_claims)) -> TokenClaims:
+        if claims.role not in roles:
+            raise HTTPException(status_code=403, detail=detail)
+        return claims
+    return role_checker
+
+# Dependency to validate a JWT token and return the corresponding user.
+# Returns a CachedUser snapshot (id, email, role, full_name); load the models.User
+# row explicitly in handlers that need relationships or need to modify the user.
+def get_current_user(claims: TokenClaims = Depends(get_token_claims), db: Session = Depends(get_db)):
+    # Serve recently authenticated users from the cache to skip the DB round trip
+    cached = user_cache.get(claims.email)
+    if cached is not None:
+        return cached
 
     # Query database for user by email
-    user = db.query(models.User).filter(models.User.email == email).first()
+    db_user = db.query(models.User).filter(models.User.email == claims.email).first()
 
     # Raise exception if user not found
-    if user is None:
-        print("No user found in DB with email:", email)
-        raise credentials_exception
+    if db_user is None:
+        logger.info("auth rejected", extra={"reason": "unknown_user", "user_id": claims.id})
+        raise credentials_exception()
+
+    user = CachedUser.from_model(db_user)
+    user_cache.set(claims.email, user)
 
-    # Successfully authenticated user
-    print("Authenticated User:", user.email)
+    # Successfully authenticated user (sampled: this fires on every request)
+    logger.debug("authenticated", extra={"user_id": user.id, "role": user.role})
     return user
@@ -1,14 +1,39 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from passlib.context import CryptContext
 from jose import jwt
 from datetime import datetime, timedelta
 
+# bcrypt cost factor; raising it upgrades existing hashes transparently on next login
+BCRYPT_ROUNDS = int(os.getenv("BOOKTABLE_BCRYPT_ROUNDS", "12"))
+
+# Processes dedicated to password hashing, so bcrypt never runs on request threads
+# (defaults to half the CPUs so hashing cannot take every core from request handling)
+PASSWORD_HASH_WORKERS = int(os.getenv("BOOKTABLE_PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Hashing jobs allowed in flight (running + queued) before new ones are rejected
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("BOOKTABLE_PASSWORD_HASH_MAX_PENDING", "16"))
+
 # Password hashing context using bcrypt algorithm
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 # Constants for JWT encoding/decoding
 SECRET_KEY = "secret_booktable"  # Ensure this is consistent across auth-related files
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+# Access tokens are authorized from their claims alone, so their lifetime bounds how long
+# a role change or deletion takes to apply; refresh tokens re-check the user in the DB
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+
+_hash_pool = None
+_pending_hash_jobs = 0
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the password hashing pool already has too much queued work."""
+
 
 # Hash a plaintext password using bcrypt
 def hash_password(password: str) -> str:
@@ -18,6 +43,45 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# Verify a password and return a new hash if the stored one uses outdated settings
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    if _hash_pool is None:
+        # spawn avoids forking a process that already runs server and logging threads
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_pool
+
+async def _run_in_hash_pool(func, *args):
+    global _pending_hash_jobs
+    if _pending_hash_jobs >= PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHashingBusy()
+
+    _pending_hash_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_pool(), func, *args)
+    finally:
+        _pending_hash_jobs -= 1
+
+# Async variants used by request handlers; raise PasswordHashingBusy under overload
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hash_pool(hash_password, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    return await _run_in_hash_pool(verify_and_update_password, plain_password, hashed_password)
+
+def shutdown_hash_pool():
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
 # Create a JWT access token with an expiration time
 def create_access_token(data: dict, expires_delta: timedelta = None):
     # Copy the data to be encoded in the token
@@ -25,7 +89,23 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     
     # Set token expiration; use default if not provided
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "access"})
 
     # Encode the token using the secret key and algorithm
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+# Create a long-lived JWT refresh token, only accepted by /users/refresh
+def create_refresh_token(data: dict, expires_delta: timedelta = None):
+    to_encode = data.copy()
+    expire = datetime.utcnow() + (expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+    to_encode.update({"exp": expire, "type": "refresh"})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+# Issue an access/refresh token pair carrying the user's id and role
+def create_token_pair(user_id: int, email: str, role: str) -> dict:
+    claims = {"sub": email, "uid": user_id, "role": role}
+    return {
+        "access_token": create_access_token(data=claims),
+        "refresh_token": create_refresh_token(data=claims),
+        "token_type": "bearer"
+    }
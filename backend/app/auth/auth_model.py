@@ -26,4 +26,8 @@ class UserCreate(BaseModel):
 # Schema for user login
 class UserLogin(BaseModel):
     email: EmailStr  
-    password: str   
+    password: str
+
+# Schema for exchanging a refresh token for a new access token
+class TokenRefresh(BaseModel):
+    refresh_token: str
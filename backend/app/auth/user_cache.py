@@ -0,0 +1,162 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+
+from app.db import models
+from app.db.database import SessionLocal
+
+# How long an authenticated user snapshot may be served without hitting the DB
+USER_CACHE_TTL_SECONDS = float(os.getenv("BOOKTABLE_USER_CACHE_TTL", "60"))
+
+# Maximum number of users kept per worker
+USER_CACHE_MAX_ENTRIES = int(os.getenv("BOOKTABLE_USER_CACHE_SIZE", "10000"))
+
+# Optional shared store so all workers see the same entries and invalidations,
+# e.g. redis://localhost:6379/0 (requires the `redis` package)
+USER_CACHE_URL = os.getenv("BOOKTABLE_USER_CACHE_URL")
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Lightweight stand-in for models.User carrying the fields request handlers read."""
+    id: int
+    email: str
+    role: str
+    full_name: Optional[str] = None
+
+    @classmethod
+    def from_model(cls, user: models.User) -> "CachedUser":
+        return cls(id=user.id, email=user.email, role=user.role, full_name=user.full_name)
+
+
+class LocalUserCache:
+    """Thread-safe, size-bounded LRU cache with a per-entry TTL."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key: str, user: CachedUser):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisUserCache:
+    """Shared cache backend so invalidations reach every worker."""
+
+    prefix = "booktable:user:"
+
+    def __init__(self, url: str, ttl: float):
+        import redis  # optional dependency, only needed when BOOKTABLE_USER_CACHE_URL is set
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[CachedUser]:
+        raw = self.client.get(self.prefix + key)
+        return CachedUser(**json.loads(raw)) if raw else None
+
+    def set(self, key: str, user: CachedUser):
+        self.client.set(self.prefix + key, json.dumps(asdict(user)), ex=max(1, int(self.ttl)))
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+if USER_CACHE_URL:
+    user_cache = RedisUserCache(USER_CACHE_URL, USER_CACHE_TTL_SECONDS)
+else:
+    user_cache = LocalUserCache(USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES)
+
+
+def invalidate_user(email: str):
+    """Drop a user's cached snapshot so the next request reloads it from the DB."""
+    if email:
+        user_cache.delete(email)
+
+
+def invalidate_on_commit(db, *emails: str):
+    """
+    Drop these users' cached snapshots once db's transaction ends. Invalidating
+    earlier would let a concurrent request re-cache the old row before the
+    change commits.
+    """
+    db.info.setdefault("invalidate_users", set()).update(email for email in emails if email)
+
+
+# Collect ORM changes to a user, including the old address if the email changed
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_on_change(mapper, connection, target):
+    db = object_session(target)
+    old_emails = inspect(target).attrs.email.history.deleted or ()
+    if db is None:
+        invalidate_user(target.email)
+        for old_email in old_emails:
+            invalidate_user(old_email)
+    else:
+        invalidate_on_commit(db, target.email, *old_emails)
+
+
+# Bulk UPDATE/DELETE statements on users bypass the mapper events. They name the
+# affected users with .execution_options(invalidate_users=[email, ...]); without
+# that, the whole cache is dropped
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _invalidate_on_bulk_change(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    if models.User.__mapper__ not in orm_execute_state.all_mappers:
+        return
+    emails = orm_execute_state.execution_options.get("invalidate_users")
+    if emails is None:
+        orm_execute_state.session.info["invalidate_all_users"] = True
+    else:
+        invalidate_on_commit(orm_execute_state.session, *emails)
+
+
+# Applied when the transaction ends either way: with the AUTOCOMMIT engine a
+# "rolled back" session may still have written, and an extra miss is harmless
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _apply_invalidations(session, transaction):
+    if transaction.parent is not None:
+        return
+    if session.info.pop("invalidate_all_users", False):
+        user_cache.clear()
+    for email in session.info.pop("invalidate_users", ()):
+        invalidate_user(email)
@@ -0,0 +1,69 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.migrations import register_backfill
+from app.db.table_schedules import snap_to_grid
+from app.jobs.queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+
+# Reviews written before created_at existed get the upgrade time; feeds
+# break ties on id, so their relative order is kept
+@register_backfill("reviews", "created_at")
+def backfill_review_created_at(db: Session):
+    db.execute(
+        update(models.Review)
+        .where(models.Review.created_at.is_(None))
+        .values(created_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+# Approvals submitted before submitted_at existed count as submitted at upgrade time
+@register_backfill("restaurant_approvals", "submitted_at")
+def backfill_approval_submitted_at(db: Session):
+    db.execute(
+        update(models.RestaurantApproval)
+        .where(models.RestaurantApproval.submitted_at.is_(None))
+        .values(submitted_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+# Photos uploaded before variants existed get them from the job queue
+@register_backfill("restaurant_photos", "variants")
+def backfill_photo_variants(db: Session):
+    for photo_url in db.execute(select(models.RestaurantPhoto.photo_url).distinct()).scalars():
+        enqueue(db, "photo_variants", {"photo_url": photo_url})
+    db.commit()
+
+
+# Existing reservations get a random booking_ref, generated in SQL in one statement
+@register_backfill("reservations", "booking_ref")
+def backfill_reservation_booking_ref(db: Session):
+    db.execute(
+        update(models.Reservation)
+        .where(models.Reservation.booking_ref.is_(None))
+        .values(booking_ref=func.lower(func.hex(func.randomblob(16))))
+    )
+    db.commit()
+
+
+# Tables saved before times had to be on the booking grid get them moved to
+# the next slot; availability and booking only know grid slots, so such
+# tables would otherwise never be bookable at those times
+@register_backfill("tables", "schedule_template_id")
+def backfill_table_times_to_grid(db: Session):
+    for table_id, available_times in db.query(models.Table.id, models.Table.available_times).all():
+        snapped = snap_to_grid(available_times)
+        if snapped is not None:
+            db.query(models.Table).filter(models.Table.id == table_id).update({"available_times": snapped})
+            logger.warning("table times moved onto the booking grid", extra={
+                "table_id": table_id, "available_times": available_times, "now": snapped,
+            })
+    db.commit()
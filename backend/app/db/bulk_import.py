@@ -0,0 +1,347 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import begin_atomic
+from app.db.rating_aggregates import rebuild_rating_aggregates
+from app.models_api.admin import RestaurantImport, ReviewImport
+
+# Rows validated and inserted per transaction
+IMPORT_CHUNK_SIZE = int(os.getenv("BOOKTABLE_IMPORT_CHUNK_SIZE", "500"))
+
+# Row errors listed in the report; later errors are only counted
+MAX_REPORTED_ERRORS = int(os.getenv("BOOKTABLE_IMPORT_MAX_ERRORS", "1000"))
+
+# Longest accepted line; a longer one is discarded as it arrives and its row rejected
+IMPORT_MAX_LINE_BYTES = int(os.getenv("BOOKTABLE_IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+
+IMPORT_KINDS = ("restaurants", "reviews")
+IMPORT_FORMATS = ("ndjson", "csv")
+
+
+class RowParser:
+    """
+    Incremental NDJSON/CSV parser fed one line at a time.
+
+    feed() returns (row_number, dict) once a complete record has been read,
+    (row_number, error_message) for a malformed record, or None while a
+    quoted CSV field is still spanning lines or for the CSV header.
+    """
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.header = None
+        self.pending = ""
+        self.row_number = 0
+
+    def feed(self, line: str):
+        if line is None:
+            # Over IMPORT_MAX_LINE_BYTES (see LineSplitter); a CSV record it was part of is dropped too
+            self.pending = ""
+            self.row_number += 1
+            return self.row_number, f"Line longer than {IMPORT_MAX_LINE_BYTES} bytes"
+        line = line.rstrip("\r\n")
+        if self.fmt == "ndjson":
+            if not line.strip():
+                return None
+            self.row_number += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                return self.row_number, f"Invalid JSON: {e}"
+            if not isinstance(record, dict):
+                return self.row_number, "Each line must be a JSON object"
+            return self.row_number, record
+
+        # CSV: a record continues while its quote count is odd (a newline inside a quoted field)
+        self.pending = f"{self.pending}\n{line}" if self.pending else line
+        if self.pending.count('"') % 2:
+            return None
+        text, self.pending = self.pending, ""
+        if not text.strip():
+            return None
+
+        values = next(csv.reader([text]))
+        if self.header is None:
+            self.header = [h.strip() for h in values]
+            return None
+        self.row_number += 1
+        if len(values) != len(self.header):
+            return self.row_number, f"Expected {len(self.header)} columns, got {len(values)}"
+        # Empty CSV cells mean "not provided"
+        return self.row_number, {k: (v if v != "" else None) for k, v in zip(self.header, values)}
+
+
+class LineSplitter:
+    """
+    Splits a UTF-8 byte stream, fed in arbitrary pieces, into lines.
+
+    At most max_line_bytes of a line are buffered: a longer line is
+    discarded as it arrives and yielded as None, so a body without
+    newlines cannot be held in memory whole.
+    """
+
+    def __init__(self, max_line_bytes: int = IMPORT_MAX_LINE_BYTES):
+        self.max_line_bytes = max_line_bytes
+        self._buffer = bytearray()
+        self._too_long = False
+
+    def feed(self, data: bytes) -> list:
+        lines, start = [], 0
+        while True:
+            end = data.find(b"\n", start)
+            if end < 0:
+                self._append(data[start:])
+                return lines
+            self._append(data[start:end])
+            lines.append(self._take())
+            start = end + 1
+
+    def finish(self) -> list:
+        """The last line, if the stream did not end with a newline."""
+        return [self._take()] if self._buffer or self._too_long else []
+
+    def _append(self, part: bytes):
+        if self._too_long:
+            return
+        self._buffer += part
+        if len(self._buffer) > self.max_line_bytes:
+            self._buffer.clear()
+            self._too_long = True
+
+    def _take(self):
+        # "\n" never occurs inside a multi-byte UTF-8 sequence, so each line decodes on its own
+        line = None if self._too_long else self._buffer.decode("utf-8", errors="replace")
+        self._buffer.clear()
+        self._too_long = False
+        return line
+
+
+def iter_lines(stream, max_line_bytes: int = IMPORT_MAX_LINE_BYTES, read_size: int = 64 * 1024):
+    """Lines of a binary file object, as produced by LineSplitter."""
+    splitter = LineSplitter(max_line_bytes)
+    for data in iter(lambda: stream.read(read_size), b""):
+        yield from splitter.feed(data)
+    yield from splitter.finish()
+
+
+class ImportReport:
+    """Running totals and per-row errors for one import."""
+
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def error(self, row_number: int, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def as_dict(self) -> dict:
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _validate(schema: BaseModel, chunk, report: ImportReport):
+    valid = []
+    for row_number, record in chunk:
+        if isinstance(record, str):
+            report.error(row_number, record)
+            continue
+        try:
+            valid.append((row_number, schema(**record)))
+        except ValidationError as e:
+            report.error(row_number, [
+                {"field": ".".join(str(p) for p in err["loc"]), "message": err["msg"]} for err in e.errors()
+            ])
+    return valid
+
+
+def _user_ids_by_email(db: Session, emails) -> dict:
+    if not emails:
+        return {}
+    rows = db.execute(select(models.User.email, models.User.id).where(models.User.email.in_(list(emails))))
+    return dict(rows.all())
+
+
+def _import_restaurants(db: Session, rows, report: ImportReport):
+    managers = _user_ids_by_email(db, {r.manager_email for _, r in rows if r.manager_email})
+    existing = set(db.execute(
+        select(models.Restaurant.name, models.Restaurant.zip_code).where(
+            tuple_(models.Restaurant.name, models.Restaurant.zip_code).in_(list({(r.name, r.zip_code) for _, r in rows}))
+        )
+    ).all())
+
+    to_insert = []
+    for row_number, r in rows:
+        key = (r.name, r.zip_code)
+        if key in existing:
+            report.error(row_number, "Restaurant already exists with the same name and zip code.")
+            continue
+        if r.manager_email and r.manager_email not in managers:
+            report.error(row_number, f"Unknown manager_email {r.manager_email}")
+            continue
+        existing.add(key)
+        values = r.dict(exclude={"manager_email"})
+        values.update(manager_id=managers.get(r.manager_email), total_bookings=0)
+        to_insert.append(values)
+
+    if not to_insert:
+        return
+    ids = db.execute(
+        insert(models.Restaurant).returning(models.Restaurant.id, sort_by_parameter_order=True),
+        to_insert,
+    ).scalars().all()
+    # Imported restaurants go through the normal approval queue
+    db.execute(insert(models.RestaurantApproval), [{"restaurant_id": i, "status": "pending"} for i in ids])
+    report.imported += len(ids)
+
+
+def _import_reviews(db: Session, rows, report: ImportReport):
+    users = _user_ids_by_email(db, {r.user_email for _, r in rows})
+    restaurant_ids = set(db.execute(
+        select(models.Restaurant.id).where(models.Restaurant.id.in_(list({r.restaurant_id for _, r in rows})))
+    ).scalars().all())
+    already_reviewed = set(db.execute(
+        select(models.Review.user_id, models.Review.restaurant_id).where(
+            tuple_(models.Review.user_id, models.Review.restaurant_id).in_(
+                list({(users[r.user_email], r.restaurant_id) for _, r in rows if r.user_email in users})
+            )
+        )
+    ).all())
+
+    to_insert = []
+    for row_number, r in rows:
+        user_id = users.get(r.user_email)
+        if user_id is None:
+            report.error(row_number, f"Unknown user_email {r.user_email}")
+            continue
+        if r.restaurant_id not in restaurant_ids:
+            report.error(row_number, f"Unknown restaurant_id {r.restaurant_id}")
+            continue
+        if (user_id, r.restaurant_id) in already_reviewed:
+            report.error(row_number, "This user has already reviewed this restaurant.")
+            continue
+        already_reviewed.add((user_id, r.restaurant_id))
+        to_insert.append({
+            "user_id": user_id,
+            "restaurant_id": r.restaurant_id,
+            "rating": r.rating,
+            "comment": r.comment,
+            "created_at": r.created_at or datetime.utcnow(),
+        })
+
+    if not to_insert:
+        return
+    db.execute(insert(models.Review), to_insert)
+    # Refresh aggregates only for the restaurants touched by this chunk
+    rebuild_rating_aggregates(db, list({row["restaurant_id"] for row in to_insert}))
+    report.imported += len(to_insert)
+
+
+def import_chunk(db: Session, kind: str, chunk, report: ImportReport):
+    """
+    Validate and insert one chunk of parsed rows in a single transaction.
+
+    Args:
+        db (Session): Database session.
+        kind (str): "restaurants" or "reviews".
+        chunk (list): (row_number, record) pairs from RowParser.
+        report (ImportReport): Updated with successes and row errors.
+    """
+    schema = RestaurantImport if kind == "restaurants" else ReviewImport
+    rows = _validate(schema, chunk, report)
+    if not rows:
+        return
+
+    begin_atomic(db)
+    try:
+        if kind == "restaurants":
+            _import_restaurants(db, rows, report)
+        else:
+            _import_reviews(db, rows, report)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        for row_number, _ in rows:
+            report.error(row_number, f"Chunk failed: {e}")
+    finally:
+        # Ends the transaction so the connection returns to the pool between chunks
+        db.close()
+
+
+class ChunkedRows:
+    """Parses an import line by line and hands back full chunks of rows."""
+
+    def __init__(self, fmt: str):
+        self.parser = RowParser(fmt)
+        self.report = ImportReport()
+        self.chunk = []
+
+    def add(self, line):
+        """Feed one line (None for an over-long one); returns a chunk once IMPORT_CHUNK_SIZE rows are ready."""
+        parsed = self.parser.feed(line)
+        if parsed is not None:
+            self.chunk.append(parsed)
+        if len(self.chunk) >= IMPORT_CHUNK_SIZE:
+            chunk, self.chunk = self.chunk, []
+            return chunk
+        return None
+
+    def finish(self):
+        """The last, partial chunk (possibly empty)."""
+        if self.parser.pending:
+            self.report.error(self.parser.row_number + 1, "Unterminated quoted field at end of file")
+        chunk, self.chunk = self.chunk, []
+        return chunk
+
+
+def import_lines(db: Session, kind: str, fmt: str, lines) -> dict:
+    """Import an iterable of text lines, IMPORT_CHUNK_SIZE rows per transaction."""
+    rows = ChunkedRows(fmt)
+    for line in lines:
+        chunk = rows.add(line)
+        if chunk:
+            import_chunk(db, kind, chunk, rows.report)
+    chunk = rows.finish()
+    if chunk:
+        import_chunk(db, kind, chunk, rows.report)
+    return rows.report.as_dict()
+
+
+if __name__ == "__main__":
+    # python -m app.db.bulk_import restaurants partners.csv
+    from app.db.database import SessionLocal, engine
+    from app.db.migrations import upgrade_schema
+
+    parser = argparse.ArgumentParser(description="Bulk import restaurants or reviews from NDJSON or CSV.")
+    parser.add_argument("kind", choices=IMPORT_KINDS)
+    parser.add_argument("path", help="File to import; '-' reads stdin.")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Defaults to the file extension.")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    upgrade_schema(engine)
+    db = SessionLocal()
+    try:
+        if args.path == "-":
+            result = import_lines(db, args.kind, fmt, iter_lines(sys.stdin.buffer))
+        else:
+            with open(args.path, "rb") as f:
+                result = import_lines(db, args.kind, fmt, iter_lines(f))
+    finally:
+        db.close()
+    print(json.dumps(result, indent=2))
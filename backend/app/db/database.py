@@ -1,9 +1,11 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 import os
 
-DATABASE_URL = "sqlite:///./booktable.db"
+# Overridable so the tests can run against a private in-memory database ("sqlite://")
+DATABASE_URL = os.getenv("BOOKTABLE_DATABASE_URL", "sqlite:///./booktable.db")
 
 # ✅ Add timeout and autocommit isolation level to reduce locking issues
 engine = create_engine(
@@ -12,9 +14,25 @@ engine = create_engine(
         "check_same_thread": False,
         "timeout": 30  # ⏱️ Increase wait time before throwing "database is locked"
     },
-    isolation_level="AUTOCOMMIT"  # 🔓 Reduce transaction locking
+    isolation_level="AUTOCOMMIT",  # 🔓 Reduce transaction locking
+    # An in-memory database only lives as long as its connection, so share one
+    poolclass=StaticPool if DATABASE_URL == "sqlite://" else None
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
+
+# The engine runs in AUTOCOMMIT mode, so statements commit one by one. Call this
+# first thing on a session whose reads and writes must form one transaction; the
+# connection returns to AUTOCOMMIT when the session is closed.
+def begin_atomic(db):
+    db.connection(execution_options={"isolation_level": "SERIALIZABLE"})
+
+# pysqlite's SERIALIZABLE level only defers BEGIN to the first write, leaving a
+# check-then-insert unisolated. Take the write lock up front instead, so atomic
+# sessions run one at a time and see no writes from others until they commit.
+@event.listens_for(engine, "begin")
+def _begin_immediate(conn):
+    if conn.get_execution_options().get("isolation_level") == "SERIALIZABLE":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
@@ -0,0 +1,174 @@
+import csv
+import io
+import os
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import select
+
+from app.db import models
+from app.db.database import SessionLocal
+
+# Rows fetched per query; each batch is read in its own short transaction
+EXPORT_BATCH_SIZE = int(os.getenv("BOOKTABLE_EXPORT_BATCH_SIZE", "2000"))
+
+# Rows per Parquet row group; bounds memory held by the Parquet writer
+EXPORT_PARQUET_ROW_GROUP_SIZE = int(os.getenv("BOOKTABLE_EXPORT_PARQUET_ROW_GROUP_SIZE", "100000"))
+
+EXPORT_KINDS = ("reservations", "reviews")
+EXPORT_FORMATS = ("csv", "parquet")
+
+# Exported columns per kind, with the Arrow type used for Parquet
+_COLUMNS = {
+    "reservations": [
+        ("id", "int64"),
+        ("restaurant_id", "int64"),
+        ("user_id", "int64"),
+        ("table_id", "int64"),
+        ("date", "date"),
+        ("time", "time"),
+        ("number_of_people", "int64"),
+    ],
+    "reviews": [
+        ("id", "int64"),
+        ("restaurant_id", "int64"),
+        ("user_id", "int64"),
+        ("rating", "int64"),
+        ("comment", "string"),
+        ("created_at", "timestamp"),
+    ],
+}
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency, only needed for format=parquet
+    pyarrow = None
+
+
+def parquet_available() -> bool:
+    return pyarrow is not None
+
+
+def export_query(kind: str, date_from: date = None, date_to: date = None, restaurant_id: int = None):
+    """
+    Build the SELECT for an export with its filters applied in SQL.
+
+    Reservations are filtered on their booking date, reviews on created_at;
+    both ranges are inclusive and ordered by id.
+    """
+    model = models.Reservation if kind == "reservations" else models.Review
+    query = select(*[getattr(model, name) for name, _ in _COLUMNS[kind]]).order_by(model.id)
+
+    if restaurant_id is not None:
+        query = query.where(model.restaurant_id == restaurant_id)
+    if kind == "reservations":
+        if date_from is not None:
+            query = query.where(model.date >= date_from)
+        if date_to is not None:
+            query = query.where(model.date <= date_to)
+    else:
+        if date_from is not None:
+            query = query.where(model.created_at >= datetime.combine(date_from, time.min))
+        if date_to is not None:
+            query = query.where(model.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+    return query
+
+
+def _iter_batches(query):
+    """
+    Rows of an export query (ordered by id, id first), EXPORT_BATCH_SIZE at a
+    time. Each batch is a separate keyset query in its own session, so no read
+    stays open while a batch is being sent: with SQLite's rollback journal an
+    open read holds the shared lock, and every commit would wait on a slow
+    download until it failed with "database is locked".
+    """
+    # The request's session is closed before a streamed body is sent, so the
+    # export opens its own sessions
+    id_column = query.selected_columns.id
+    last_id = None
+    while True:
+        page = query if last_id is None else query.where(id_column > last_id)
+        db = SessionLocal()
+        try:
+            batch = db.execute(page.limit(EXPORT_BATCH_SIZE)).all()
+        finally:
+            db.close()
+        if batch:
+            yield batch
+        if len(batch) < EXPORT_BATCH_SIZE:
+            return
+        last_id = batch[-1][0]
+
+
+def iter_csv(kind: str, query):
+    """Yield the export as CSV, one encoded chunk per fetched batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in _COLUMNS[kind]])
+    for batch in _iter_batches(query):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes to the caller and keeps only a running offset."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data, self.chunks = b"".join(self.chunks), []
+        return data
+
+
+def _arrow_schema(kind: str):
+    types = {
+        "int64": pyarrow.int64(),
+        "string": pyarrow.string(),
+        "date": pyarrow.date32(),
+        "time": pyarrow.time64("us"),
+        "timestamp": pyarrow.timestamp("us"),
+    }
+    return pyarrow.schema([(name, types[kind_type]) for name, kind_type in _COLUMNS[kind]])
+
+
+def iter_parquet(kind: str, query):
+    """Yield the export as a Parquet file, one row group at a time (requires pyarrow)."""
+    schema = _arrow_schema(kind)
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode="w"), schema)
+
+    def flush(rows):
+        columns = list(zip(*rows))
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema,
+        ))
+        return sink.drain()
+
+    pending = []
+    for batch in _iter_batches(query):
+        pending.extend(batch)
+        if len(pending) >= EXPORT_PARQUET_ROW_GROUP_SIZE:
+            yield flush(pending)
+            pending = []
+    if pending:
+        yield flush(pending)
+    writer.close()
+    yield sink.drain()
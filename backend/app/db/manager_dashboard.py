@@ -0,0 +1,86 @@
+from datetime import datetime
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.restaurant_images import card_images
+
+
+def approval_status():
+    """A restaurant's approval status (latest submission) as a column to select alongside Restaurant."""
+    Approval = models.RestaurantApproval
+    return (
+        select(Approval.status)
+        .where(Approval.restaurant_id == models.Restaurant.id)
+        .order_by(Approval.id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def manager_dashboard(db: Session, manager_id: int, now: datetime = None) -> list:
+    """
+    Every live restaurant of a manager with its approval status, rating,
+    today's bookings and upcoming covers.
+
+    Runs three queries however many restaurants there are: the restaurants
+    with their status (an indexed subquery per row), the reservation
+    rollups from today on grouped by restaurant, and the first photos.
+    Upcoming covers count from the start of the current hour, the rollups'
+    granularity.
+
+    Returns:
+        list[dict]: One entry per restaurant, ordered by id.
+    """
+    now = now or datetime.now()
+    today = now.date()
+    Restaurant, Rollup = models.Restaurant, models.ReservationRollup
+
+    restaurants = db.execute(
+        select(
+            Restaurant.id,
+            Restaurant.name,
+            Restaurant.cuisine,
+            Restaurant.city,
+            Restaurant.rating,
+            Restaurant.review_count,
+            approval_status().label("status"),
+        )
+        .where(Restaurant.manager_id == manager_id, Restaurant.deleted_at.is_(None))
+        .order_by(Restaurant.id)
+    ).all()
+    ids = [r.id for r in restaurants]
+
+    activity = {}
+    if ids:
+        upcoming = or_(Rollup.date > today, and_(Rollup.date == today, Rollup.hour >= now.hour))
+        rows = db.execute(
+            select(
+                Rollup.restaurant_id,
+                func.sum(case((Rollup.date == today, Rollup.reservations), else_=0)),
+                func.sum(case((upcoming, Rollup.covers), else_=0)),
+            )
+            # Served from the rollups' (restaurant_id, date, hour) primary key
+            .where(Rollup.restaurant_id.in_(ids), Rollup.date >= today)
+            .group_by(Rollup.restaurant_id)
+        )
+        activity = {restaurant_id: (bookings, covers) for restaurant_id, bookings, covers in rows}
+    images = card_images(db, ids)
+
+    results = []
+    for r in restaurants:
+        bookings_today, upcoming_covers = activity.get(r.id, (0, 0))
+        results.append({
+            "id": r.id,
+            "name": r.name,
+            "cuisine": r.cuisine,
+            "city": r.city,
+            "status": r.status or "unknown",
+            "bookings_today": bookings_today or 0,
+            "upcoming_covers": upcoming_covers or 0,
+            "rating": r.rating or 0.0,
+            "review_count": r.review_count or 0,
+            **images[r.id],
+        })
+    return results
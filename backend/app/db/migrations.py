@@ -0,0 +1,77 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from app.db.database import Base
+
+logger = logging.getLogger(__name__)
+
+# Data backfills to run once, right after the column they populate is added
+# (or, with column=None, right after the table is created).
+# Maps (table, column) -> callable taking a Session.
+_backfills = {}
+
+
+def register_backfill(table: str, column: str = None):
+    """Decorator registering a function to populate a newly added column or table."""
+    def decorator(func):
+        _backfills[(table, column)] = func
+        return func
+    return decorator
+
+
+def upgrade_schema(engine):
+    """
+    Bring an existing database up to date with the models.
+
+    create_all() only creates missing tables, so columns and indexes added to
+    existing models are applied here with ALTER TABLE / CREATE INDEX, and any
+    registered backfills are run for the columns that were just added.
+
+    Returns:
+        set: (table, column) pairs that were added; (table, None) for new tables.
+    """
+    # Imported for their side effect of registering backfills; plain column
+    # backfills first, since the aggregate rebuilds read those columns
+    from app.db import backfills  # noqa: F401
+    from app.db import rating_aggregates  # noqa: F401
+    from app.db import reservation_rollups  # noqa: F401
+
+    existing_tables = set(inspect(engine).get_table_names())
+    Base.metadata.create_all(bind=engine)
+
+    added = set()
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if existing_tables and table.name not in existing_tables:
+            added.add((table.name, None))
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+                added.add((table.name, column.name))
+                logger.info("column added", extra={"table": table.name, "column": column.name})
+
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+    if added:
+        from app.db.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            # Column backfills run before new-table backfills, which may read them
+            for key, backfill in sorted(_backfills.items(), key=lambda item: item[0][1] is None):
+                if key in added:
+                    logger.info("running backfill", extra={"table": key[0], "column": key[1]})
+                    backfill(db)
+        finally:
+            db.close()
+
+    return added
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Enum, Date, Time, ForeignKey, Text
+import uuid
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, Enum, Date, Time, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
@@ -30,12 +32,16 @@ class Restaurant(Base):
     zip_code = Column(String, nullable=False)
     rating = Column(Float, default=0.0)
     total_bookings = Column(Integer, default=0)
+    # Running review aggregates, updated together with each review insert; rating = rating_sum / review_count
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    rating_sum = Column(Integer, nullable=False, default=0, server_default="0")
     description = Column(Text, nullable=True)
     contact_email = Column(String, nullable=True)
     contact_phone = Column(String, nullable=True)
     hours_open = Column(String, nullable=True)
     hours_close = Column(String, nullable=True)
     address = Column(String, nullable=True)
+    deleted_at = Column(DateTime, nullable=True)  # set on removal; the row is purged in the background
     photos = relationship("RestaurantPhoto", back_populates="restaurant")
 
 
@@ -48,6 +54,11 @@ class Restaurant(Base):
     tables = relationship("Table", back_populates="restaurant")
     reviews = relationship("Review", back_populates="restaurant")
 
+    # Manager views list a manager's restaurants
+    __table_args__ = (
+        Index("ix_restaurants_manager", "manager_id"),
+    )
+
 
 # Table Model
 class Table(Base):
@@ -56,10 +67,42 @@ class Table(Base):
     id = Column(Integer, primary_key=True, index=True)
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"))
     size = Column(Integer, nullable=False)  # number of seats
-    available_times = Column(String)  # e.g. "18:00,18:30,19:00"
+    available_times = Column(String)  # e.g. "18:00,18:30,19:00", every day; used when no schedule is set
+    schedule_template_id = Column(Integer, ForeignKey("schedule_templates.id"), nullable=True)
 
     restaurant = relationship("Restaurant", back_populates="tables")
 
+    # Availability loads the tables of many restaurants at once
+    __table_args__ = (
+        Index("ix_tables_restaurant_size", "restaurant_id", "size"),
+    )
+
+
+# Weekly bookable start times shared by any number of tables. Each day is a
+# bitmask of SLOT_MINUTES slots (bit n starts n * SLOT_MINUTES after midnight),
+# see app.db.table_schedules
+class ScheduleTemplate(Base):
+    __tablename__ = "schedule_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
+    name = Column(String, nullable=False)
+    weekly_slots = Column(String, nullable=False)  # Monday..Sunday hex masks, comma separated
+
+    __table_args__ = (
+        Index("ix_schedule_templates_restaurant", "restaurant_id"),
+    )
+
+
+# A template's slots for one date (holidays, special events), replacing its weekday
+class ScheduleOverride(Base):
+    __tablename__ = "schedule_overrides"
+
+    template_id = Column(Integer, ForeignKey("schedule_templates.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)  # for purges
+    slots = Column(String, nullable=False)  # hex mask; "0" closes the date
+
 
 # Reservation Model
 class Reservation(Base):
@@ -72,11 +115,21 @@ class Reservation(Base):
     date = Column(Date)
     time = Column(Time)
     number_of_people = Column(Integer)
+    contact_phone = Column(String, nullable=True)  # E.164, for SMS notifications
+    # Unique per booking; ids are reused once the newest reservation is cancelled
+    # (deleted), so notification and reminder dedupe keys use this instead
+    booking_ref = Column(String, nullable=True, default=lambda: uuid.uuid4().hex)
 
     user = relationship("User")
     restaurant = relationship("Restaurant")
     table = relationship("Table")
 
+    # The reminder scheduler scans upcoming reservations by start time
+    __table_args__ = (
+        Index("ix_reservations_date_time", "date", "time"),
+        Index("ux_reservations_booking_ref", "booking_ref", unique=True),
+    )
+
 
 # Review Model
 class Review(Base):
@@ -87,10 +140,17 @@ class Review(Base):
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
     rating = Column(Integer, nullable=False)  # e.g., 1 to 5
     comment = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="reviews")
     restaurant = relationship("Restaurant", back_populates="reviews")
 
+    # Review feeds page through one restaurant's reviews newest-first or by rating
+    __table_args__ = (
+        Index("ix_reviews_restaurant_created", "restaurant_id", "created_at", "id"),
+        Index("ix_reviews_restaurant_rating", "restaurant_id", "rating", "created_at", "id"),
+    )
+
 # Restaurant Approval Model
 class RestaurantApproval(Base):
     __tablename__ = "restaurant_approvals"
@@ -98,9 +158,18 @@ class RestaurantApproval(Base):
     id = Column(Integer, primary_key=True, index=True)
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
     status = Column(String, default="pending")  # pending, approved, rejected
+    submitted_at = Column(DateTime, default=datetime.utcnow)
+    admin_notes = Column(Text, nullable=True)
 
     restaurant = relationship("Restaurant")
 
+    # The admin queue pages through pending approvals oldest first; manager
+    # views look up each restaurant's latest approval
+    __table_args__ = (
+        Index("ix_restaurant_approvals_status_submitted", "status", "submitted_at", "id"),
+        Index("ix_restaurant_approvals_restaurant", "restaurant_id", "id"),
+    )
+
 # RestaurantPhoto Model
 class RestaurantPhoto(Base):
     __tablename__ = "restaurant_photos"
@@ -109,5 +178,80 @@ class RestaurantPhoto(Base):
     restaurant_id = Column(Integer, ForeignKey("restaurants.id"), nullable=False)
     photo_url = Column(String, nullable=False)
     description = Column(String)
+    variants = Column(Text, nullable=True)  # JSON {size: {format: url}}, set by the photo_variants job
 
     restaurant = relationship("Restaurant", back_populates="photos")
+
+# Per-restaurant review summary: star histogram plus review counts for the
+# current and previous calendar month, maintained by add_review
+class RestaurantReviewSummary(Base):
+    __tablename__ = "restaurant_review_summaries"
+
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id"), primary_key=True)
+    stars_1 = Column(Integer, nullable=False, default=0)
+    stars_2 = Column(Integer, nullable=False, default=0)
+    stars_3 = Column(Integer, nullable=False, default=0)
+    stars_4 = Column(Integer, nullable=False, default=0)
+    stars_5 = Column(Integer, nullable=False, default=0)
+    period = Column(String, nullable=True)  # "YYYY-MM" the period_* columns refer to
+    period_count = Column(Integer, nullable=False, default=0)
+    period_sum = Column(Integer, nullable=False, default=0)
+    prev_period_count = Column(Integer, nullable=False, default=0)
+    prev_period_sum = Column(Integer, nullable=False, default=0)
+
+# Reservation counts per restaurant, day and hour, maintained by book_table and
+# cancel_reservation so analytics never scans the reservations table
+class ReservationRollup(Base):
+    __tablename__ = "reservation_rollups"
+
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    hour = Column(Integer, primary_key=True)  # 0-23, from the reservation time
+    reservations = Column(Integer, nullable=False, default=0)  # active (not cancelled)
+    covers = Column(Integer, nullable=False, default=0)  # sum of number_of_people
+    cancellations = Column(Integer, nullable=False, default=0)
+
+    # Analytics read date ranges across all restaurants
+    __table_args__ = (
+        Index("ix_reservation_rollups_date", "date", "hour"),
+    )
+
+# Durable background job (emails, purges, ...), claimed and run by app.jobs.queue
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String, nullable=False, default="queued")  # queued, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    dedupe_key = Column(String, nullable=True)  # at most one job per key, e.g. "booking:<booking_ref>:confirmation_email"
+
+    # Workers look for due queued jobs of one type; the admin view groups by type and status
+    __table_args__ = (
+        Index("ix_jobs_status_type_run_after", "status", "type", "run_after", "id"),
+        Index("ux_jobs_dedupe_key", "dedupe_key", unique=True),
+    )
+
+# Booking changes relayed between worker processes by the booking feed's
+# database backend (app.utils.booking_feed); rows are kept for an hour
+class BookingEvent(Base):
+    __tablename__ = "booking_events"
+
+    id = Column(Integer, primary_key=True)
+    restaurant_id = Column(Integer, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON event as sent to dashboards
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    # Readers poll for ids past the last one they saw, so ids must never be reused
+    # once old rows are deleted (AUTOINCREMENT applies to newly created tables)
+    __table_args__ = (
+        Index("ix_booking_events_created", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
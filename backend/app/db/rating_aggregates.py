@@ -0,0 +1,282 @@
+import argparse
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.migrations import register_backfill
+
+
+def rating_from_aggregates(rating_sum, review_count):
+    """SQL expression for the displayed rating, rounded to one decimal like add_review."""
+    return func.round(rating_sum * 1.0 / review_count, 1)
+
+
+def month_period(moment: datetime) -> str:
+    return moment.strftime("%Y-%m")
+
+
+def previous_month_period(moment: datetime) -> str:
+    year, month = (moment.year, moment.month - 1) if moment.month > 1 else (moment.year - 1, 12)
+    return f"{year:04d}-{month:02d}"
+
+
+def apply_new_review(db: Session, restaurant_id: int, rating: int, now: datetime = None):
+    """
+    Fold one new review into the restaurant's aggregates and review summary.
+
+    Each table gets a single UPDATE whose SET expressions read the pre-update
+    column values, so concurrent reviews cannot lose increments. Call inside
+    the same transaction as the Review insert (see database.begin_atomic).
+    """
+    Restaurant, Summary = models.Restaurant, models.RestaurantReviewSummary
+    now = now or datetime.utcnow()
+    current, previous = month_period(now), previous_month_period(now)
+
+    db.execute(
+        update(Restaurant)
+        .where(Restaurant.id == restaurant_id)
+        .values(
+            review_count=Restaurant.review_count + 1,
+            rating_sum=Restaurant.rating_sum + rating,
+            rating=rating_from_aggregates(Restaurant.rating_sum + rating, Restaurant.review_count + 1),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    db.execute(sqlite_insert(Summary).values(restaurant_id=restaurant_id).on_conflict_do_nothing())
+
+    # Roll the monthly counters forward when the first review of a new month arrives
+    same_period = Summary.period == current
+    db.execute(
+        update(Summary)
+        .where(Summary.restaurant_id == restaurant_id)
+        .values(
+            {
+                getattr(Summary, f"stars_{rating}"): getattr(Summary, f"stars_{rating}") + 1,
+                Summary.prev_period_count: case(
+                    (same_period, Summary.prev_period_count),
+                    (Summary.period == previous, Summary.period_count),
+                    else_=0,
+                ),
+                Summary.prev_period_sum: case(
+                    (same_period, Summary.prev_period_sum),
+                    (Summary.period == previous, Summary.period_sum),
+                    else_=0,
+                ),
+                Summary.period_count: case((same_period, Summary.period_count + 1), else_=1),
+                Summary.period_sum: case((same_period, Summary.period_sum + rating), else_=rating),
+                Summary.period: current,
+            }
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def summary_to_dict(summary, now: datetime = None) -> dict:
+    """
+    Shape a RestaurantReviewSummary row (or None) for the API, shifting the
+    monthly counters if no review has arrived since the month changed.
+    """
+    now = now or datetime.utcnow()
+    histogram = {str(star): (getattr(summary, f"stars_{star}") if summary else 0) for star in range(1, 6)}
+    count = sum(histogram.values())
+    total = sum(int(star) * n for star, n in histogram.items())
+
+    this_month, last_month = (0, 0), (0, 0)
+    if summary and summary.period == month_period(now):
+        this_month = (summary.period_count, summary.period_sum)
+        last_month = (summary.prev_period_count, summary.prev_period_sum)
+    elif summary and summary.period == previous_month_period(now):
+        last_month = (summary.period_count, summary.period_sum)
+
+    def period_stats(stats):
+        n, s = stats
+        return {"count": n, "mean": round(s / n, 2) if n else None}
+
+    this_stats, last_stats = period_stats(this_month), period_stats(last_month)
+    change = None
+    if this_stats["mean"] is not None and last_stats["mean"] is not None:
+        change = round(this_stats["mean"] - last_stats["mean"], 2)
+
+    return {
+        "count": count,
+        "mean": round(total / count, 2) if count else None,
+        "histogram": histogram,
+        "recent_trend": {
+            "this_month": this_stats,
+            "last_month": last_stats,
+            "mean_change": change,
+        },
+    }
+
+
+def rebuild_rating_aggregates(db: Session, restaurant_ids=None) -> int:
+    """
+    Recompute review_count, rating_sum, rating and the review summaries from
+    the reviews table in bulk.
+
+    Args:
+        db (Session): Database session; committed on success.
+        restaurant_ids (list[int], optional): Limit the rebuild to these restaurants.
+
+    Returns:
+        int: Number of restaurant rows updated.
+    """
+    Restaurant, Review = models.Restaurant, models.Review
+
+    count_sq = select(func.count(Review.id)).where(Review.restaurant_id == Restaurant.id).scalar_subquery()
+    sum_sq = select(func.coalesce(func.sum(Review.rating), 0)).where(Review.restaurant_id == Restaurant.id).scalar_subquery()
+
+    counters = update(Restaurant).values(review_count=count_sq, rating_sum=sum_sq)
+    ratings = (
+        update(Restaurant)
+        .where(Restaurant.review_count > 0)
+        .values(rating=rating_from_aggregates(Restaurant.rating_sum, Restaurant.review_count))
+    )
+    if restaurant_ids is not None:
+        counters = counters.where(Restaurant.id.in_(restaurant_ids))
+        ratings = ratings.where(Restaurant.id.in_(restaurant_ids))
+
+    updated = db.execute(counters.execution_options(synchronize_session=False)).rowcount
+    db.execute(ratings.execution_options(synchronize_session=False))
+    rebuild_review_summaries(db, restaurant_ids)
+    db.commit()
+    return updated
+
+
+def rebuild_review_summaries(db: Session, restaurant_ids=None, now: datetime = None):
+    """Recompute the review summary rows from the reviews table with one grouped query."""
+    Review, Summary = models.Review, models.RestaurantReviewSummary
+    now = now or datetime.utcnow()
+    current, previous = month_period(now), previous_month_period(now)
+    review_period = func.strftime("%Y-%m", Review.created_at)
+
+    def count_if(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    def sum_if(condition):
+        return func.sum(case((condition, Review.rating), else_=0))
+
+    summary_rows = (
+        select(
+            Review.restaurant_id,
+            *[count_if(Review.rating == star) for star in range(1, 6)],
+            count_if(review_period == current),
+            sum_if(review_period == current),
+            count_if(review_period == previous),
+            sum_if(review_period == previous),
+        )
+        .group_by(Review.restaurant_id)
+    )
+    clear = delete(Summary)
+    if restaurant_ids is not None:
+        summary_rows = summary_rows.where(Review.restaurant_id.in_(restaurant_ids))
+        clear = clear.where(Summary.restaurant_id.in_(restaurant_ids))
+
+    db.execute(clear)
+    db.execute(
+        insert(Summary).from_select(
+            [
+                Summary.restaurant_id,
+                Summary.stars_1, Summary.stars_2, Summary.stars_3, Summary.stars_4, Summary.stars_5,
+                Summary.period_count, Summary.period_sum, Summary.prev_period_count, Summary.prev_period_sum,
+            ],
+            summary_rows,
+        )
+    )
+    db.execute(
+        update(Summary)
+        .values(period=current)
+        .where(Summary.period.is_(None))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def find_rating_drift(db: Session):
+    """
+    Compare the stored aggregates against values recomputed from reviews.
+
+    Returns:
+        list[dict]: One entry per restaurant whose stored values disagree.
+    """
+    Restaurant, Review, Summary = models.Restaurant, models.Review, models.RestaurantReviewSummary
+
+    actual = (
+        select(
+            Review.restaurant_id.label("restaurant_id"),
+            func.count(Review.id).label("review_count"),
+            func.sum(Review.rating).label("rating_sum"),
+        )
+        .group_by(Review.restaurant_id)
+        .subquery()
+    )
+    summary_count = func.coalesce(
+        Summary.stars_1 + Summary.stars_2 + Summary.stars_3 + Summary.stars_4 + Summary.stars_5, 0
+    )
+    rows = db.execute(
+        select(
+            Restaurant.id,
+            Restaurant.review_count,
+            Restaurant.rating_sum,
+            func.coalesce(actual.c.review_count, 0),
+            func.coalesce(actual.c.rating_sum, 0),
+            summary_count,
+        )
+        .outerjoin(actual, actual.c.restaurant_id == Restaurant.id)
+        .outerjoin(Summary, Summary.restaurant_id == Restaurant.id)
+        .where(
+            (Restaurant.review_count != func.coalesce(actual.c.review_count, 0))
+            | (Restaurant.rating_sum != func.coalesce(actual.c.rating_sum, 0))
+            | (summary_count != func.coalesce(actual.c.review_count, 0))
+        )
+    ).all()
+
+    return [
+        {
+            "restaurant_id": r[0],
+            "stored_review_count": r[1],
+            "stored_rating_sum": r[2],
+            "actual_review_count": r[3],
+            "actual_rating_sum": r[4],
+            "summary_review_count": r[5],
+        }
+        for r in rows
+    ]
+
+
+@register_backfill("restaurants", "rating_sum")
+def _backfill_on_upgrade(db: Session):
+    rebuild_rating_aggregates(db)
+
+
+@register_backfill("restaurant_review_summaries")
+def _backfill_summaries_on_upgrade(db: Session):
+    rebuild_review_summaries(db)
+    db.commit()
+
+
+if __name__ == "__main__":
+    # python -m app.db.rating_aggregates [--check] [--restaurant-id ID ...]
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify restaurant review aggregates.")
+    parser.add_argument("--check", action="store_true", help="Only report restaurants whose aggregates have drifted.")
+    parser.add_argument("--restaurant-id", type=int, action="append", help="Limit the rebuild to this restaurant (repeatable).")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.check:
+            drift = find_rating_drift(db)
+            for row in drift:
+                print(row)
+            print(f"{len(drift)} restaurant(s) with drifted review aggregates")
+            raise SystemExit(1 if drift else 0)
+
+        updated = rebuild_rating_aggregates(db, args.restaurant_id)
+        print(f"Rebuilt review aggregates for {updated} restaurant(s)")
+    finally:
+        db.close()
@@ -0,0 +1,247 @@
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import date, timedelta
+
+from sqlalchemy import String, event, func, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from app.db import models
+from app.db.database import SessionLocal
+
+GRANULARITIES = ("hour", "day", "week", "month")
+GROUP_BY_DIMENSIONS = ("city", "cuisine", "restaurant")
+
+# Upper bound on buckets per request, so an hourly series cannot span years
+MAX_BUCKETS = int(os.getenv("BOOKTABLE_ANALYTICS_MAX_BUCKETS", "10000"))
+
+# Closed buckets kept per worker; each entry is one bucket's grouped rows
+CLOSED_BUCKET_CACHE_SIZE = int(os.getenv("BOOKTABLE_ANALYTICS_CACHE_SIZE", "50000"))
+
+
+class ClosedBucketCache:
+    """
+    Thread-safe LRU of results for buckets that ended before today.
+
+    Past buckets only change when a past reservation is cancelled, a
+    restaurant is removed or renamed, or the rollups are rebuilt; those
+    paths call invalidate_day() or clear() once their transaction is over,
+    so a concurrent request cannot re-cache pre-commit data.
+
+    The cache is per process and nothing invalidates it across workers: with
+    several workers, a change made through one leaves the others serving the
+    old bucket until it is evicted or the worker restarts.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+            return rows
+
+    def set(self, key, rows):
+        with self._lock:
+            self._entries[key] = rows
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_day(self, day: date):
+        with self._lock:
+            for key in [k for k in self._entries if _bucket_start(k[0], k[2]) <= day <= _bucket_end(k[0], k[2])]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+closed_bucket_cache = ClosedBucketCache(CLOSED_BUCKET_CACHE_SIZE)
+
+
+def _bucket_key(granularity: str, day: date, hour: int = 0) -> str:
+    if granularity == "hour":
+        return f"{day.isoformat()}T{hour:02d}:00"
+    if granularity == "week":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if granularity == "month":
+        return day.strftime("%Y-%m")
+    return day.isoformat()
+
+
+def _bucket_start(granularity: str, key: str) -> date:
+    if granularity == "month":
+        return date.fromisoformat(f"{key}-01")
+    return date.fromisoformat(key[:10])
+
+
+def _bucket_end(granularity: str, key: str) -> date:
+    """Last day covered by a bucket."""
+    start = _bucket_start(granularity, key)
+    if granularity == "week":
+        return start + timedelta(days=6)
+    if granularity == "month":
+        next_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        return next_month - timedelta(days=1)
+    return start
+
+
+def _bucket_sql(granularity: str, Rollup):
+    """SQL expression producing the same bucket keys as _bucket_key()."""
+    if granularity == "hour":
+        return func.printf("%sT%02d:00", Rollup.date, Rollup.hour, type_=String)
+    if granularity == "week":
+        # Monday on or before the date
+        return func.date(Rollup.date, "-6 days", "weekday 1", type_=String)
+    if granularity == "month":
+        return func.strftime("%Y-%m", Rollup.date, type_=String)
+    return func.date(Rollup.date, type_=String)
+
+
+def _iter_buckets(granularity: str, date_from: date, date_to: date):
+    keys, day = [], date_from
+    while day <= date_to:
+        if granularity == "hour":
+            keys.extend(_bucket_key("hour", day, hour) for hour in range(24))
+        else:
+            key = _bucket_key(granularity, day)
+            if not keys or keys[-1] != key:
+                keys.append(key)
+        day += timedelta(days=1)
+    return keys
+
+
+def count_buckets(granularity: str, date_from: date, date_to: date) -> int:
+    days = (date_to - date_from).days + 1
+    return {"hour": days * 24, "day": days, "week": days // 7 + 2, "month": days // 28 + 2}[granularity]
+
+
+def _query_series(db: Session, granularity: str, group_by, date_from: date, date_to: date):
+    Rollup, Restaurant = models.ReservationRollup, models.Restaurant
+    bucket = _bucket_sql(granularity, Rollup).label("bucket")
+
+    columns, group_columns = [bucket], [bucket]
+    if group_by == "restaurant":
+        columns += [Rollup.restaurant_id, Restaurant.name]
+        group_columns += [Rollup.restaurant_id, Restaurant.name]
+    elif group_by in ("city", "cuisine"):
+        dimension = getattr(Restaurant, group_by)
+        columns.append(dimension)
+        group_columns.append(dimension)
+
+    query = select(
+        *columns,
+        func.sum(Rollup.reservations),
+        func.sum(Rollup.covers),
+        func.sum(Rollup.cancellations),
+    ).select_from(Rollup)
+    if group_by:
+        query = query.join(Restaurant, Restaurant.id == Rollup.restaurant_id)
+    query = query.where(Rollup.date >= date_from, Rollup.date <= date_to).group_by(*group_columns)
+
+    by_bucket = defaultdict(list)
+    for row in db.execute(query):
+        key, *group, reservations, covers, cancellations = row
+        entry = {"bucket": key}
+        if group_by == "restaurant":
+            entry.update(restaurant_id=group[0], restaurant=group[1])
+        elif group_by:
+            entry[group_by] = group[0]
+        entry.update(reservations=reservations, covers=covers, cancellations=cancellations)
+        by_bucket[key].append(entry)
+    return by_bucket
+
+
+def reservation_series(db: Session, date_from: date, date_to: date, granularity: str = "day", group_by: str = None):
+    """
+    Reservation, cover and cancellation counts per time bucket, optionally
+    split by city, cuisine or restaurant, aggregated in SQL from the rollups.
+
+    Buckets that ended before today and lie wholly inside the range are served
+    from closed_bucket_cache when possible; everything else is queried with
+    GROUP BY over the date ranges of the missing buckets.
+
+    Returns:
+        list[dict]: One entry per (bucket, group) with any activity, in bucket order.
+    """
+    today = date.today()
+    buckets = _iter_buckets(granularity, date_from, date_to)
+
+    results, missing = {}, []
+    for position, key in enumerate(buckets):
+        cacheable = (
+            _bucket_end(granularity, key) < today
+            and _bucket_start(granularity, key) >= date_from
+            and _bucket_end(granularity, key) <= date_to
+        )
+        rows = closed_bucket_cache.get((granularity, group_by, key)) if cacheable else None
+        if rows is None:
+            missing.append((position, key, cacheable))
+        else:
+            results[key] = rows
+
+    # One query per run of consecutive missing buckets, so cached buckets in the
+    # middle of the range are never re-read
+    runs = []
+    for position, key, cacheable in missing:
+        if runs and runs[-1][-1][0] == position - 1:
+            runs[-1].append((position, key, cacheable))
+        else:
+            runs.append([(position, key, cacheable)])
+
+    for run in runs:
+        query_from = max(date_from, _bucket_start(granularity, run[0][1]))
+        query_to = min(date_to, _bucket_end(granularity, run[-1][1]))
+        fetched = _query_series(db, granularity, group_by, query_from, query_to)
+        for _, key, cacheable in run:
+            rows = fetched.get(key, [])
+            results[key] = rows
+            if cacheable:
+                closed_bucket_cache.set((granularity, group_by, key), rows)
+
+    return [entry for key in buckets for entry in results[key]]
+
+
+def invalidate_closed_buckets(db: Session, day: date):
+    """Drop cached buckets covering `day`, whose rollup db changed, once db's transaction ends."""
+    if day < date.today():
+        db.info.setdefault("analytics_changed_days", set()).add(day)
+
+
+def _clear_after_transaction(target):
+    db = object_session(target)
+    if db is None:
+        closed_bucket_cache.clear()
+    else:
+        db.info["analytics_cache_stale"] = True
+
+
+# Grouped results carry restaurant names, cities and cuisines
+@event.listens_for(models.Restaurant, "after_update")
+def _invalidate_on_restaurant_change(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if any(attrs[name].history.has_changes() for name in ("name", "city", "cuisine")):
+        _clear_after_transaction(target)
+
+
+@event.listens_for(models.Restaurant, "after_delete")
+def _invalidate_on_restaurant_delete(mapper, connection, target):
+    _clear_after_transaction(target)
+
+
+# Applied when the transaction ends either way: with the AUTOCOMMIT engine a
+# "rolled back" session may still have written, and an extra miss is harmless
+@event.listens_for(SessionLocal, "after_transaction_end")
+def _apply_invalidations(session, transaction):
+    if transaction.parent is not None:
+        return
+    if session.info.pop("analytics_cache_stale", False):
+        closed_bucket_cache.clear()
+    for day in session.info.pop("analytics_changed_days", ()):
+        closed_bucket_cache.invalidate_day(day)
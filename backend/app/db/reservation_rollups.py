@@ -0,0 +1,188 @@
+import argparse
+from datetime import date, time
+
+from sqlalchemy import Integer, cast, func, literal, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.migrations import register_backfill
+from app.db.reservation_analytics import closed_bucket_cache, invalidate_closed_buckets
+
+
+def apply_reservation_change(
+    db: Session,
+    restaurant_id: int,
+    day: date,
+    at: time,
+    people: int,
+    cancelled: bool = False,
+):
+    """
+    Count one new (or, with cancelled=True, one cancelled) reservation in its
+    (restaurant, date, hour) rollup with a single upsert.
+
+    Call inside the same transaction as the Reservation insert or delete
+    (see database.begin_atomic).
+    """
+    Rollup = models.ReservationRollup
+    sign = -1 if cancelled else 1
+    people = people or 0
+
+    stmt = sqlite_insert(Rollup).values(
+        restaurant_id=restaurant_id,
+        date=day,
+        hour=at.hour,
+        reservations=max(sign, 0),
+        covers=max(sign * people, 0),
+        cancellations=int(cancelled),
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Rollup.restaurant_id, Rollup.date, Rollup.hour],
+            set_={
+                "reservations": Rollup.reservations + sign,
+                "covers": Rollup.covers + sign * people,
+                "cancellations": Rollup.cancellations + int(cancelled),
+            },
+        )
+    )
+    invalidate_closed_buckets(db, day)
+
+
+def _actual_rollups(restaurant_ids=None, date_from: date = None, date_to: date = None):
+    Reservation = models.Reservation
+    hour = cast(func.strftime("%H", Reservation.time), Integer)
+    query = (
+        select(
+            Reservation.restaurant_id.label("restaurant_id"),
+            Reservation.date.label("date"),
+            hour.label("hour"),
+            func.count(Reservation.id).label("reservations"),
+            func.coalesce(func.sum(Reservation.number_of_people), 0).label("covers"),
+        )
+        .where(Reservation.restaurant_id.is_not(None), Reservation.date.is_not(None), Reservation.time.is_not(None))
+        .group_by(Reservation.restaurant_id, Reservation.date, hour)
+    )
+    if restaurant_ids is not None:
+        query = query.where(Reservation.restaurant_id.in_(restaurant_ids))
+    if date_from is not None:
+        query = query.where(Reservation.date >= date_from)
+    if date_to is not None:
+        query = query.where(Reservation.date <= date_to)
+    return query
+
+
+def rebuild_reservation_rollups(db: Session, restaurant_ids=None, date_from: date = None, date_to: date = None) -> int:
+    """
+    Recompute reservation and cover counts from the reservations table.
+
+    Cancelled reservations are deleted, so cancellation counts cannot be
+    recomputed and are kept as they are.
+
+    Args:
+        db (Session): Database session; committed on success.
+        restaurant_ids (list[int], optional): Limit the rebuild to these restaurants.
+        date_from (date, optional): First reservation date to rebuild.
+        date_to (date, optional): Last reservation date to rebuild.
+
+    Returns:
+        int: Number of (restaurant, date, hour) buckets written.
+    """
+    Rollup = models.ReservationRollup
+
+    reset = update(Rollup).values(reservations=0, covers=0)
+    if restaurant_ids is not None:
+        reset = reset.where(Rollup.restaurant_id.in_(restaurant_ids))
+    if date_from is not None:
+        reset = reset.where(Rollup.date >= date_from)
+    if date_to is not None:
+        reset = reset.where(Rollup.date <= date_to)
+    db.execute(reset.execution_options(synchronize_session=False))
+
+    upsert = sqlite_insert(Rollup).from_select(
+        ["restaurant_id", "date", "hour", "reservations", "covers"],
+        _actual_rollups(restaurant_ids, date_from, date_to),
+    )
+    written = db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[Rollup.restaurant_id, Rollup.date, Rollup.hour],
+            set_={"reservations": upsert.excluded.reservations, "covers": upsert.excluded.covers},
+        )
+    ).rowcount
+    db.commit()
+    closed_bucket_cache.clear()
+    return written
+
+
+def find_rollup_drift(db: Session):
+    """
+    Compare stored rollups against counts recomputed from reservations.
+
+    Returns:
+        list[dict]: One entry per (restaurant, date, hour) bucket that disagrees.
+    """
+    Rollup = models.ReservationRollup
+    actual = _actual_rollups().subquery()
+
+    stored = select(
+        Rollup.restaurant_id, Rollup.date, Rollup.hour, Rollup.reservations, Rollup.covers,
+        func.coalesce(actual.c.reservations, 0), func.coalesce(actual.c.covers, 0),
+    ).outerjoin(
+        actual,
+        (actual.c.restaurant_id == Rollup.restaurant_id) & (actual.c.date == Rollup.date) & (actual.c.hour == Rollup.hour),
+    ).where(
+        (Rollup.reservations != func.coalesce(actual.c.reservations, 0))
+        | (Rollup.covers != func.coalesce(actual.c.covers, 0))
+    )
+    # Buckets with reservations but no rollup row at all
+    missing = select(
+        actual.c.restaurant_id, actual.c.date, actual.c.hour, literal(0), literal(0), actual.c.reservations, actual.c.covers,
+    ).outerjoin(
+        Rollup,
+        (actual.c.restaurant_id == Rollup.restaurant_id) & (actual.c.date == Rollup.date) & (actual.c.hour == Rollup.hour),
+    ).where(Rollup.restaurant_id.is_(None))
+
+    return [
+        {
+            "restaurant_id": r[0],
+            "date": str(r[1]),
+            "hour": r[2],
+            "stored_reservations": r[3],
+            "stored_covers": r[4],
+            "actual_reservations": r[5],
+            "actual_covers": r[6],
+        }
+        for r in db.execute(stored.union_all(missing)).all()
+    ]
+
+
+@register_backfill("reservation_rollups")
+def _backfill_on_upgrade(db: Session):
+    rebuild_reservation_rollups(db)
+
+
+if __name__ == "__main__":
+    # python -m app.db.reservation_rollups [--check] [--restaurant-id ID ...] [--from DATE] [--to DATE]
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild or verify the reservation analytics rollups.")
+    parser.add_argument("--check", action="store_true", help="Only report buckets whose counts have drifted.")
+    parser.add_argument("--restaurant-id", type=int, action="append", help="Limit the rebuild to this restaurant (repeatable).")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First date to rebuild (YYYY-MM-DD).")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Last date to rebuild (YYYY-MM-DD).")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.check:
+            drift = find_rollup_drift(db)
+            for row in drift:
+                print(row)
+            print(f"{len(drift)} reservation rollup bucket(s) with drifted counts")
+            raise SystemExit(1 if drift else 0)
+
+        written = rebuild_reservation_rollups(db, args.restaurant_id, args.date_from, args.date_to)
+        print(f"Rebuilt {written} reservation rollup bucket(s)")
+    finally:
+        db.close()
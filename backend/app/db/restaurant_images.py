@@ -0,0 +1,19 @@
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.utils.photo_variants import image_fields
+
+
+def card_images(db: Session, restaurant_ids: List[int]) -> dict:
+    """First photo of each restaurant as list-card image fields, in one query."""
+    first_photos = {}
+    if restaurant_ids:
+        Photo = models.RestaurantPhoto
+        photos = db.query(Photo.restaurant_id, Photo.photo_url, Photo.variants).filter(
+            Photo.restaurant_id.in_(restaurant_ids)
+        ).order_by(Photo.id)
+        for restaurant_id, photo_url, variants in photos:
+            first_photos.setdefault(restaurant_id, (photo_url, variants))
+    return {rid: image_fields(*first_photos.get(rid, (None, None))) for rid in restaurant_ids}
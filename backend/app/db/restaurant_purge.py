@@ -0,0 +1,153 @@
+import argparse
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import delete, literal_column, select
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import SessionLocal
+from app.db.reservation_analytics import closed_bucket_cache
+from app.utils.photo_storage import upload_path
+from app.utils.photo_variants import remove_variants
+
+logger = logging.getLogger(__name__)
+
+# Rows deleted per statement; each batch is its own short write transaction
+PURGE_BATCH_SIZE = int(os.getenv("BOOKTABLE_PURGE_BATCH_SIZE", "500"))
+
+# Pause between batches so bookings can take the SQLite write lock
+PURGE_BATCH_PAUSE_SECONDS = float(os.getenv("BOOKTABLE_PURGE_BATCH_PAUSE", "0.01"))
+
+# Dependent tables in delete order; restaurant_photos is handled separately
+_DEPENDENT_MODELS = [
+    models.Review,
+    models.Reservation,
+    models.ReservationRollup,
+    models.RestaurantReviewSummary,
+    models.Table,
+    models.ScheduleOverride,
+    models.ScheduleTemplate,
+    models.RestaurantApproval,
+]
+
+# Serializes purges within a worker; a second purge of the same restaurant is a no-op
+_purge_lock = threading.Lock()
+
+
+def _delete_in_batches(db: Session, model, restaurant_id: int) -> int:
+    # rowid works for every table, including those with composite primary keys
+    rowid = literal_column("rowid")
+    deleted = 0
+    while True:
+        batch = select(rowid).select_from(model).where(model.restaurant_id == restaurant_id).limit(PURGE_BATCH_SIZE)
+        count = db.execute(delete(model).where(rowid.in_(batch.scalar_subquery()))).rowcount
+        db.commit()
+        deleted += count
+        if count < PURGE_BATCH_SIZE:
+            return deleted
+        time.sleep(PURGE_BATCH_PAUSE_SECONDS)
+
+
+def _purge_photos(db: Session, restaurant_id: int) -> int:
+    Photo = models.RestaurantPhoto
+    deleted = 0
+    while True:
+        batch = db.execute(
+            select(Photo.id, Photo.photo_url).where(Photo.restaurant_id == restaurant_id).limit(PURGE_BATCH_SIZE)
+        ).all()
+        if not batch:
+            return deleted
+
+        ids = [photo_id for photo_id, _ in batch]
+        urls = {url for _, url in batch}
+        # Rows go first: an interrupted purge then leaves at worst an orphaned
+        # file, never a photo row pointing at a missing file
+        db.execute(delete(Photo).where(Photo.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+
+        # Identical uploads may share one file; keep files other photos still use
+        still_used = set(db.execute(select(Photo.photo_url).where(Photo.photo_url.in_(urls))).scalars())
+        for url in urls - still_used:
+            path = upload_path(url)
+            if path is None:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.exception("photo file not removed", extra={"restaurant_id": restaurant_id, "path": path})
+            remove_variants(url)
+        time.sleep(PURGE_BATCH_PAUSE_SECONDS)
+
+
+def purge_restaurant(restaurant_id: int) -> dict:
+    """
+    Delete a soft-deleted restaurant and everything that references it.
+
+    Dependent rows are deleted in batches of PURGE_BATCH_SIZE, each committed
+    on its own, so the write lock is only ever held briefly. Every step only
+    deletes what is left, so an interrupted purge is finished by running it
+    again (the restaurant_purge job is retried, or see resume_pending_purges()).
+
+    Returns:
+        dict: Rows deleted per table; empty if the restaurant is not soft-deleted.
+    """
+    with _purge_lock:
+        db = SessionLocal()
+        try:
+            restaurant = db.execute(
+                select(models.Restaurant.id).where(
+                    models.Restaurant.id == restaurant_id,
+                    models.Restaurant.deleted_at.is_not(None),
+                )
+            ).first()
+            if restaurant is None:
+                return {}
+
+            deleted = {"restaurant_photos": _purge_photos(db, restaurant_id)}
+            for model in _DEPENDENT_MODELS:
+                deleted[model.__tablename__] = _delete_in_batches(db, model, restaurant_id)
+
+            db.execute(delete(models.Restaurant).where(models.Restaurant.id == restaurant_id))
+            db.commit()
+        finally:
+            db.close()
+
+    closed_bucket_cache.clear()
+    logger.info("restaurant purged", extra={"restaurant_id": restaurant_id, "deleted": deleted})
+    return deleted
+
+
+def resume_pending_purges():
+    """Purge every soft-deleted restaurant still present, e.g. after a failed purge job."""
+    db = SessionLocal()
+    try:
+        pending = db.execute(
+            select(models.Restaurant.id).where(models.Restaurant.deleted_at.is_not(None))
+        ).scalars().all()
+    finally:
+        db.close()
+
+    for restaurant_id in pending:
+        try:
+            purge_restaurant(restaurant_id)
+        except Exception:
+            logger.exception("restaurant purge failed", extra={"restaurant_id": restaurant_id})
+
+
+if __name__ == "__main__":
+    # python -m app.db.restaurant_purge [--restaurant-id ID ...]
+    parser = argparse.ArgumentParser(description="Purge soft-deleted restaurants and their dependent rows.")
+    parser.add_argument("--restaurant-id", type=int, action="append", help="Purge only this restaurant (repeatable).")
+    args = parser.parse_args()
+
+    if args.restaurant_id:
+        for restaurant_id in args.restaurant_id:
+            print(restaurant_id, purge_restaurant(restaurant_id))
+    else:
+        resume_pending_purges()
@@ -5,13 +5,17 @@ from app.db import models
 models.Base.metadata.create_all(bind=engine)
 from app.db import models, database
 from app.auth.auth_handler import hash_password
+from app.db.rating_aggregates import rebuild_rating_aggregates
 from sqlalchemy.orm import Session
+import logging
+
+logger = logging.getLogger(__name__)
 
 def seed_restaurants_tables_reviews():
     db: Session = database.SessionLocal()
 
     if db.query(models.Restaurant).first():
-        print("Restaurants already seeded.")
+        logger.info("Restaurants already seeded.")
         return
 
     # ✅ Create Customers and Admins
@@ -154,7 +158,8 @@ def seed_restaurants_tables_reviews():
             ))
 
     db.commit()
-    print("✅ Restaurants, tables, reviews, and approvals seeded with city-specific managers.")
+    rebuild_rating_aggregates(db)
+    logger.info("Restaurants, tables, reviews, and approvals seeded with city-specific managers.")
     db.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+import logging
+from datetime import date, datetime, time
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.db import models
+
+logger = logging.getLogger(__name__)
+
+# Bookable start times fall on this grid
+SLOT_MINUTES = 15
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+class InvalidSlotTime(ValueError):
+    pass
+
+
+def _minutes(at: time) -> int:
+    return at.hour * 60 + at.minute
+
+
+def times_to_mask(times: Iterable[str]) -> int:
+    """
+    Bitmask of "HH:MM" start times.
+
+    Raises:
+        InvalidSlotTime: A time is malformed or not on the SLOT_MINUTES grid.
+    """
+    mask = 0
+    for value in times:
+        try:
+            at = datetime.strptime(value.strip(), "%H:%M").time()
+        except ValueError:
+            raise InvalidSlotTime(f"Invalid time {value!r}. Expected 'HH:MM'")
+        if _minutes(at) % SLOT_MINUTES:
+            raise InvalidSlotTime(f"{value} is not on the {SLOT_MINUTES}-minute booking grid")
+        mask |= 1 << (_minutes(at) // SLOT_MINUTES)
+    return mask
+
+
+def mask_to_times(mask: int) -> List[str]:
+    """The "HH:MM" start times of a mask, earliest first."""
+    times = []
+    while mask:
+        lowest = mask & -mask
+        minutes = (lowest.bit_length() - 1) * SLOT_MINUTES
+        times.append(f"{minutes // 60:02d}:{minutes % 60:02d}")
+        mask ^= lowest
+    return times
+
+
+def window_mask(start: time, end: time) -> int:
+    """Slots starting within [start, end]; empty when the window wraps past midnight."""
+    first = -(-_minutes(start) // SLOT_MINUTES)
+    last = _minutes(end) // SLOT_MINUTES
+    if first > last:
+        return 0
+    return ((1 << (last - first + 1)) - 1) << first
+
+
+def slot_time(mask: int) -> str:
+    """Start time of the earliest slot in a non-empty mask."""
+    return mask_to_times(mask & -mask)[0]
+
+
+def encode_week(weekdays: Dict[str, List[str]]) -> str:
+    """weekly_slots column value for {"mon": ["18:00", ...], ...}; missing days are closed."""
+    return ",".join(format(times_to_mask(weekdays.get(day, [])), "x") for day in WEEKDAYS)
+
+
+@lru_cache(maxsize=4096)
+def decode_week(weekly_slots: str) -> tuple:
+    return tuple(int(mask, 16) for mask in weekly_slots.split(","))
+
+
+@lru_cache(maxsize=4096)
+def legacy_mask(available_times: str) -> int:
+    """
+    Mask of a table's every-day available_times string. Entries that are
+    malformed or off the slot grid are skipped with a warning, logged once
+    per string as results are cached; the table endpoints no longer accept
+    them and the upgrade moves stored ones onto the grid (see snap_to_grid()).
+    """
+    mask = 0
+    for value in (available_times or "").split(","):
+        if not value.strip():
+            continue
+        try:
+            mask |= times_to_mask([value])
+        except InvalidSlotTime as e:
+            logger.warning("table time skipped", extra={"available_times": available_times, "error": str(e)})
+    return mask
+
+
+def snap_to_grid(available_times: str) -> Optional[str]:
+    """
+    available_times with entries off the slot grid moved to the next slot
+    (the day's last at most) and malformed ones dropped; None when every
+    entry is already valid.
+    """
+    snapped, changed = [], False
+    for value in (available_times or "").split(","):
+        if not value.strip():
+            continue
+        try:
+            minutes = _minutes(datetime.strptime(value.strip(), "%H:%M").time())
+        except ValueError:
+            changed = True
+            continue
+        if minutes % SLOT_MINUTES:
+            changed = True
+            minutes = min(-(-minutes // SLOT_MINUTES) * SLOT_MINUTES, 24 * 60 - SLOT_MINUTES)
+        slot = f"{minutes // 60:02d}:{minutes % 60:02d}"
+        if slot not in snapped:
+            snapped.append(slot)
+    return ",".join(snapped) if changed else None
+
+
+def slot_masks(db: Session, tables, day: date) -> Dict[int, int]:
+    """
+    Bookable start slots of each table on `day`, as bitmasks.
+
+    A table follows its schedule template (the date's override, else the
+    weekday) or, without one, its available_times. Runs at most two queries
+    however many tables are passed.
+
+    Args:
+        tables: Rows with id, schedule_template_id and available_times.
+
+    Returns:
+        dict: {table_id: mask}.
+    """
+    template_ids = {t.schedule_template_id for t in tables if t.schedule_template_id}
+    weekly, overrides = {}, {}
+    if template_ids:
+        Template, Override = models.ScheduleTemplate, models.ScheduleOverride
+        weekly = dict(db.query(Template.id, Template.weekly_slots).filter(Template.id.in_(template_ids)))
+        overrides = dict(
+            db.query(Override.template_id, Override.slots).filter(
+                Override.template_id.in_(template_ids), Override.date == day
+            )
+        )
+
+    masks = {}
+    for table in tables:
+        template_id = table.schedule_template_id
+        if template_id is None:
+            masks[table.id] = legacy_mask(table.available_times)
+        elif template_id in overrides:
+            masks[table.id] = int(overrides[template_id], 16)
+        elif template_id in weekly:
+            masks[table.id] = decode_week(weekly[template_id])[day.weekday()]
+        else:
+            masks[table.id] = 0
+    return masks
+
+
+def set_overrides(db: Session, template: models.ScheduleTemplate, overrides: Dict[date, List[str]]):
+    """Add, replace or (with None as the times) remove date overrides of a template."""
+    Override = models.ScheduleOverride
+    removed = [day for day, times in overrides.items() if times is None]
+    if removed:
+        db.query(Override).filter(Override.template_id == template.id, Override.date.in_(removed)).delete(
+            synchronize_session=False
+        )
+    rows = [
+        {"template_id": template.id, "date": day, "restaurant_id": template.restaurant_id, "slots": format(times_to_mask(times), "x")}
+        for day, times in overrides.items()
+        if times is not None
+    ]
+    if rows:
+        stmt = sqlite_insert(Override)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[Override.template_id, Override.date],
+                set_={"slots": stmt.excluded.slots},
+            ),
+            rows,
+        )
+
+
+def template_to_dict(template: models.ScheduleTemplate, overrides) -> dict:
+    return {
+        "id": template.id,
+        "name": template.name,
+        "weekdays": {day: mask_to_times(mask) for day, mask in zip(WEEKDAYS, decode_week(template.weekly_slots))},
+        "overrides": {o.date.isoformat(): mask_to_times(int(o.slots, 16)) for o in overrides},
+    }
@@ -0,0 +1,77 @@
+from app.db.restaurant_purge import purge_restaurant
+from app.jobs.queue import job_handler
+from app.utils import sms_utils
+from app.utils.email_utils import (
+    BookingConfirmationDetails, send_booking_cancellations, send_booking_confirmations, send_booking_reminders
+)
+from app.utils.photo_variants import PHOTO_VARIANT_WORKERS, generate_photo_variants
+from app.utils.sms_utils import send_sms_bulk
+
+# Job handlers; importing this module registers them with the queue
+
+
+def _email_batch(payloads: list):
+    bookings = [(payload["to_email"], BookingConfirmationDetails(**payload["booking"])) for payload in payloads]
+    return bookings, [payload.get("dedupe_key") for payload in payloads]
+
+
+# Emails go out in batches so one transport request covers many bookings
+@job_handler("booking_confirmation_email", concurrency=4, batch_size=100, max_attempts=6)
+def booking_confirmation_email(payloads: list):
+    return send_booking_confirmations(*_email_batch(payloads))
+
+
+@job_handler("booking_cancellation_email", concurrency=4, batch_size=100, max_attempts=6)
+def booking_cancellation_email(payloads: list):
+    return send_booking_cancellations(*_email_batch(payloads))
+
+
+@job_handler("booking_reminder_email", concurrency=4, batch_size=100, max_attempts=6)
+def booking_reminder_email(payloads: list):
+    return send_booking_reminders(*_email_batch(payloads))
+
+
+# SMS batches are sent concurrently, paced to the Twilio rate limit (app/utils/sms_utils.py)
+@job_handler("booking_confirmation_sms", concurrency=2, batch_size=100, max_attempts=6)
+def booking_confirmation_sms(payloads: list):
+    return send_sms_bulk([
+        sms_utils.booking_confirmation_sms(
+            p["to_phone"], p["booking"]["restaurant_name"], p["booking"]["date"], p["booking"]["time"],
+            p["booking"]["people"], p.get("dedupe_key"),
+        )
+        for p in payloads
+    ])
+
+
+@job_handler("booking_cancellation_sms", concurrency=2, batch_size=100, max_attempts=6)
+def booking_cancellation_sms(payloads: list):
+    return send_sms_bulk([
+        sms_utils.booking_cancellation_sms(
+            p["to_phone"], p["booking"]["restaurant_name"], p["booking"]["date"], p["booking"]["time"],
+            p.get("dedupe_key"),
+        )
+        for p in payloads
+    ])
+
+
+@job_handler("booking_reminder_sms", concurrency=2, batch_size=100, max_attempts=6)
+def booking_reminder_sms(payloads: list):
+    return send_sms_bulk([
+        sms_utils.booking_reminder_sms(
+            p["to_phone"], p["booking"]["restaurant_name"], p["booking"]["date"], p["booking"]["time"],
+            p["booking"]["people"], p.get("dedupe_key"),
+        )
+        for p in payloads
+    ])
+
+
+# One purge at a time: each holds short write locks in a loop
+@job_handler("restaurant_purge", concurrency=1, max_attempts=10)
+def restaurant_purge(payload: dict):
+    purge_restaurant(payload["restaurant_id"])
+
+
+# Each job waits on one image in the variant process pool
+@job_handler("photo_variants", concurrency=PHOTO_VARIANT_WORKERS, max_attempts=3)
+def photo_variants(payload: dict):
+    generate_photo_variants(payload["photo_url"])
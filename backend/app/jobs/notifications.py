@@ -0,0 +1,52 @@
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.jobs.queue import enqueue
+from app.utils.email_utils import BookingConfirmationDetails
+
+# Booking notifications are written to the jobs table in the same transaction
+# as the booking change (a transactional outbox); the job worker relays them
+# to the email and SMS senders once that transaction commits.
+
+
+def booking_details(reservation: models.Reservation, restaurant: models.Restaurant) -> BookingConfirmationDetails:
+    return BookingConfirmationDetails(
+        id=str(reservation.id),
+        restaurant_name=restaurant.name,
+        date=reservation.date.strftime("%A, %B %d, %Y"),
+        time=reservation.time.strftime("%H:%M"),
+        people=reservation.number_of_people,
+        table_type=f"Table #{reservation.table_id}" if reservation.table_id else "Standard",
+        address=f"{restaurant.city}, {restaurant.state} {restaurant.zip_code}",
+        contact=restaurant.contact if hasattr(restaurant, 'contact') else None
+    )
+
+
+def enqueue_booking_notifications(
+    db: Session,
+    event: str,
+    reservation: models.Reservation,
+    restaurant: models.Restaurant,
+    to_email: str,
+    dedupe: bool = True,
+):
+    """
+    Queue the email (and SMS, if the booking has a contact phone) for a
+    booking event. Call before committing the booking change; the
+    reservation must have been flushed so it has an id.
+
+    Args:
+        event (str): "confirmation" or "cancellation".
+        dedupe (bool): Key the jobs on the booking and event, so a retried
+            request never queues the same notification twice. Explicit
+            resends pass False.
+    """
+    details = booking_details(reservation, restaurant).dict()
+
+    def key(channel):
+        # booking_ref, not id: a cancelled reservation's id can be given to the next booking
+        return f"booking:{reservation.booking_ref}:{event}_{channel}" if dedupe else None
+
+    enqueue(db, f"booking_{event}_email", {"to_email": to_email, "booking": details}, dedupe_key=key("email"))
+    if reservation.contact_phone:
+        enqueue(db, f"booking_{event}_sms", {"to_phone": reservation.contact_phone, "booking": details}, dedupe_key=key("sms"))
@@ -0,0 +1,346 @@
+import json
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.orm import Session
+
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Threads running job handlers in this process
+JOB_WORKER_THREADS = int(os.getenv("BOOKTABLE_JOB_WORKERS", "4"))
+
+# Longest wait between polls; enqueueing in this process wakes the worker at once
+JOB_POLL_INTERVAL_SECONDS = float(os.getenv("BOOKTABLE_JOB_POLL_INTERVAL", "1.0"))
+
+# First retry delay; doubles with every failed attempt up to JOB_RETRY_MAX_SECONDS
+JOB_RETRY_BASE_SECONDS = float(os.getenv("BOOKTABLE_JOB_RETRY_BASE", "5"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("BOOKTABLE_JOB_RETRY_MAX", "3600"))
+
+# Running jobs not finished within this long are assumed lost (worker crashed) and requeued
+JOB_LOCK_TIMEOUT_SECONDS = float(os.getenv("BOOKTABLE_JOB_LOCK_TIMEOUT", "600"))
+
+# Finished jobs are deleted after this many days
+JOB_RETENTION_DAYS = float(os.getenv("BOOKTABLE_JOB_RETENTION_DAYS", "7"))
+
+
+class JobFailed(Exception):
+    """Raised by a handler to fail the job (and retry it, if attempts remain)."""
+
+
+@dataclass(frozen=True)
+class JobType:
+    name: str
+    handler: Callable
+    concurrency: int = 1
+    batch_size: int = 1
+    max_attempts: int = 5
+
+
+_job_types = {}
+
+
+def job_handler(name: str, concurrency: int = 1, batch_size: int = 1, max_attempts: int = 5):
+    """
+    Decorator registering the handler for a job type.
+
+    With batch_size=1 the handler receives one payload. With batch_size > 1 it
+    receives a list of up to batch_size payloads of the same type and returns
+    a list of the same length holding None for each success or an error
+    message for each failure.
+
+    Args:
+        name (str): Job type passed to enqueue().
+        concurrency (int): Batches of this type running at once in one process.
+        batch_size (int): Jobs handed to one handler call.
+        max_attempts (int): Attempts before a job is marked failed.
+    """
+    def decorator(func):
+        _job_types[name] = JobType(name, func, concurrency, batch_size, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(db: Session, job_type: str, payload: dict, delay_seconds: float = 0, dedupe_key: str = None) -> models.Job:
+    """
+    Add a job to the session; it is queued when the caller commits, so it is
+    durable exactly when the surrounding writes are.
+
+    With a dedupe_key, at most one job per key is ever queued: if one exists
+    (in the database or already in this session) it is returned instead.
+    The key is also passed to the handler as payload["dedupe_key"], so
+    senders can tag messages and receivers can drop the duplicates that
+    at-least-once delivery allows.
+    """
+    if dedupe_key is not None:
+        existing = next(
+            (obj for obj in db.new if isinstance(obj, models.Job) and obj.dedupe_key == dedupe_key),
+            None,
+        ) or db.query(models.Job).filter(models.Job.dedupe_key == dedupe_key).first()
+        if existing is not None:
+            return existing
+        payload = {**payload, "dedupe_key": dedupe_key}
+
+    spec = _job_types.get(job_type)
+    job = models.Job(
+        type=job_type,
+        payload=json.dumps(payload),
+        max_attempts=spec.max_attempts if spec else 5,
+        run_after=datetime.utcnow() + timedelta(seconds=delay_seconds),
+        dedupe_key=dedupe_key,
+    )
+    db.add(job)
+    db.info["jobs_enqueued"] = True
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with +/-20% jitter so failed batches do not retry in lockstep."""
+    delay = min(JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class JobWorker:
+    """
+    Polls the jobs table and runs due jobs on a thread pool.
+
+    Jobs are claimed with a single conditional UPDATE, so several worker
+    processes can share one database without running a job twice.
+    Concurrency caps apply per process.
+    """
+
+    def __init__(self, threads: int = JOB_WORKER_THREADS):
+        self.threads = threads
+        self.wake = threading.Event()
+        self._stopping = threading.Event()
+        self._running = {}  # job type -> batches in flight
+        self._lock = threading.Lock()
+        self._pool = None
+        self._thread = None
+        self._last_maintenance = None
+
+    def running(self) -> dict:
+        """Batches currently running in this process, per job type."""
+        with self._lock:
+            return {name: count for name, count in self._running.items() if count}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._pool = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="job")
+        self._thread = threading.Thread(target=self._run, name="job-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Stop claiming jobs and wait for running handlers to finish."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self.wake.set()
+        self._thread.join(timeout)
+        self._pool.shutdown(wait=True)
+        self._thread = self._pool = None
+        self._stopping.clear()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self.wake.clear()
+            try:
+                self._maintenance()
+                claimed = self.dispatch()
+            except Exception:
+                logger.exception("job dispatch failed")
+                claimed = 0
+            # Poll again straight away while there is a backlog
+            if not claimed:
+                self.wake.wait(JOB_POLL_INTERVAL_SECONDS)
+
+    def dispatch(self) -> int:
+        """Claim due jobs for every type with spare capacity and submit them. Returns jobs claimed."""
+        claimed = 0
+        for spec in list(_job_types.values()):
+            with self._lock:
+                free_slots = min(spec.concurrency, self.threads) - self._running.get(spec.name, 0)
+            if free_slots <= 0:
+                continue
+            jobs = self._claim(spec, free_slots * spec.batch_size)
+            claimed += len(jobs)
+            for start in range(0, len(jobs), spec.batch_size):
+                batch = jobs[start:start + spec.batch_size]
+                with self._lock:
+                    self._running[spec.name] = self._running.get(spec.name, 0) + 1
+                self._pool.submit(self._execute, spec, batch)
+        return claimed
+
+    def _claim(self, spec: JobType, limit: int):
+        Job = models.Job
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            due = (
+                select(Job.id)
+                .where(Job.status == "queued", Job.type == spec.name, Job.run_after <= now)
+                .order_by(Job.run_after, Job.id)
+                .limit(limit)
+            )
+            rows = db.execute(
+                update(Job)
+                .where(Job.id.in_(due.scalar_subquery()), Job.status == "queued")
+                .values(status="running", locked_at=now, attempts=Job.attempts + 1)
+                .returning(Job.id, Job.payload, Job.attempts, Job.max_attempts)
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+        finally:
+            db.close()
+        return sorted(rows, key=lambda row: row.id)
+
+    def _execute(self, spec: JobType, jobs):
+        try:
+            payloads = [json.loads(job.payload) for job in jobs]
+            try:
+                if spec.batch_size > 1:
+                    errors = spec.handler(payloads)
+                else:
+                    spec.handler(payloads[0])
+                    errors = [None]
+            except Exception as e:
+                if not isinstance(e, JobFailed):
+                    logger.exception("job handler raised", extra={"job_type": spec.name})
+                errors = [str(e) or e.__class__.__name__] * len(jobs)
+            self._finish(jobs, errors)
+        except Exception:
+            logger.exception("job bookkeeping failed", extra={"job_type": spec.name})
+        finally:
+            with self._lock:
+                self._running[spec.name] -= 1
+            self.wake.set()
+
+    def _finish(self, jobs, errors):
+        Job = models.Job
+        now = datetime.utcnow()
+        done = [job.id for job, error in zip(jobs, errors) if error is None]
+        db = SessionLocal()
+        try:
+            if done:
+                db.execute(
+                    update(Job).where(Job.id.in_(done))
+                    .values(status="done", finished_at=now, locked_at=None, last_error=None)
+                    .execution_options(synchronize_session=False)
+                )
+            for job, error in zip(jobs, errors):
+                if error is None:
+                    continue
+                if job.attempts >= job.max_attempts:
+                    values = {"status": "failed", "finished_at": now}
+                    logger.warning("job failed", extra={"job_id": job.id, "attempts": job.attempts, "error": error})
+                else:
+                    values = {"status": "queued", "run_after": now + timedelta(seconds=retry_delay(job.attempts))}
+                    logger.info("job will retry", extra={"job_id": job.id, "attempts": job.attempts, "error": error})
+                db.execute(
+                    update(Job).where(Job.id == job.id)
+                    .values(locked_at=None, last_error=str(error)[:2000], **values)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    def _maintenance(self):
+        """Requeue jobs whose worker died and delete old finished jobs, at most once a minute."""
+        now = datetime.utcnow()
+        if self._last_maintenance and now - self._last_maintenance < timedelta(minutes=1):
+            return
+        self._last_maintenance = now
+        Job = models.Job
+        db = SessionLocal()
+        try:
+            stale = db.execute(
+                update(Job)
+                .where(Job.status == "running", Job.locked_at < now - timedelta(seconds=JOB_LOCK_TIMEOUT_SECONDS))
+                .values(status="queued", locked_at=None, run_after=now, last_error="worker lost while running")
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if stale:
+                logger.warning("stale jobs requeued", extra={"count": stale})
+            db.execute(
+                delete(Job).where(
+                    Job.status == "done",
+                    Job.finished_at < now - timedelta(days=JOB_RETENTION_DAYS),
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+job_worker = JobWorker()
+
+
+# Wake the worker as soon as a session that enqueued jobs commits
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_worker_on_commit(session):
+    if session.info.pop("jobs_enqueued", False):
+        job_worker.wake.set()
+
+
+def queue_stats(db: Session, recent_failures: int = 20) -> dict:
+    """Queue depth per type and status, oldest due job age, and the latest failures."""
+    Job = models.Job
+    now = datetime.utcnow()
+
+    counts = {}
+    for job_type, status, count in db.execute(
+        select(Job.type, Job.status, func.count(Job.id)).group_by(Job.type, Job.status)
+    ):
+        counts.setdefault(job_type, {})[status] = count
+
+    oldest_due = db.execute(
+        select(func.min(Job.run_after)).where(Job.status == "queued", Job.run_after <= now)
+    ).scalar()
+
+    failures = db.execute(
+        select(Job.id, Job.type, Job.attempts, Job.last_error, Job.finished_at)
+        .where(Job.status == "failed")
+        .order_by(Job.finished_at.desc())
+        .limit(recent_failures)
+    ).all()
+
+    return {
+        "counts": counts,
+        "oldest_due_seconds": round((now - oldest_due).total_seconds(), 1) if oldest_due else 0,
+        "running_in_this_worker": job_worker.running(),
+        "recent_failures": [
+            {
+                "job_id": f.id,
+                "type": f.type,
+                "attempts": f.attempts,
+                "error": f.last_error,
+                "failed_at": f.finished_at.isoformat() if f.finished_at else None,
+            }
+            for f in failures
+        ],
+    }
+
+
+def retry_failed_job(db: Session, job_id: int) -> bool:
+    """Put a failed job back in the queue with a fresh set of attempts."""
+    Job = models.Job
+    updated = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "failed")
+        .values(status="queued", attempts=0, run_after=datetime.utcnow(), finished_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.info["jobs_enqueued"] = True
+    db.commit()
+    return bool(updated)
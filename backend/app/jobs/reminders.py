@@ -0,0 +1,203 @@
+import heapq
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+
+from app.db import models
+from app.db.database import SessionLocal
+from app.jobs.notifications import booking_details
+from app.jobs.queue import enqueue
+
+logger = logging.getLogger(__name__)
+
+# Hours before the reservation to send a reminder; empty disables reminders
+REMINDER_OFFSETS_HOURS = [
+    float(hours) for hours in os.getenv("BOOKTABLE_REMINDER_OFFSETS_HOURS", "24,2").split(",") if hours.strip()
+]
+
+# How often the scheduler wakes to load the next slice and send due reminders
+REMINDER_POLL_SECONDS = float(os.getenv("BOOKTABLE_REMINDER_POLL_SECONDS", "30"))
+
+# Reminders are loaded this far ahead of their send time, so only a few
+# minutes of them are ever held in memory
+REMINDER_LOOKAHEAD_MINUTES = float(os.getenv("BOOKTABLE_REMINDER_LOOKAHEAD_MINUTES", "10"))
+
+# After a restart, reminders due up to this long ago are still sent
+REMINDER_GRACE_MINUTES = float(os.getenv("BOOKTABLE_REMINDER_GRACE_MINUTES", "15"))
+
+
+def _starts_between(after: datetime, until: datetime):
+    """Reservations starting in (after, until], as ranges on ix_reservations_date_time."""
+    R = models.Reservation
+    if after.date() == until.date():
+        return and_(R.date == after.date(), R.time > after.time(), R.time <= until.time())
+    return or_(
+        and_(R.date == after.date(), R.time > after.time()),
+        and_(R.date > after.date(), R.date < until.date()),
+        and_(R.date == until.date(), R.time <= until.time()),
+    )
+
+
+class ReminderScheduler:
+    """
+    Sends booking reminders REMINDER_OFFSETS_HOURS before each reservation.
+
+    Each poll reads only the reservations whose reminder falls in the next
+    slice of time (an indexed range on date and time) and pushes them on a
+    heap ordered by send time; due entries are handed to the job queue as
+    booking_reminder_email/_sms jobs. Entries are keyed on the booking_ref,
+    not the id: nothing is sent for a booking that no longer exists when its
+    reminder is due, even if a newer booking has since been given its id, so
+    cancellations need no bookkeeping. Jobs carry dedupe keys, so several
+    processes (or a restart inside the grace window) never send the same
+    reminder twice.
+    """
+
+    def __init__(self, offsets_hours=REMINDER_OFFSETS_HOURS):
+        self.offsets = [timedelta(hours=hours) for hours in offsets_hours]
+        self.lookahead = timedelta(minutes=REMINDER_LOOKAHEAD_MINUTES)
+        self._heap = []  # (send_at, booking_ref, reservation_id, offset)
+        self._scheduled = set()  # (booking_ref, offset) on the heap
+        self._loaded_until = None  # send times up to here have been loaded
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or not self.offsets:
+            return
+        self._loaded_until = datetime.now() - timedelta(minutes=REMINDER_GRACE_MINUTES)
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._stopping.clear()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("reminder poll failed")
+            self._stopping.wait(REMINDER_POLL_SECONDS)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._heap)
+
+    def _push(self, send_at: datetime, booking_ref: str, reservation_id: int, offset: timedelta):
+        if (booking_ref, offset) not in self._scheduled:
+            self._scheduled.add((booking_ref, offset))
+            heapq.heappush(self._heap, (send_at, booking_ref, reservation_id, offset))
+
+    def add(self, reservation_id: int, booking_ref: str, start: datetime):
+        """
+        Schedule a reservation booked after its slice was loaded, e.g. a
+        booking for 10:05 tomorrow made at 10:00 today. Reservations further
+        out are picked up by polling anyway.
+        """
+        now = datetime.now()
+        with self._lock:
+            if self._loaded_until is None:
+                return
+            for offset in self.offsets:
+                send_at = start - offset
+                # A reminder already past when booking would only be noise
+                if now <= send_at <= self._loaded_until:
+                    self._push(send_at, booking_ref, reservation_id, offset)
+
+    def poll(self, now: datetime = None):
+        """Load the next slice of reminders and send the ones that are due."""
+        now = now or datetime.now()
+        horizon = now + self.lookahead
+        with self._lock:
+            loaded_from = self._loaded_until
+            if loaded_from is None:
+                loaded_from = now - timedelta(minutes=REMINDER_GRACE_MINUTES)
+            # Advanced before querying: a booking committed after the query
+            # below is then pushed by add(), one committed before it is found
+            self._loaded_until = max(loaded_from, horizon)
+
+        if horizon > loaded_from:
+            R = models.Reservation
+            db = SessionLocal()
+            try:
+                for offset in self.offsets:
+                    rows = db.query(R.id, R.booking_ref, R.date, R.time).filter(
+                        _starts_between(loaded_from + offset, horizon + offset)
+                    ).all()
+                    with self._lock:
+                        for reservation_id, booking_ref, day, at in rows:
+                            self._push(datetime.combine(day, at) - offset, booking_ref, reservation_id, offset)
+            except Exception:
+                # Load the slice again next poll; entries already pushed are deduplicated
+                with self._lock:
+                    if self._loaded_until == horizon:
+                        self._loaded_until = loaded_from
+                raise
+            finally:
+                db.close()
+
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                send_at, booking_ref, reservation_id, offset = heapq.heappop(self._heap)
+                self._scheduled.discard((booking_ref, offset))
+                due.append((send_at, booking_ref, reservation_id, offset))
+        if due:
+            self._enqueue(due)
+        return len(due)
+
+    def _enqueue(self, due):
+        """Queue reminder jobs for the due entries whose reservation still stands."""
+        R, Restaurant = models.Reservation, models.Restaurant
+        for attempt in (1, 2):
+            db = SessionLocal()
+            try:
+                rows = {
+                    reservation.id: (reservation, restaurant, email)
+                    for reservation, restaurant, email in db.query(R, Restaurant, models.User.email)
+                    .join(Restaurant, Restaurant.id == R.restaurant_id)
+                    .join(models.User, models.User.id == R.user_id)
+                    .filter(R.id.in_({reservation_id for _, _, reservation_id, _ in due}), Restaurant.deleted_at.is_(None))
+                }
+                queued = 0
+                for send_at, booking_ref, reservation_id, offset in due:
+                    row = rows.get(reservation_id)
+                    # Cancelled (deleted), or its restaurant was removed
+                    if row is None:
+                        continue
+                    reservation, restaurant, email = row
+                    # The id now belongs to a later booking, which has entries of its own
+                    if reservation.booking_ref != booking_ref:
+                        continue
+                    if datetime.combine(reservation.date, reservation.time) - offset != send_at:
+                        continue
+                    details = booking_details(reservation, restaurant).dict()
+                    key = f"booking:{booking_ref}:reminder_{offset.total_seconds() / 3600:g}h"
+                    enqueue(db, "booking_reminder_email", {"to_email": email, "booking": details}, dedupe_key=f"{key}_email")
+                    if reservation.contact_phone:
+                        enqueue(db, "booking_reminder_sms", {"to_phone": reservation.contact_phone, "booking": details}, dedupe_key=f"{key}_sms")
+                    queued += 1
+                db.commit()
+                logger.info("reminders queued", extra={"due": len(due), "queued": queued})
+                return
+            except IntegrityError:
+                # Another process queued some of these first; the retry skips them
+                db.rollback()
+                if attempt == 2:
+                    raise
+            finally:
+                db.close()
+
+
+reminder_scheduler = ReminderScheduler()
@@ -1,9 +1,21 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from app.db import models
 from app.db.database import Base, engine
+from app.db.migrations import upgrade_schema
 from app.routers import users, restaurants, restaurant_manager, admin, debug
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from app.utils.static_assets import CachedStaticFiles
+from app.utils import sql_profiler
+from app.utils.logging_config import configure_logging, shutdown_logging
+from app.auth.auth_handler import shutdown_hash_pool
+from app.utils.photo_variants import shutdown_variant_pool
+from app.jobs import handlers  # noqa: F401  (registers job handlers)
+from app.jobs.queue import job_worker
+from app.jobs.reminders import reminder_scheduler
+from app.utils.booking_feed import booking_feed
+
+# ✅ Structured JSON logging through a background writer thread
+configure_logging()
 
 app = FastAPI(
     title="BookTable API",
@@ -21,13 +33,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # pagination cursor on list endpoints
 )
 
-# ✅ Static files for images
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# ✅ Opt-in SQL profiling (BOOKTABLE_SQL_PROFILE=1): per-request query counts and N+1 hints
+if sql_profiler.SQL_PROFILE_ENABLED:
+    sql_profiler.install(engine)
+
+    @app.middleware("http")
+    async def profile_sql_queries(request: Request, call_next):
+        profile, token = sql_profiler.start_profile(f"{request.method} {request.url.path}")
+        try:
+            response = await call_next(request)
+        finally:
+            sql_profiler.finish_profile(profile, token)
+        response.headers["X-SQL-Profile"] = profile.header_value()
+        return response
+
+# ✅ Static files for images: immutable caching for versioned URLs, precompressed text, ranges
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
-# ✅ Create tables
-models.Base.metadata.create_all(bind=engine)
+# ✅ Create tables and apply new columns/indexes to an existing database
+upgrade_schema(engine)
 
 # ✅ Include routers
 app.include_router(users.router)
@@ -42,6 +69,22 @@ def startup_event():
     from app.db.seed_data import seed_restaurants_tables_reviews
     seed_restaurants_tables_reviews()
 
+    # ✅ Background jobs (emails, restaurant purges) from the durable jobs table
+    job_worker.start()
+    reminder_scheduler.start()
+
+    # ✅ Live booking feed for manager dashboards
+    booking_feed.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    booking_feed.stop()
+    reminder_scheduler.stop()
+    job_worker.stop()
+    shutdown_hash_pool()
+    shutdown_variant_pool()
+    shutdown_logging()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to BookTable API 🎉"}
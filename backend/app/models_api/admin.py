@@ -1,8 +1,10 @@
 # app/models_api/admin.py
 
 from enum import Enum
-from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional
+from app.models_api.restaurant import RestaurantCreate
 
 class ApprovalStatusEnum(str, Enum):
     approved = "approved"
@@ -11,3 +13,17 @@ class ApprovalStatusEnum(str, Enum):
 class ApprovalUpdateRequest(BaseModel):
     status: ApprovalStatusEnum
     notes: Optional[str] = None
+
+class BulkApprovalUpdateRequest(ApprovalUpdateRequest):
+    approval_ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+# Bulk import rows (admin NDJSON/CSV import)
+class RestaurantImport(RestaurantCreate):
+    manager_email: Optional[EmailStr] = None
+
+class ReviewImport(BaseModel):
+    restaurant_id: int
+    user_email: EmailStr
+    rating: int = Field(..., ge=1, le=5)
+    comment: Optional[str] = None
+    created_at: Optional[datetime] = None
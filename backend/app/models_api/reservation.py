@@ -1,11 +1,13 @@
 from pydantic import BaseModel, validator
 from datetime import date, time, datetime
+from typing import Optional
 
 class ReservationCreate(BaseModel):
     table_id: int
     date: date
     time: time  # We will convert string to time using a validator
     number_of_people: int
+    phone: Optional[str] = None  # E.164; when given, booking notifications also go out by SMS
 
     @validator('time', pre=True)
     def parse_time(cls, value):
@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from datetime import date
+from pydantic import BaseModel, Field, validator
+from typing import Dict, List, Optional
+
+from app.db.table_schedules import WEEKDAYS, times_to_mask
 
 class RestaurantCreate(BaseModel):
     name: str
@@ -34,10 +37,60 @@ class RestaurantUpdate(BaseModel):
     address: Optional[str] = None
     available_times: Optional[List[str]] = None
 
+def _check_times(times):
+    if times is not None:
+        times_to_mask(times)  # raises ValueError for malformed or off-grid times
+    return times
+
 class TableCreate(BaseModel):
     size: int
-    available_times: List[str]
+    available_times: Optional[List[str]] = None  # every day; ignored once a schedule template is set
+    schedule_template_id: Optional[int] = None
+
+    _times = validator('available_times', allow_reuse=True)(_check_times)
 
 class TableUpdate(BaseModel):
     size: Optional[int] = None
     available_times: Optional[List[str]] = None
+    schedule_template_id: Optional[int] = None
+
+    _times = validator('available_times', allow_reuse=True)(_check_times)
+
+# Bulk table management: one request and one transaction for many tables
+class BulkTableCreate(BaseModel):
+    tables: List[TableCreate] = Field(..., min_length=1, max_length=1000)
+
+class TableBulkUpdate(TableUpdate):
+    id: int
+
+class BulkTableUpdate(BaseModel):
+    tables: List[TableBulkUpdate] = Field(..., min_length=1, max_length=1000)
+
+class ScheduleTemplateCreate(BaseModel):
+    name: str
+    weekdays: Dict[str, List[str]] = {}  # "mon".."sun" -> start times; missing days are closed
+    overrides: Dict[date, List[str]] = {}  # start times on one date; [] closes it (holidays)
+
+    @validator('weekdays')
+    def check_weekdays(cls, value):
+        unknown = set(value) - set(WEEKDAYS)
+        if unknown:
+            raise ValueError(f"Unknown weekdays {sorted(unknown)}; use {', '.join(WEEKDAYS)}")
+        for times in value.values():
+            _check_times(times)
+        return value
+
+    @validator('overrides')
+    def check_overrides(cls, value):
+        for times in value.values():
+            _check_times(times)
+        return value
+
+class ScheduleTemplateUpdate(ScheduleTemplateCreate):
+    name: Optional[str] = None
+    weekdays: Optional[Dict[str, List[str]]] = None  # replaces the days given
+    overrides: Dict[date, Optional[List[str]]] = {}  # null removes a date's override
+
+    @validator('weekdays')
+    def check_weekdays(cls, value):
+        return value if value is None else ScheduleTemplateCreate.check_weekdays(value)
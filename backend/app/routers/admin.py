@@ -1,12 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, update as sql_update
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Optional
 
 from app.db import models, database
 from app.db.models import RestaurantApproval
-from app.auth.auth_dependency import get_current_user
-from app.models_api.admin import ApprovalUpdateRequest
+from app.auth.auth_dependency import TokenClaims, require_role
+from app.models_api.admin import ApprovalUpdateRequest, BulkApprovalUpdateRequest
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_after
+from app.db.reservation_analytics import GRANULARITIES, GROUP_BY_DIMENSIONS, MAX_BUCKETS, count_buckets, reservation_series
+from app.jobs.queue import enqueue, queue_stats, retry_failed_job
+from app.db.export import EXPORT_FORMATS, EXPORT_KINDS, export_query, iter_csv, iter_parquet, parquet_available
+from app.db.bulk_import import IMPORT_FORMATS, IMPORT_KINDS, ChunkedRows, LineSplitter, import_chunk
 
 router = APIRouter(
     prefix="/admin",
@@ -20,43 +28,105 @@ def get_db():
     finally:
         db.close()
 
+# Pending approvals, oldest submission first, one page at a time. The cursor for
+# the next page is returned in the X-Next-Cursor header (absent on the last page).
 @router.get("/restaurants/pending")
 def get_pending_approvals(
+    response: Response,
+    city: Optional[str] = None,
+    cuisine: Optional[str] = None,
+    min_age_days: Optional[int] = Query(None, ge=0),
+    max_age_days: Optional[int] = Query(None, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can access this endpoint."))
 ):
-    if current_user.role != "Admin":
-        raise HTTPException(status_code=403, detail="Only admins can access this endpoint.")
+    Restaurant = models.Restaurant
+    sort_columns = [RestaurantApproval.submitted_at, RestaurantApproval.id]
 
-    pending_approvals = db.query(RestaurantApproval).filter(
-        RestaurantApproval.status == "pending"
-    ).all()
+    # ✅ Restaurant fields come from the same query instead of a lazy load per approval
+    query = (
+        db.query(
+            RestaurantApproval.id,
+            RestaurantApproval.restaurant_id,
+            RestaurantApproval.status,
+            RestaurantApproval.submitted_at,
+            Restaurant.name,
+            Restaurant.city,
+            Restaurant.state,
+            Restaurant.zip_code,
+            Restaurant.cuisine,
+            Restaurant.cost_rating,
+        )
+        .join(Restaurant, Restaurant.id == RestaurantApproval.restaurant_id)
+        .filter(RestaurantApproval.status == "pending", Restaurant.deleted_at.is_(None))
+    )
+    if city:
+        query = query.filter(Restaurant.city == city)
+    if cuisine:
+        query = query.filter(Restaurant.cuisine == cuisine)
+    now = datetime.utcnow()
+    if min_age_days is not None:
+        query = query.filter(RestaurantApproval.submitted_at <= now - timedelta(days=min_age_days))
+    if max_age_days is not None:
+        query = query.filter(RestaurantApproval.submitted_at >= now - timedelta(days=max_age_days))
+    if cursor:
+        query = query.filter(keyset_after(sort_columns, decode_cursor(cursor, len(sort_columns), (0,)), descending=False))
+
+    rows = query.order_by(*sort_columns).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([rows[-1].submitted_at, rows[-1].id])
 
     return [
         {
-            "approval_id": approval.id,
-            "restaurant_id": approval.restaurant_id,
-            "restaurant_name": approval.restaurant.name,
-            "status": approval.status,
-            "city": approval.restaurant.city if approval.restaurant else None,
-            "state": approval.restaurant.state if approval.restaurant else None,
-            "zip_code": approval.restaurant.zip_code if approval.restaurant else None,
-            "cuisine": approval.restaurant.cuisine if approval.restaurant else None,
-            "cost_rating": approval.restaurant.cost_rating if approval.restaurant else None
+            "approval_id": row.id,
+            "restaurant_id": row.restaurant_id,
+            "restaurant_name": row.name,
+            "status": row.status,
+            "submitted_at": row.submitted_at.isoformat() if row.submitted_at else None,
+            "city": row.city,
+            "state": row.state,
+            "zip_code": row.zip_code,
+            "cuisine": row.cuisine,
+            "cost_rating": row.cost_rating
         }
-        for approval in pending_approvals
+        for row in rows
     ]
 
+# Approve or reject many pending restaurants at once, in one statement and transaction
+@router.put("/restaurants/status")
+def bulk_update_approval_status(
+    update: BulkApprovalUpdateRequest,
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can update approval status."))
+):
+    requested = set(update.approval_ids)
+    updated = db.execute(
+        sql_update(RestaurantApproval)
+        .where(RestaurantApproval.id.in_(requested), RestaurantApproval.status == "pending")
+        .values(status=update.status.value, admin_notes=update.notes)
+        .returning(RestaurantApproval.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+
+    # Approvals that do not exist or were already decided are left untouched
+    return {
+        "message": f"{len(updated)} restaurant(s) {update.status.value} successfully",
+        "updated": sorted(updated),
+        "skipped": sorted(requested - set(updated)),
+    }
+
 @router.put("/restaurants/{approval_id}/status")
 def update_approval_status(
     approval_id: int,
     update: ApprovalUpdateRequest,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can update approval status."))
 ):
-    if current_user.role != "Admin":
-        raise HTTPException(status_code=403, detail="Only admins can update approval status.")
-
     approval = db.query(RestaurantApproval).filter(RestaurantApproval.id == approval_id).first()
     if not approval:
         raise HTTPException(status_code=404, detail="Approval record not found.")
@@ -75,69 +145,183 @@ def update_approval_status(
 def remove_restaurant(
     restaurant_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can remove restaurants."))
 ):
-    if current_user.role != "Admin":
-        raise HTTPException(status_code=403, detail="Only admins can remove restaurants.")
+    # Soft delete and purge job commit together, so a restart cannot lose the purge
+    database.begin_atomic(db)
 
-    restaurant = db.query(models.Restaurant).filter(models.Restaurant.id == restaurant_id).first()
+    restaurant = db.query(models.Restaurant).filter(
+        models.Restaurant.id == restaurant_id,
+        models.Restaurant.deleted_at.is_(None)
+    ).first()
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found.")
 
-    db.query(models.Review).filter(models.Review.restaurant_id == restaurant_id).delete()
-    db.query(models.Reservation).filter(models.Reservation.restaurant_id == restaurant_id).delete()
-    db.query(models.Table).filter(models.Table.restaurant_id == restaurant_id).delete()
-    db.query(RestaurantApproval).filter(RestaurantApproval.restaurant_id == restaurant_id).delete()
-
-    db.delete(restaurant)
+    # ✅ Hidden from search and booking immediately; dependent rows and uploaded
+    # photos are deleted in small batches after the response is sent
+    restaurant.deleted_at = datetime.utcnow()
+    enqueue(db, "restaurant_purge", {"restaurant_id": restaurant_id})
     db.commit()
 
-    return {"message": f"Restaurant {restaurant_id} and all associated data removed successfully"}
+    return {"message": f"Restaurant {restaurant_id} removed; associated data is being deleted in the background"}
+
+@router.post("/import/{kind}")
+async def bulk_import(
+    kind: str,
+    request: Request,
+    format: str = "ndjson",
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can import data."))
+):
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=404, detail="Import kind must be 'restaurants' or 'reviews'.")
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be 'ndjson' or 'csv'.")
+
+    # ✅ Stream the body line by line; only one chunk of rows (and one capped line) is held in memory
+    rows, lines = ChunkedRows(format), LineSplitter()
+
+    async def flush(chunk):
+        # ✅ DB work runs in the threadpool so the event loop keeps serving requests
+        if chunk:
+            await run_in_threadpool(import_chunk, db, kind, chunk, rows.report)
+
+    async for data in request.stream():
+        for line in lines.feed(data):
+            await flush(rows.add(line))
+    for line in lines.finish():
+        await flush(rows.add(line))
+    await flush(rows.finish())
+
+    return rows.report.as_dict()
+
+@router.get("/export/{kind}")
+def export_data(
+    kind: str,
+    format: str = "csv",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    restaurant_id: Optional[int] = None,
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can export data."))
+):
+    if kind not in EXPORT_KINDS:
+        raise HTTPException(status_code=404, detail="Export kind must be 'reservations' or 'reviews'.")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be 'csv' or 'parquet'.")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires the pyarrow package.")
+
+    # ✅ Filters run in SQL; rows are streamed in batches so memory stays flat at any size
+    query = export_query(kind, date_from, date_to, restaurant_id)
+    if format == "csv":
+        body, media_type = iter_csv(kind, query), "text/csv"
+    else:
+        body, media_type = iter_parquet(kind, query), "application/vnd.apache.parquet"
+
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{format}"'},
+    )
+
+# Background job queue: depth per type and status, and the latest failures
+@router.get("/jobs")
+def get_job_queue(
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can view the job queue."))
+):
+    return queue_stats(db)
+
+@router.post("/jobs/{job_id}/retry")
+def retry_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can retry jobs."))
+):
+    if not retry_failed_job(db, job_id):
+        raise HTTPException(status_code=404, detail="Failed job not found.")
+    return {"message": f"Job {job_id} queued for retry"}
 
 @router.get("/analytics/reservations")
 def get_reservation_analytics(
     timeframe: str = "month",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    granularity: str = "day",
+    group_by: Optional[str] = None,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can access analytics."))
 ):
-    if current_user.role != "Admin":
-        raise HTTPException(status_code=403, detail="Only admins can access analytics.")
-    
     today = datetime.now().date()
-    if timeframe == "week":
+    end_date = today
+    if date_from is not None or date_to is not None:
+        # ✅ Explicit range; a missing end defaults to today, a missing start to 30 days before the end
+        end_date = date_to or today
+        start_date = date_from or end_date - timedelta(days=30)
+        timeframe = "custom"
+    elif timeframe == "week":
         start_date = today - timedelta(days=7)
     elif timeframe == "month":
         start_date = today - timedelta(days=30)
     else:
         raise HTTPException(status_code=400, detail="Timeframe must be 'week' or 'month'.")
 
-    reservations = db.query(models.Reservation).filter(
-        models.Reservation.date >= start_date,
-        models.Reservation.date <= today
-    ).all()
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail="Granularity must be 'hour', 'day', 'week' or 'month'.")
+    if group_by is not None and group_by not in GROUP_BY_DIMENSIONS:
+        raise HTTPException(status_code=400, detail="group_by must be 'city', 'cuisine' or 'restaurant'.")
+    if count_buckets(granularity, start_date, end_date) > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail="Date range too large for this granularity.")
+
+    # ✅ Aggregated in SQL from the per-hour rollups; the reservations table is never scanned
+    Rollup = models.ReservationRollup
+    in_window = (Rollup.date >= start_date, Rollup.date <= end_date)
 
-    total_reservations = len(reservations)
+    series = reservation_series(db, start_date, end_date, granularity, group_by)
 
-    # Daily trend
-    daily_counter = Counter(str(r.date) for r in reservations)
-    daily_trend = [{"date": date, "count": count} for date, count in sorted(daily_counter.items())]
+    # Daily trend and totals come from the (cached) ungrouped daily series
+    daily = reservation_series(db, start_date, end_date, "day")
+    total_reservations = sum(entry["reservations"] for entry in daily)
+    cancelled_reservations = sum(entry["cancellations"] for entry in daily)
+    daily_trend = [{"date": entry["bucket"], "count": entry["reservations"]} for entry in daily if entry["reservations"]]
 
     # Hourly chart
-    hourly_counter = Counter(r.time.strftime("%H:%M") for r in reservations)
-    hourly_distribution = [{"label": hour, "count": count} for hour, count in sorted(hourly_counter.items())]
+    hourly_rows = (
+        db.query(Rollup.hour, func.sum(Rollup.reservations))
+        .filter(*in_window)
+        .group_by(Rollup.hour)
+        .having(func.sum(Rollup.reservations) > 0)
+        .order_by(Rollup.hour)
+        .all()
+    )
+    hourly_distribution = [{"label": f"{hour:02d}:00", "count": count} for hour, count in hourly_rows]
 
     # Top 5 restaurants by reservation count
-    restaurant_counter = Counter(r.restaurant.name for r in reservations)
-    top_restaurants = restaurant_counter.most_common(5)
+    bookings = func.sum(Rollup.reservations).label("bookings")
+    top_restaurants = (
+        db.query(models.Restaurant.name, bookings)
+        .join(models.Restaurant, models.Restaurant.id == Rollup.restaurant_id)
+        .filter(*in_window, models.Restaurant.deleted_at.is_(None))
+        .group_by(Rollup.restaurant_id, models.Restaurant.name)
+        .having(bookings > 0)
+        .order_by(bookings.desc())
+        .limit(5)
+        .all()
+    )
     restaurant_distribution = [{"restaurant": name, "count": count} for name, count in top_restaurants]
 
     return {
         "timeframe": timeframe,
         "start_date": str(start_date),
-        "end_date": str(today),
+        "end_date": str(end_date),
         "total_reservations": total_reservations,
-        "cancelled_reservations": 0,  # Placeholder for future support
+        "cancelled_reservations": cancelled_reservations,
         "daily_trend": daily_trend,
         "hourly_distribution": hourly_distribution,
-        "restaurant_distribution": restaurant_distribution
+        "restaurant_distribution": restaurant_distribution,
+        "granularity": granularity,
+        "group_by": group_by,
+        "series": series
     }
@@ -1,7 +1,9 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from sendgrid import SendGridAPIClient
 from app.utils.email_utils import send_booking_confirmation, BookingConfirmationDetails
+from app.utils import sql_profiler
+from app.auth.auth_dependency import TokenClaims, require_role
 
 import os
 
@@ -44,3 +46,22 @@ def test_sendgrid_email():
         return {"env": env_log, "sendgrid_result": result}
     except Exception as e:
         return {"env": env_log, "error": str(e), "success": False}
+
+
+# Statement shapes reveal the schema and query patterns, so only admins may read them
+@router.get("/debug/sql-profile")
+def get_sql_profile(
+    limit: int = 20,
+    n_plus_one_only: bool = False,
+    current_user: TokenClaims = Depends(require_role("Admin", detail="Only admins can access this endpoint."))
+):
+    # Most recent request reports collected by the SQL profiling middleware
+    reports = list(sql_profiler.recent_reports)[-limit:]
+    if n_plus_one_only:
+        reports = [r for r in reports if r["suspected_n_plus_one"]]
+
+    return {
+        "enabled": sql_profiler.SQL_PROFILE_ENABLED,
+        "n_plus_one_threshold": sql_profiler.N_PLUS_ONE_THRESHOLD,
+        "reports": list(reversed(reports))
+    }
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+import json
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import insert, select, update
 from sqlalchemy.orm import Session
 from typing import Optional, List
-import os
 
 from app.db import models, database
 from app.db.models import Restaurant, RestaurantApproval
 from app.db.models import RestaurantPhoto
-from app.auth.auth_dependency import get_current_user
-from app.models_api.restaurant import RestaurantCreate, RestaurantUpdate, TableCreate, TableUpdate
+from app.db.manager_dashboard import approval_status, manager_dashboard
+from app.db.table_schedules import encode_week, set_overrides, template_to_dict
+from app.auth.auth_dependency import TokenClaims, decode_token, require_role
+from app.models_api.restaurant import (
+    RestaurantCreate, RestaurantUpdate, TableCreate, TableUpdate, BulkTableCreate, BulkTableUpdate,
+    ScheduleTemplateCreate, ScheduleTemplateUpdate,
+)
+from app.jobs.queue import enqueue
+from app.utils.photo_storage import PhotoTooLarge, UnsupportedPhoto, store_photo
+from app.utils.booking_feed import BOOKING_FEED_MAX_SUBSCRIBERS, FeedFull, booking_feed
 
 router = APIRouter(
     prefix="/manager",
@@ -29,24 +39,102 @@ def get_db():
 @router.get("/my-restaurants")
 def view_my_restaurants(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can view their restaurants."))
 ):
-    if current_user.role != "RestaurantManager":
-        raise HTTPException(status_code=403, detail="Only restaurant managers can view their restaurants.")
-    
-    restaurants = db.query(Restaurant).filter(Restaurant.manager_id == current_user.id).all()
-    results = []
-    for r in restaurants:
-        approval = db.query(RestaurantApproval).filter(RestaurantApproval.restaurant_id == r.id).first()
-        results.append({
-            "id": r.id,
-            "name": r.name,
-            "cuisine": r.cuisine,
-            "city": r.city,
-            "status": approval.status if approval else "unknown"
-        })
+    restaurants = db.query(
+        Restaurant.id, Restaurant.name, Restaurant.cuisine, Restaurant.city, approval_status().label("status")
+    ).filter(Restaurant.manager_id == current_user.id, Restaurant.deleted_at.is_(None)).all()
+
+    return [
+        {"id": r.id, "name": r.name, "cuisine": r.cuisine, "city": r.city, "status": r.status or "unknown"}
+        for r in restaurants
+    ]
+
+# -----------------------------------------------
+# ✅ Dashboard: status, today's bookings, upcoming covers and rating per restaurant
+# -----------------------------------------------
+@router.get("/dashboard")
+def view_dashboard(
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can view their dashboard."))
+):
+    # ✅ A constant number of grouped queries, however many locations the manager has
+    return manager_dashboard(db, current_user.id)
+
+# -----------------------------------------------
+# ✅ Live Booking Feed (Server-Sent Events or WebSocket) instead of polling
+# -----------------------------------------------
+def _feed_restaurant_ids(manager_id: int, restaurant_id: Optional[int]) -> List[int]:
+    db = database.SessionLocal()
+    try:
+        ids = [rid for (rid,) in db.query(Restaurant.id).filter(Restaurant.manager_id == manager_id, Restaurant.deleted_at.is_(None))]
+    finally:
+        db.close()
+    if restaurant_id is not None:
+        if restaurant_id not in ids:
+            raise HTTPException(status_code=404, detail="Restaurant not found.")
+        ids = [restaurant_id]
+    return ids
+
+@router.get("/bookings/feed")
+async def stream_booking_feed(
+    restaurant_id: Optional[int] = None,
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can follow bookings."))
+):
+    restaurant_ids = await run_in_threadpool(_feed_restaurant_ids, current_user.id, restaurant_id)
+    if booking_feed.subscribers() >= BOOKING_FEED_MAX_SUBSCRIBERS:
+        raise HTTPException(status_code=503, detail="Too many live feed connections; try again later.")
+
+    async def events():
+        try:
+            subscription = booking_feed.subscribe(restaurant_ids)
+        except FeedFull as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+            return
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                batch = await subscription.next_batch()
+                if not batch:
+                    yield ": ping\n\n"
+                    continue
+                yield "".join(f"event: {e['type']}\ndata: {json.dumps(e)}\n\n" for e in batch)
+        finally:
+            # ✅ Runs when the client disconnects and the response task is cancelled
+            booking_feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-    return results
+@router.websocket("/bookings/ws")
+async def websocket_booking_feed(websocket: WebSocket, token: str, restaurant_id: Optional[int] = None):
+    # Browsers cannot set headers on WebSockets, so the access token comes in the query string
+    try:
+        claims = decode_token(token)
+        if claims.role != "RestaurantManager":
+            raise HTTPException(status_code=403)
+        restaurant_ids = await run_in_threadpool(_feed_restaurant_ids, claims.id, restaurant_id)
+        subscription = booking_feed.subscribe(restaurant_ids)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    except FeedFull:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    try:
+        await websocket.accept()
+        while True:
+            batch = await subscription.next_batch()
+            for e in batch or [{"type": "ping"}]:
+                await websocket.send_text(json.dumps(e))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        booking_feed.unsubscribe(subscription)
 
 # -----------------------------------------------
 # ✅ Create a New Restaurant Listing
@@ -55,11 +143,8 @@ def view_my_restaurants(
 def create_restaurant(
     restaurant_data: RestaurantCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can add new listings."))
 ):
-    if current_user.role != "RestaurantManager":
-        raise HTTPException(status_code=403, detail="Only restaurant managers can add new listings.")
-
     new_restaurant = Restaurant(
         name=restaurant_data.name,
         address=restaurant_data.address,
@@ -91,6 +176,15 @@ def create_restaurant(
         "restaurant_id": new_restaurant.id
     }
 
+def _managed_restaurant(db: Session, restaurant_id: int, current_user: TokenClaims) -> Restaurant:
+    """The live restaurant, if the current manager runs it: 404 if it does not exist, 403 if it is someone else's."""
+    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id, Restaurant.deleted_at.is_(None)).first()
+    if not restaurant:
+        raise HTTPException(status_code=404, detail="Restaurant not found.")
+    if restaurant.manager_id != current_user.id:
+        raise HTTPException(status_code=403, detail="You do not manage this restaurant.")
+    return restaurant
+
 # -----------------------------------------------
 # ✅ Update an Existing Restaurant
 # -----------------------------------------------
@@ -99,14 +193,9 @@ def update_restaurant(
     restaurant_id: int,
     restaurant_data: RestaurantUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can update restaurants."))
 ):
-    if current_user.role != "RestaurantManager":
-        raise HTTPException(status_code=403, detail="Only restaurant managers can update restaurants.")
-
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found.")
+    restaurant = _managed_restaurant(db, restaurant_id, current_user)
 
     for field, value in restaurant_data.dict(exclude_unset=True).items():
         setattr(restaurant, field, value)
@@ -125,41 +214,89 @@ def upload_photo(
     file: UploadFile = File(...),
     description: Optional[str] = Form(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can upload photos."))
 ):
-    if current_user.role != "RestaurantManager":
-        raise HTTPException(status_code=403, detail="Only restaurant managers can upload photos.")
-
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found.")
-
-    upload_dir = os.path.join("static", "uploads")
-    os.makedirs(upload_dir, exist_ok=True)
-
-    safe_filename = file.filename.replace(" ", "_")
-    filename = f"{restaurant_id}_{safe_filename}"
-    file_path = os.path.join(upload_dir, filename)
+    _managed_restaurant(db, restaurant_id, current_user)
 
-    with open(file_path, "wb") as f:
-        f.write(file.file.read())
+    # ✅ Streamed to disk in chunks under a content-hash name (app/utils/photo_storage.py);
+    # this endpoint is sync, so the copy runs on a worker thread, not the event loop
+    try:
+        photo_url = store_photo(file.file)
+    except PhotoTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedPhoto as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    finally:
+        file.file.close()
+
+    # Uploading the same image again returns the existing photo
+    existing = db.query(RestaurantPhoto).filter(
+        RestaurantPhoto.restaurant_id == restaurant_id,
+        RestaurantPhoto.photo_url == photo_url
+    ).first()
+    if existing:
+        return JSONResponse(content={
+            "message": "Photo already uploaded ✅",
+            "photo_url": photo_url
+        })
 
-    photo_url = f"/static/uploads/{filename}"
+    # An image already uploaded elsewhere reuses its variants
+    variants = db.query(RestaurantPhoto.variants).filter(
+        RestaurantPhoto.photo_url == photo_url,
+        RestaurantPhoto.variants.isnot(None)
+    ).limit(1).scalar()
 
     new_photo = RestaurantPhoto(
         restaurant_id=restaurant_id,
         photo_url=photo_url,
-        description=description
+        description=description,
+        variants=variants
     )
     db.add(new_photo)
+    if variants is None:
+        # ✅ Thumbnails and WebP/AVIF copies are rendered by a background job
+        enqueue(db, "photo_variants", {"photo_url": photo_url})
     db.commit()
-    db.refresh(new_photo)
 
     return JSONResponse(content={
         "message": "Photo uploaded successfully ✅",
         "photo_url": photo_url
     })
 
+def _check_schedule_templates(db: Session, restaurant_id: int, tables):
+    """Every schedule template the tables refer to must belong to the restaurant."""
+    requested = {t.schedule_template_id for t in tables if t.schedule_template_id is not None}
+    if not requested:
+        return
+    found = set(db.execute(
+        select(models.ScheduleTemplate.id).where(
+            models.ScheduleTemplate.id.in_(requested), models.ScheduleTemplate.restaurant_id == restaurant_id
+        )
+    ).scalars())
+    if requested - found:
+        raise HTTPException(status_code=404, detail=f"Schedule templates not found: {sorted(requested - found)}")
+
+def _new_table_row(restaurant_id: int, table_data: TableCreate) -> dict:
+    if table_data.available_times is None and table_data.schedule_template_id is None:
+        raise HTTPException(status_code=400, detail="Each table needs available_times or a schedule_template_id.")
+    return {
+        "restaurant_id": restaurant_id,
+        "size": table_data.size,
+        "available_times": ",".join(table_data.available_times or []),
+        "schedule_template_id": table_data.schedule_template_id,
+    }
+
+def _table_changes(table_data: TableUpdate) -> dict:
+    changes = {}
+    if table_data.size:
+        changes["size"] = table_data.size
+    if table_data.available_times:
+        changes["available_times"] = ",".join(table_data.available_times)
+    # Sent as null, this puts the table back on its available_times
+    if "schedule_template_id" in table_data.dict(exclude_unset=True):
+        changes["schedule_template_id"] = table_data.schedule_template_id
+    return changes
+
 # -----------------------------------------------
 # ✅ Add Table
 # -----------------------------------------------
@@ -168,20 +305,12 @@ def add_table(
     restaurant_id: int,
     table_data: TableCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can add tables."))
 ):
-    if current_user.role != "RestaurantManager":
-        raise HTTPException(status_code=403, detail="Only restaurant managers can add tables.")
+    _managed_restaurant(db, restaurant_id, current_user)
+    _check_schedule_templates(db, restaurant_id, [table_data])
 
-    restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found.")
-
-    new_table = models.Table(
-        restaurant_id=restaurant_id,
-        size=table_data.size,
-        available_times=",".join(table_data.available_times)
-    )
+    new_table = models.Table(**_new_table_row(restaurant_id, table_data))
 
     db.add(new_table)
     db.commit()
@@ -189,6 +318,28 @@ def add_table(
 
     return {"message": "Table added successfully", "table_id": new_table.id}
 
+# -----------------------------------------------
+# ✅ Add Many Tables in One Request
+# -----------------------------------------------
+@router.post("/restaurants/{restaurant_id}/tables/bulk")
+def add_tables(
+    restaurant_id: int,
+    bulk: BulkTableCreate,
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can add tables."))
+):
+    # ✅ All tables are added or none
+    database.begin_atomic(db)
+    _managed_restaurant(db, restaurant_id, current_user)
+    _check_schedule_templates(db, restaurant_id, bulk.tables)
+    rows = [_new_table_row(restaurant_id, table_data) for table_data in bulk.tables]
+
+    # ✅ One multi-row INSERT
+    table_ids = db.execute(insert(models.Table).values(rows).returning(models.Table.id)).scalars().all()
+    db.commit()
+
+    return {"message": f"{len(table_ids)} table(s) added successfully", "table_ids": table_ids}
+
 # -----------------------------------------------
 # ✅ Update Table
 # -----------------------------------------------
@@ -197,25 +348,120 @@ def update_table(
     table_id: int,
     table_data: TableUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can update tables."))
 ):
-    if current_user.role != "RestaurantManager":
-        raise HTTPException(status_code=403, detail="Only restaurant managers can update tables.")
-
     table = db.query(models.Table).filter(models.Table.id == table_id).first()
     if not table:
         raise HTTPException(status_code=404, detail="Table not found.")
 
-    restaurant = db.query(Restaurant).filter(Restaurant.id == table.restaurant_id).first()
-    if not restaurant:
-        raise HTTPException(status_code=404, detail="Restaurant not found.")
+    _managed_restaurant(db, table.restaurant_id, current_user)
+    _check_schedule_templates(db, table.restaurant_id, [table_data])
 
-    if table_data.size:
-        table.size = table_data.size
-    if table_data.available_times:
-        table.available_times = ",".join(table_data.available_times)
+    for field, value in _table_changes(table_data).items():
+        setattr(table, field, value)
 
     db.commit()
     db.refresh(table)
 
     return {"message": "Table updated successfully"}
+
+# -----------------------------------------------
+# ✅ Update Many Tables in One Request
+# -----------------------------------------------
+@router.put("/restaurants/{restaurant_id}/tables/bulk")
+def update_tables(
+    restaurant_id: int,
+    bulk: BulkTableUpdate,
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can update tables."))
+):
+    # ✅ All tables are updated or none
+    database.begin_atomic(db)
+    _managed_restaurant(db, restaurant_id, current_user)
+    _check_schedule_templates(db, restaurant_id, bulk.tables)
+
+    requested = {t.id for t in bulk.tables}
+    found = set(db.execute(
+        select(models.Table.id).where(models.Table.id.in_(requested), models.Table.restaurant_id == restaurant_id)
+    ).scalars())
+    if requested - found:
+        raise HTTPException(status_code=404, detail=f"Tables not found for this restaurant: {sorted(requested - found)}")
+
+    rows = [{"id": t.id, **_table_changes(t)} for t in bulk.tables]
+    rows = [row for row in rows if len(row) > 1]
+
+    # ✅ Bulk UPDATE by primary key, one executemany per set of changed columns
+    if rows:
+        db.execute(update(models.Table), rows)
+    db.commit()
+
+    return {"message": f"{len(rows)} table(s) updated successfully", "updated": sorted(row["id"] for row in rows)}
+
+# -----------------------------------------------
+# ✅ Weekly Schedule Templates (with date overrides) for Tables
+# -----------------------------------------------
+def _schedule_response(db: Session, templates) -> list:
+    overrides = {}
+    if templates:
+        for override in db.query(models.ScheduleOverride).filter(
+            models.ScheduleOverride.template_id.in_([t.id for t in templates])
+        ).order_by(models.ScheduleOverride.date):
+            overrides.setdefault(override.template_id, []).append(override)
+    return [template_to_dict(t, overrides.get(t.id, [])) for t in templates]
+
+@router.get("/restaurants/{restaurant_id}/schedules")
+def list_schedules(
+    restaurant_id: int,
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can view schedules."))
+):
+    _managed_restaurant(db, restaurant_id, current_user)
+    templates = db.query(models.ScheduleTemplate).filter(
+        models.ScheduleTemplate.restaurant_id == restaurant_id
+    ).order_by(models.ScheduleTemplate.id).all()
+    return _schedule_response(db, templates)
+
+@router.post("/restaurants/{restaurant_id}/schedules")
+def create_schedule(
+    restaurant_id: int,
+    schedule: ScheduleTemplateCreate,
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can add schedules."))
+):
+    database.begin_atomic(db)
+    _managed_restaurant(db, restaurant_id, current_user)
+
+    template = models.ScheduleTemplate(
+        restaurant_id=restaurant_id,
+        name=schedule.name,
+        weekly_slots=encode_week(schedule.weekdays),
+    )
+    db.add(template)
+    db.flush()
+    set_overrides(db, template, schedule.overrides)
+    db.commit()
+
+    return {"message": "Schedule added successfully", "schedule_id": template.id}
+
+@router.put("/schedules/{schedule_id}")
+def update_schedule(
+    schedule_id: int,
+    schedule: ScheduleTemplateUpdate,
+    db: Session = Depends(get_db),
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only restaurant managers can update schedules."))
+):
+    database.begin_atomic(db)
+    template = db.query(models.ScheduleTemplate).filter(models.ScheduleTemplate.id == schedule_id).first()
+    if not template:
+        raise HTTPException(status_code=404, detail="Schedule not found.")
+    _managed_restaurant(db, template.restaurant_id, current_user)
+
+    if schedule.name:
+        template.name = schedule.name
+    if schedule.weekdays:
+        current = template_to_dict(template, [])["weekdays"]
+        template.weekly_slots = encode_week({**current, **schedule.weekdays})
+    set_overrides(db, template, schedule.overrides)
+    db.commit()
+
+    return _schedule_response(db, [template])[0]
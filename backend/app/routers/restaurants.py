@@ -1,13 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime, timedelta
 from app.db import models, database
-from app.auth.auth_dependency import get_current_user
+from app.auth.auth_dependency import TokenClaims, get_token_claims, require_role
 from app.db.models import User, RestaurantApproval  # ⬅️ Make sure this is here
 from app.models_api.restaurant import RestaurantCreate
 from app.models_api.reservation import ReservationCreate
-from app.utils.email_utils import send_booking_confirmation, BookingConfirmationDetails
+from app.jobs.notifications import enqueue_booking_notifications
+from app.jobs.reminders import reminder_scheduler
+from app.utils.booking_feed import booking_event, booking_feed
+from app.db.rating_aggregates import apply_new_review, summary_to_dict
+from app.db.reservation_rollups import apply_reservation_change
+from app.db.restaurant_images import card_images
+from app.db.table_schedules import slot_masks, slot_time, window_mask
+from app.utils.pagination import NEXT_CURSOR_HEADER, encode_cursor, decode_cursor, keyset_after
 from app.db import models
 from app.db.models import RestaurantPhoto
 from sqlalchemy.exc import OperationalError
@@ -18,6 +26,8 @@ from app.models_api.reservation import ReservationRequest
 
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(
     prefix="/restaurants",
     tags=["Restaurants"]
@@ -29,6 +39,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
 @router.get("/search", response_model=List[dict])
 def search_restaurants(
     date: Optional[str] = None,
@@ -40,10 +51,11 @@ def search_restaurants(
     cuisine: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    print(f"Search params: date={date}, time={time}, people={people}, city={city}, state={state}, zip_code={zip_code}")
-
     # Join with RestaurantApproval to only get approved ones
-    query = db.query(models.Restaurant).join(RestaurantApproval).filter(RestaurantApproval.status == "approved")
+    query = db.query(models.Restaurant).join(RestaurantApproval).filter(
+        RestaurantApproval.status == "approved",
+        models.Restaurant.deleted_at.is_(None)
+    )
 
     if city and city.strip():
         query = query.filter(models.Restaurant.city.ilike(f"%{city}%"))
@@ -55,7 +67,10 @@ def search_restaurants(
         query = query.filter(models.Restaurant.cuisine.ilike(f"%{cuisine}%"))
 
     restaurants = query.all()
-    print(f"Found {len(restaurants)} approved restaurants")
+    images = card_images(db, [r.id for r in restaurants])
+    logger.debug("restaurant search", extra={
+        "city": city, "state": state, "zip_code": zip_code, "cuisine": cuisine, "results": len(restaurants)
+    })
 
     return [
         {
@@ -68,7 +83,8 @@ def search_restaurants(
             "zip_code": r.zip_code,
             "rating": r.rating,
             "total_bookings": r.total_bookings,
-            "maps_url": f"https://www.google.com/maps/search/?api=1&query={'+'.join(r.name.split())}+{r.zip_code}+{'+'.join(r.city.split())}+{r.state}"
+            "maps_url": f"https://www.google.com/maps/search/?api=1&query={'+'.join(r.name.split())}+{r.zip_code}+{'+'.join(r.city.split())}+{r.state}",
+            **images[r.id]
         }
         for r in restaurants
     ]
@@ -94,7 +110,10 @@ def search_availability(
     start_time = (datetime.combine(date_obj, target_time) - timedelta(minutes=30)).time()
     end_time = (datetime.combine(date_obj, target_time) + timedelta(minutes=30)).time()
 
-    restaurant_query = db.query(models.Restaurant).join(models.RestaurantApproval).filter(models.RestaurantApproval.status == "approved")
+    restaurant_query = db.query(models.Restaurant).join(models.RestaurantApproval).filter(
+        models.RestaurantApproval.status == "approved",
+        models.Restaurant.deleted_at.is_(None)
+    )
 
     if city:
         restaurant_query = restaurant_query.filter(models.Restaurant.city.ilike(f"%{city}%"))
@@ -104,45 +123,43 @@ def search_availability(
         restaurant_query = restaurant_query.filter(models.Restaurant.zip_code == zip_code)
 
     matching_restaurants = []
-
-    for restaurant in restaurant_query.all():
-        for table in restaurant.tables:
-            if table.size >= people:
-                available_times = [t.strip() for t in table.available_times.split(",")]
-                for t in available_times:
-                    try:
-                        t_obj = datetime.strptime(t, "%H:%M").time()
-                        if start_time <= t_obj <= end_time:
-                            # Fetch main image
-                            image_url = None
-                            if restaurant.photos:
-                                for p in restaurant.photos:
-                                    if p.photo_url:
-                                        image_url = p.photo_url
-                                        break
-                            if not image_url:
-                                image_url = f"https://source.unsplash.com/featured/?restaurant,{restaurant.cuisine}"
-
-                            matching_restaurants.append({
-                                "restaurant_id": restaurant.id,
-                                "restaurant_name": restaurant.name,
-                                "table_id": table.id,
-                                "available_time": t,
-                                "city": restaurant.city,
-                                "state": restaurant.state,
-                                "zip_code": restaurant.zip_code,
-                                "cuisine": restaurant.cuisine,
-                                "cost_rating": restaurant.cost_rating,
-                                "rating": restaurant.rating,
-                                "total_bookings": restaurant.total_bookings,
-                                "maps_url": f"https://www.google.com/maps/search/?api=1&query={'+'.join(restaurant.name.split())}+{restaurant.zip_code}+{'+'.join(restaurant.city.split())}+{restaurant.state}",
-                                "contact": getattr(restaurant, 'contact', None),
-                                "image": image_url,
-                                "description": restaurant.description or f"Enjoy a wonderful {restaurant.cuisine} dining experience in {restaurant.city}."
-                            })
-                            break
-                    except ValueError:
-                        continue
+    restaurants = restaurant_query.all()
+    images = card_images(db, [r.id for r in restaurants])
+
+    # ✅ All candidate tables in one query; their slots for the date in at most two more
+    tables = db.query(models.Table.id, models.Table.restaurant_id, models.Table.schedule_template_id, models.Table.available_times).filter(
+        models.Table.restaurant_id.in_([r.id for r in restaurants]),
+        models.Table.size >= people
+    ).order_by(models.Table.restaurant_id, models.Table.id).all() if restaurants else []
+    masks = slot_masks(db, tables, date_obj)
+    window = window_mask(start_time, end_time)
+
+    tables_by_restaurant = {}
+    for table in tables:
+        tables_by_restaurant.setdefault(table.restaurant_id, []).append(table)
+
+    for restaurant in restaurants:
+        for table in tables_by_restaurant.get(restaurant.id, []):
+            # Earliest bookable slot of the table within ±30 minutes
+            free = masks[table.id] & window
+            if free:
+                matching_restaurants.append({
+                    "restaurant_id": restaurant.id,
+                    "restaurant_name": restaurant.name,
+                    "table_id": table.id,
+                    "available_time": slot_time(free),
+                    "city": restaurant.city,
+                    "state": restaurant.state,
+                    "zip_code": restaurant.zip_code,
+                    "cuisine": restaurant.cuisine,
+                    "cost_rating": restaurant.cost_rating,
+                    "rating": restaurant.rating,
+                    "total_bookings": restaurant.total_bookings,
+                    "maps_url": f"https://www.google.com/maps/search/?api=1&query={'+'.join(restaurant.name.split())}+{restaurant.zip_code}+{'+'.join(restaurant.city.split())}+{restaurant.state}",
+                    "contact": getattr(restaurant, 'contact', None),
+                    **images[restaurant.id],
+                    "description": restaurant.description or f"Enjoy a wonderful {restaurant.cuisine} dining experience in {restaurant.city}."
+                })
 
     if not matching_restaurants:
         raise HTTPException(status_code=404, detail="No available restaurants found.")
@@ -155,7 +172,7 @@ def search_availability(
 @router.get("/my-reservations")
 def get_my_reservations(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(get_token_claims)
 ):
     reservations = db.query(models.Reservation).filter(models.Reservation.user_id == current_user.id).all()
     return [
@@ -171,10 +188,9 @@ def get_my_reservations(
 
 @router.post("/api/send-confirmation-email")
 async def email_confirmation(
-    background_tasks: BackgroundTasks,
     request: ReservationRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(get_token_claims)
 ):
     reservation_id = request.reservation_id
 
@@ -186,24 +202,11 @@ async def email_confirmation(
     if not reservation:
         raise HTTPException(status_code=404, detail="Reservation not found or doesn't belong to you")
 
-    restaurant = reservation.restaurant
-
-    booking_details = BookingConfirmationDetails(
-        id=str(reservation.id),
-        restaurant_name=restaurant.name,
-        date=reservation.date.strftime("%A, %B %d, %Y"),
-        time=reservation.time.strftime("%H:%M"),
-        people=reservation.number_of_people,
-        table_type=f"Table #{reservation.table_id}" if reservation.table_id else "Standard",
-        address=f"{restaurant.city}, {restaurant.state} {restaurant.zip_code}",
-        contact=restaurant.contact if hasattr(restaurant, 'contact') else None
-    )
-
-    background_tasks.add_task(
-        send_booking_confirmation,
-        current_user.email,
-        booking_details
+    # ✅ Sent by the durable job queue (app/jobs); an explicit resend is never deduplicated
+    enqueue_booking_notifications(
+        db, "confirmation", reservation, reservation.restaurant, current_user.email, dedupe=False
     )
+    db.commit()
 
     return {"message": "Confirmation email will be sent shortly"}
 
@@ -211,15 +214,13 @@ async def email_confirmation(
 def add_restaurant(
     restaurant: RestaurantCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("RestaurantManager", detail="Only RestaurantManagers can add restaurants."))
 ):
-    if current_user.role != "RestaurantManager":
-        raise HTTPException(status_code=403, detail="Only RestaurantManagers can add restaurants.")
-
     # ✅ Prevent duplicate restaurant entries by name + zip
     existing = db.query(models.Restaurant).filter(
         models.Restaurant.name == restaurant.name,
-        models.Restaurant.zip_code == restaurant.zip_code
+        models.Restaurant.zip_code == restaurant.zip_code,
+        models.Restaurant.deleted_at.is_(None)
     ).first()
     if existing:
         raise HTTPException(status_code=400, detail="Restaurant already exists with the same name and zip code.")
@@ -254,19 +255,19 @@ def add_restaurant(
 def book_table(
     restaurant_id: int,
     reservation: ReservationCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("Customer", detail="Only customers can book tables."))
 ):
-    if current_user.role != "Customer":
-        raise HTTPException(status_code=403, detail="Only customers can book tables.")
+    # Reservation insert and analytics rollup update must commit together
+    database.begin_atomic(db)
 
     restaurant = (
         db.query(models.Restaurant)
         .join(RestaurantApproval)
         .filter(
             models.Restaurant.id == restaurant_id,
-            RestaurantApproval.status == "approved"
+            RestaurantApproval.status == "approved",
+            models.Restaurant.deleted_at.is_(None)
         )
         .first()
     )
@@ -280,8 +281,8 @@ def book_table(
     if not table:
         raise HTTPException(status_code=404, detail="Table not found for this restaurant.")
 
-    available_times = [t.strip() for t in table.available_times.split(",")]
-    if reservation.time.strftime("%H:%M") not in available_times:
+    # ✅ Weekly schedule (or date override) expanded for the booked date only
+    if not slot_masks(db, [table], reservation.date)[table.id] & window_mask(reservation.time, reservation.time):
         raise HTTPException(status_code=400, detail="Selected time not available for this table.")
 
     start_time = datetime.combine(reservation.date, reservation.time)
@@ -308,78 +309,125 @@ def book_table(
         table_id=reservation.table_id,
         date=reservation.date,
         time=reservation.time,
-        number_of_people=reservation.number_of_people
+        number_of_people=reservation.number_of_people,
+        contact_phone=reservation.phone
     )
 
     try:
         db.add(new_reservation)
         restaurant.total_bookings += 1
+        apply_reservation_change(db, restaurant_id, reservation.date, reservation.time, reservation.number_of_people)
+        db.flush()
+        # ✅ Notifications commit with the booking (transactional outbox) and are
+        # relayed by the job queue, so a crash after commit cannot lose them
+        enqueue_booking_notifications(db, "confirmation", new_reservation, restaurant, current_user.email)
+        # ✅ Pushed to the restaurant's live dashboards once this commits
+        booking_feed.publish_on_commit(db, booking_event("created", new_reservation))
         db.commit()
-        db.refresh(new_reservation)
     except Exception as e:
         db.rollback()
-        import traceback
-        traceback.print_exc()
+        logger.exception("booking failed", extra={"restaurant_id": restaurant_id, "table_id": reservation.table_id})
         raise HTTPException(status_code=500, detail=f"Booking failed: {str(e)}")
 
-    booking_details = BookingConfirmationDetails(
-        id=str(new_reservation.id),
-        restaurant_name=restaurant.name,
-        date=reservation.date.strftime("%A, %B %d, %Y"),
-        time=reservation.time.strftime("%H:%M"),
-        people=reservation.number_of_people,
-        table_type=f"Table #{reservation.table_id}",
-        address=f"{restaurant.city}, {restaurant.state} {restaurant.zip_code}",
-        contact=restaurant.contact if hasattr(restaurant, 'contact') else None
-    )
-
-    background_tasks.add_task(
-        send_booking_confirmation,
-        current_user.email,
-        booking_details
-    )
+    # ✅ Only matters for reminders due within the next few minutes; later ones are found by polling
+    reminder_scheduler.add(new_reservation.id, new_reservation.booking_ref, start_time)
 
     return {"message": "✅ Table booked successfully!", "reservation_id": new_reservation.id}
 
 
-# 📝 View reviews
+# 📝 View reviews, one page at a time. The cursor for the next page is returned
+# in the X-Next-Cursor header (absent on the last page).
 @router.get("/{restaurant_id}/reviews")
 def get_reviews(
     restaurant_id: int,
+    response: Response,
+    sort: str = Query("newest", pattern="^(newest|rating)$"),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    restaurant = db.query(models.Restaurant).filter(models.Restaurant.id == restaurant_id).first()
-    if not restaurant:
+    restaurant_exists = db.query(models.Restaurant.id).filter(
+        models.Restaurant.id == restaurant_id,
+        models.Restaurant.deleted_at.is_(None)
+    ).first()
+    if not restaurant_exists:
         raise HTTPException(status_code=404, detail="Restaurant not found.")
 
-    reviews = db.query(models.Review).filter(models.Review.restaurant_id == restaurant_id).all()
+    Review = models.Review
+    if sort == "rating":
+        sort_columns = [Review.rating, Review.created_at, Review.id]
+        datetime_positions = (1,)
+    else:
+        sort_columns = [Review.created_at, Review.id]
+        datetime_positions = (0,)
+
+    # Author names come from the same query, so a page costs one round trip
+    query = (
+        db.query(Review, User.full_name)
+        .join(User, User.id == Review.user_id)
+        .filter(Review.restaurant_id == restaurant_id)
+    )
+    if cursor:
+        query = query.filter(keyset_after(sort_columns, decode_cursor(cursor, len(sort_columns), datetime_positions)))
+
+    rows = query.order_by(*[c.desc() for c in sort_columns]).limit(limit + 1).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1][0]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [getattr(last, c.key) for c in sort_columns]
+        )
 
     return [
         {
             "review_id": r.id,
-            "user_name": r.user.full_name,
+            "user_name": full_name,
             "rating": r.rating,
             "comment": r.comment,
-            "date": r.created_at.strftime("%Y-%m-%d") if hasattr(r, 'created_at') else None
+            "date": r.created_at.strftime("%Y-%m-%d") if r.created_at else None
         }
-        for r in reviews
+        for r, full_name in rows
     ]
 
 
 
+# ⭐ Star histogram, mean and recent trend, served from the precomputed summary row
+@router.get("/{restaurant_id}/reviews/summary")
+def get_review_summary(
+    restaurant_id: int,
+    db: Session = Depends(get_db)
+):
+    restaurant_exists = db.query(models.Restaurant.id).filter(
+        models.Restaurant.id == restaurant_id,
+        models.Restaurant.deleted_at.is_(None)
+    ).first()
+    if not restaurant_exists:
+        raise HTTPException(status_code=404, detail="Restaurant not found.")
+
+    summary = db.query(models.RestaurantReviewSummary).filter(
+        models.RestaurantReviewSummary.restaurant_id == restaurant_id
+    ).first()
+
+    return {"restaurant_id": restaurant_id, **summary_to_dict(summary)}
+
 # Add review endpoint
 @router.post("/{restaurant_id}/reviews")
 def add_review(
     restaurant_id: int,
-    rating: int,
+    # ✅ Same 1-5 range as ReviewCreate; the summary keeps one counter per star
+    rating: int = Query(..., ge=1, le=5),
     comment: str = None,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("Customer", detail="Only customers can add reviews."))
 ):
-    if current_user.role != "Customer":
-        raise HTTPException(status_code=403, detail="Only customers can add reviews.")
-    
-    restaurant = db.query(models.Restaurant).filter(models.Restaurant.id == restaurant_id).first()
+    # Review insert and aggregate update must commit together
+    database.begin_atomic(db)
+
+    restaurant = db.query(models.Restaurant).filter(
+        models.Restaurant.id == restaurant_id,
+        models.Restaurant.deleted_at.is_(None)
+    ).first()
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found.")
     
@@ -397,23 +445,14 @@ def add_review(
         user_id=current_user.id,
         restaurant_id=restaurant_id,
         rating=rating,
-        comment=comment,
-        created_at=datetime.now()
+        comment=comment
     )
     
     db.add(new_review)
-    db.commit()
-    db.refresh(new_review)
-    
-    # Update restaurant rating
-    all_reviews = db.query(models.Review).filter(
-        models.Review.restaurant_id == restaurant_id
-    ).all()
-    
-    total_rating = sum(review.rating for review in all_reviews)
-    avg_rating = total_rating / len(all_reviews)
-    
-    restaurant.rating = round(avg_rating, 1)
+    db.flush()
+
+    # Update restaurant rating incrementally from the stored aggregates
+    apply_new_review(db, restaurant_id, rating)
     db.commit()
     
     return {"message": "Review added successfully"}
@@ -434,7 +473,8 @@ def get_restaurant_details(
         .join(RestaurantApproval)
         .filter(
             models.Restaurant.id == restaurant_id,
-            RestaurantApproval.status == "approved"
+            RestaurantApproval.status == "approved",
+            models.Restaurant.deleted_at.is_(None)
         )
         .first()
     )
@@ -484,11 +524,10 @@ def get_today_bookings_count(
 def cancel_reservation(
     reservation_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: TokenClaims = Depends(require_role("Customer", detail="Only customers can cancel bookings."))
 ):
-    if current_user.role != "Customer":
-        raise HTTPException(status_code=403, detail="Only customers can cancel bookings.")
-    
+    database.begin_atomic(db)
+
     reservation = db.query(models.Reservation).filter(
         models.Reservation.id == reservation_id,
         models.Reservation.user_id == current_user.id
@@ -497,6 +536,11 @@ def cancel_reservation(
     if not reservation:
         raise HTTPException(status_code=404, detail="Reservation not found or does not belong to you.")
     
+    apply_reservation_change(
+        db, reservation.restaurant_id, reservation.date, reservation.time, reservation.number_of_people, cancelled=True
+    )
+    enqueue_booking_notifications(db, "cancellation", reservation, reservation.restaurant, current_user.email)
+    booking_feed.publish_on_commit(db, booking_event("cancelled", reservation))
     db.delete(reservation)
     db.commit()
     
@@ -1,9 +1,10 @@
 # Import necessary modules and components
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.db import models, database
 from app.auth import auth_model, auth_handler
-from app.auth.auth_dependency import get_current_user
+from app.auth.auth_dependency import get_current_user, decode_token, credentials_exception
 
 # Create a router for user-related endpoints
 router = APIRouter(prefix="/users", tags=["Users"])
@@ -16,64 +17,107 @@ def get_db():
     finally:
         db.close()  # Always close the session after use
 
+# Response returned when the password hashing pool is saturated
+def too_many_requests():
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts in progress. Please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
+
+# Blocking DB steps of register/login. The endpoints are async so they can await
+# the hashing pool, and hand these to the threadpool to keep SQLite off the event loop
+def _find_user(db: Session, email: str):
+    # Releases the pooled connection in the same threadpool call: closing in a later
+    # call can queue behind lookups that wait for connections only it would return
+    try:
+        return db.query(models.User).filter(models.User.email == email).first()
+    finally:
+        db.close()
+
+def _add_user(db: Session, user: auth_model.UserCreate, hashed_pw: str) -> models.User:
+    new_user = models.User(
+        email=user.email,
+        hashed_password=hashed_pw,
+        full_name=user.full_name,
+        role=user.role
+    )
+    db.add(new_user)
+    db.commit()
+    db.refresh(new_user)
+    return new_user
+
+def _store_upgraded_hash(db: Session, user_id: int, email: str, new_hash: str):
+    db.query(models.User).filter(models.User.id == user_id).execution_options(
+        invalidate_users=[email]
+    ).update({"hashed_password": new_hash})
+    db.commit()
+
 # User Registration Endpoint
 @router.post("/register")
-def register_user(user: auth_model.UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: auth_model.UserCreate, db: Session = Depends(get_db)):
     # Check if a user with the given email already exists
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
+    if await run_in_threadpool(_find_user, db, user.email):
         raise HTTPException(status_code=400, detail="Email already registered")
-    
+
     try:
-        # Hash the user's password
-        hashed_pw = auth_handler.hash_password(user.password)
-        
-        # Create a new User instance
-        new_user = models.User(
-            email=user.email,
-            hashed_password=hashed_pw,
-            full_name=user.full_name,
-            role=user.role
-        )
+        # Hash the user's password in the dedicated hashing pool
+        hashed_pw = await auth_handler.hash_password_async(user.password)
         
         # Add the user to the database and save changes
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        new_user = await run_in_threadpool(_add_user, db, user, hashed_pw)
         
-        # Generate access token immediately after registration
-        access_token = auth_handler.create_access_token(
-            data={"sub": new_user.email, "role": new_user.role}
-        )
-        
-        # Return the token to automatically log in the user
-        return {"access_token": access_token, "token_type": "bearer"}
+        # Return tokens immediately to automatically log in the user
+        return auth_handler.create_token_pair(new_user.id, new_user.email, new_user.role)
         
+    except auth_handler.PasswordHashingBusy:
+        raise too_many_requests()
     except ValueError as e:
         # Handle password validation errors
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Handle any other unexpected errors
-        db.rollback()  # Roll back the transaction if an error occurs
+        await run_in_threadpool(db.rollback)  # Roll back the transaction if an error occurs
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
 # User Login Endpoint
 @router.post("/login")
-def login_user(user: auth_model.UserLogin, db: Session = Depends(get_db)):
+async def login_user(user: auth_model.UserLogin, db: Session = Depends(get_db)):
     # Look up the user by email
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user = await run_in_threadpool(_find_user, db, user.email)
+    if not db_user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    user_id, email, role, hashed_password = db_user.id, db_user.email, db_user.role, db_user.hashed_password
 
     # Validate the provided password against the stored hashed password
-    if not db_user or not auth_handler.verify_password(user.password, db_user.hashed_password):
+    try:
+        valid, new_hash = await auth_handler.verify_and_update_password_async(
+            user.password, hashed_password
+        )
+    except auth_handler.PasswordHashingBusy:
+        raise too_many_requests()
+
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
-    # Generate a JWT access token if credentials are valid
-    token = auth_handler.create_access_token(
-        data={"sub": db_user.email, "role": db_user.role}
-    )
+    # Transparently upgrade hashes created with an older cost factor
+    if new_hash:
+        await run_in_threadpool(_store_upgraded_hash, db, user_id, email, new_hash)
+
+    # Return access and refresh tokens if credentials are valid
+    return auth_handler.create_token_pair(user_id, email, role)
+
+# Token Refresh Endpoint: re-reads the user so deleted accounts and role changes take effect
+@router.post("/refresh")
+def refresh_token(body: auth_model.TokenRefresh, db: Session = Depends(get_db)):
+    claims = decode_token(body.refresh_token, expected_type="refresh")
+
+    db_user = db.query(models.User).filter(models.User.id == claims.id).first()
+    if not db_user or db_user.email != claims.email:
+        raise credentials_exception()
 
-    # Return the token to the user
-    return {"access_token": token, "token_type": "bearer"}
+    return auth_handler.create_token_pair(db_user.id, db_user.email, db_user.role)
 
 # Protected Route: Get Current User Profile
 @router.get("/me")
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from sqlalchemy import delete, event, func, insert, select
+
+from app.db import models
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# memory (one process) or database (several worker processes sharing booktable.db)
+BOOKING_FEED_BACKEND = os.getenv("BOOKTABLE_BOOKING_FEED_BACKEND", "memory")
+
+# Events buffered per subscriber; a slower client loses the oldest and is told to resync
+BOOKING_FEED_BUFFER = int(os.getenv("BOOKTABLE_BOOKING_FEED_BUFFER", "100"))
+
+# Open feed connections per process; more are refused with 503
+BOOKING_FEED_MAX_SUBSCRIBERS = int(os.getenv("BOOKTABLE_BOOKING_FEED_MAX_SUBSCRIBERS", "10000"))
+
+# Keep-alive interval for idle connections, so proxies do not close them
+BOOKING_FEED_HEARTBEAT_SECONDS = float(os.getenv("BOOKTABLE_BOOKING_FEED_HEARTBEAT", "15"))
+
+# Database backend: how often each process reads new events, and how long they are kept
+BOOKING_FEED_POLL_SECONDS = float(os.getenv("BOOKTABLE_BOOKING_FEED_POLL_SECONDS", "0.5"))
+BOOKING_FEED_RETENTION_MINUTES = float(os.getenv("BOOKTABLE_BOOKING_FEED_RETENTION_MINUTES", "60"))
+
+
+class FeedFull(Exception):
+    """Raised by subscribe() when the process already serves BOOKING_FEED_MAX_SUBSCRIBERS connections."""
+
+
+def booking_event(kind: str, reservation: models.Reservation) -> dict:
+    """Feed event for a booking change; kind is "created" or "cancelled"."""
+    return {
+        "type": f"booking.{kind}",
+        "restaurant_id": reservation.restaurant_id,
+        "reservation_id": reservation.id,
+        "table_id": reservation.table_id,
+        "date": reservation.date.isoformat(),
+        "time": reservation.time.strftime("%H:%M"),
+        "people": reservation.number_of_people,
+        "at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+    }
+
+
+class Subscription:
+    """
+    One connected dashboard. Lives on the event loop; events are pushed by
+    BookingFeed and drained with next_batch().
+
+    The buffer is bounded: when a client reads slower than bookings arrive,
+    the oldest events are dropped and the next batch starts with a resync
+    event, so a stalled connection never holds up the others or grows
+    without limit.
+    """
+
+    def __init__(self, restaurant_ids: Iterable[int], max_pending: int = BOOKING_FEED_BUFFER):
+        self.restaurant_ids = frozenset(restaurant_ids)
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, feed_event: dict):
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append(feed_event)
+        self._ready.set()
+
+    async def next_batch(self, timeout: float = BOOKING_FEED_HEARTBEAT_SECONDS) -> List[dict]:
+        """Pending events, waiting up to `timeout`; an empty list means send a heartbeat."""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        batch = list(self._pending)
+        self._pending.clear()
+        if self.dropped:
+            batch.insert(0, {"type": "resync", "dropped": self.dropped})
+            self.dropped = 0
+        return batch
+
+
+class MemoryBackend:
+    """Single process: committed events go straight to this process's subscribers."""
+
+    def __init__(self):
+        # Until start(), e.g. commits from scripts and tests, events have nowhere to go
+        self._deliver = lambda events: None
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def stop(self):
+        pass
+
+    def publish(self, events: List[dict]):
+        self._deliver(events)
+
+
+class DatabaseBackend:
+    """
+    Several worker processes: committed events are written to the
+    booking_events table, and every process polls for rows past the last
+    id it has seen and fans them out to its own subscribers. Another
+    broker (Redis, Postgres NOTIFY) can be plugged in with the same three
+    methods.
+    """
+
+    def __init__(self, poll_seconds: float = BOOKING_FEED_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._stopping = threading.Event()
+        self._thread = None
+        self._last_id = None
+        self._last_cleanup = datetime.utcnow()
+
+    def start(self, deliver):
+        self._deliver = deliver
+        db = SessionLocal()
+        try:
+            # Only events committed from now on are delivered
+            self._last_id = db.execute(select(models.BookingEvent.id).order_by(models.BookingEvent.id.desc()).limit(1)).scalar() or 0
+        finally:
+            db.close()
+        self._thread = threading.Thread(target=self._run, name="booking-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._stopping.clear()
+
+    def publish(self, events: List[dict]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(models.BookingEvent), [
+                {"restaurant_id": e["restaurant_id"], "payload": json.dumps(e), "created_at": datetime.utcnow()}
+                for e in events
+            ])
+            db.commit()
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stopping.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("booking feed poll failed")
+
+    def poll(self):
+        Event = models.BookingEvent
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(Event.id, Event.payload).where(Event.id > self._last_id).order_by(Event.id).limit(1000)
+            ).all()
+            if rows:
+                self._last_id = rows[-1][0]
+                self._deliver([json.loads(payload) for _, payload in rows])
+
+            now = datetime.utcnow()
+            if now - self._last_cleanup > timedelta(minutes=1):
+                self._last_cleanup = now
+                # The newest row is always kept: a table created without AUTOINCREMENT
+                # would otherwise reuse ids once empty, and readers skip ids they think they saw
+                newest = select(func.max(Event.id)).scalar_subquery()
+                db.execute(delete(Event).where(
+                    Event.created_at < now - timedelta(minutes=BOOKING_FEED_RETENTION_MINUTES), Event.id < newest
+                ))
+                db.commit()
+        finally:
+            db.close()
+
+
+def create_backend(name: str = BOOKING_FEED_BACKEND):
+    if name == "memory":
+        return MemoryBackend()
+    if name == "database":
+        return DatabaseBackend()
+    raise ValueError(f"Unknown BOOKTABLE_BOOKING_FEED_BACKEND {name!r}")
+
+
+class BookingFeed:
+    """
+    In-process pub/sub of booking changes for manager dashboards.
+
+    book_table and cancel_reservation call publish_on_commit(); the events
+    reach the backend only once the booking transaction commits. The
+    backend hands them back to every process, where they are fanned out
+    on the event loop to the subscriptions of the restaurant concerned:
+    one thread hop per batch, then a dict lookup and a deque append per
+    subscriber.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self._subscribers = defaultdict(set)  # restaurant_id -> subscriptions; event loop only
+        self._count = 0
+        self._loop = None
+
+    def start(self):
+        """Call from the event loop (application startup)."""
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.backend.start(self._deliver)
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self.backend.stop()
+        self._loop = None
+
+    def subscribers(self) -> int:
+        return self._count
+
+    def subscribe(self, restaurant_ids: Iterable[int], max_pending: int = BOOKING_FEED_BUFFER) -> Subscription:
+        """Register a connection for events of the given restaurants. Call on the event loop."""
+        if self._count >= BOOKING_FEED_MAX_SUBSCRIBERS:
+            raise FeedFull("Too many live feed connections; try again later.")
+        subscription = Subscription(restaurant_ids, max_pending)
+        for restaurant_id in subscription.restaurant_ids:
+            self._subscribers[restaurant_id].add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for restaurant_id in subscription.restaurant_ids:
+            subscribers = self._subscribers.get(restaurant_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[restaurant_id]
+        self._count -= 1
+
+    def publish_on_commit(self, db, feed_event: dict):
+        """Publish `feed_event` once the session's current transaction commits; dropped on rollback."""
+        db.info.setdefault("booking_events", []).append(feed_event)
+
+    def publish(self, events: List[dict]):
+        self.backend.publish(events)
+
+    def _deliver(self, events: List[dict]):
+        # Called from request and poller threads
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.fan_out, events)
+
+    def fan_out(self, events: List[dict]):
+        for feed_event in events:
+            for subscription in self._subscribers.get(feed_event["restaurant_id"], ()):
+                subscription.push(feed_event)
+
+
+booking_feed = BookingFeed()
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_on_commit(session):
+    events = session.info.pop("booking_events", None)
+    if events:
+        try:
+            booking_feed.publish(events)
+        except Exception:
+            # The booking itself is committed; dashboards catch up on their next resync
+            logger.exception("booking feed publish failed", extra={"events": len(events)})
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_on_rollback(session, previous_transaction):
+    session.info.pop("booking_events", None)
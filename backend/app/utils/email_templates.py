@@ -0,0 +1,200 @@
+import html
+from string import Template
+
+from app.utils.mail_transport import OutgoingEmail
+
+
+class EmailTemplate:
+    """
+    Email parsed once at import and rendered per message by substitution.
+
+    Placeholders use string.Template syntax (${name}). Values are
+    HTML-escaped for the HTML part and used as-is for the subject and the
+    plain text part. For batched sends the same content is also prepared
+    once with SendGrid substitution tags, so a batch carries one copy of the
+    body plus each recipient's values.
+    """
+
+    def __init__(self, name: str, subject: str, html_body: str, text_body: str = None):
+        self.name = name
+        self.subject = Template(subject)
+        self.html = Template(html_body)
+        self.text = Template(text_body) if text_body else None
+        self.tagged_html = self.html.safe_substitute(_TagNames("-{}-"))
+        self.tagged_text = self.text.safe_substitute(_TagNames("-text_{}-")) if self.text else None
+
+    def render(self, to_email: str, values: dict, html_values: dict = None) -> OutgoingEmail:
+        """
+        Args:
+            to_email (str): Recipient address.
+            values (dict): Placeholder values, escaped for the HTML part.
+            html_values (dict): Extra HTML-part values that are already markup.
+        """
+        html_context = {key: html.escape(str(value)) for key, value in values.items()}
+        html_context.update(html_values or {})
+        text_context = {key: str(value) for key, value in values.items()}
+
+        substitutions = {f"-{key}-": value for key, value in html_context.items()}
+        if self.text:
+            substitutions.update({f"-text_{key}-": value for key, value in text_context.items()})
+
+        return OutgoingEmail(
+            to_email=to_email,
+            subject=self.subject.substitute(text_context),
+            html=self.html.substitute(html_context),
+            text=self.text.substitute(text_context) if self.text else None,
+            batch_key=self.name,
+            tagged_html=self.tagged_html,
+            tagged_text=self.tagged_text,
+            substitutions=substitutions,
+        )
+
+
+class _TagNames(dict):
+    """Maps any placeholder name to its SendGrid substitution tag."""
+
+    def __init__(self, pattern: str):
+        super().__init__()
+        self.pattern = pattern
+
+    def __missing__(self, key):
+        return self.pattern.format(key)
+
+
+_STYLE = """
+            body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; }
+            .container { background-color: #f8f9fa; padding: 20px; border-radius: 5px; border-top: 4px solid ${accent}; }
+            .booking-details { background-color: white; padding: 15px; border-radius: 5px; margin: 15px 0; }
+            h1, h2 { color: ${accent}; }
+            .footer { font-size: 0.9em; color: #666; margin-top: 20px; border-top: 1px solid #eee; padding-top: 15px; }
+            .button { background-color: #0056b3; color: white; padding: 10px 15px; text-decoration: none; border-radius: 4px; display: inline-block; margin-top: 15px; }
+"""
+
+BOOKING_CONFIRMATION = EmailTemplate(
+    "booking_confirmation",
+    subject="BookTable Reservation Confirmation: ${restaurant_name}",
+    html_body="""
+    <html>
+    <head>
+        <style>""" + Template(_STYLE).substitute(accent="#0056b3") + """        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>Booking Confirmation</h1>
+            <p>Thank you for your reservation at <strong>${restaurant_name}</strong>!</p>
+
+            <div class="booking-details">
+                <p><strong>Date:</strong> ${date}</p>
+                <p><strong>Time:</strong> ${time}</p>
+                <p><strong>Party Size:</strong> ${party_size}</p>
+                <p><strong>Table:</strong> ${table_type}</p>
+                ${location_line}
+                ${contact_line}
+            </div>
+
+            <p>You can manage your reservations in your account dashboard.</p>
+            <a href="http://localhost:3000/my-reservations" class="button">View My Reservations</a>
+
+            <div class="footer">
+                <p>If you need to cancel or modify your reservation, please do so at least 2 hours in advance.</p>
+                <p>Thank you for using BookTable!</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """,
+    text_body="""
+Hi,
+
+Your reservation at ${restaurant_name} is confirmed.
+
+Date: ${date}
+Time: ${time}
+People: ${people}
+Table: ${table_type}
+
+You can manage your reservations by visiting: http://localhost:3000/my-reservations
+
+If you need to cancel or modify your reservation, please do so at least 2 hours in advance.
+
+Thanks for using BookTable!
+- Team BookTable
+    """,
+)
+
+BOOKING_CANCELLATION = EmailTemplate(
+    "booking_cancellation",
+    subject="BookTable Reservation Cancelled: ${restaurant_name}",
+    html_body="""
+    <html>
+    <head>
+        <style>""" + Template(_STYLE).substitute(accent="#dc3545") + """        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>Booking Cancellation</h1>
+            <p>Your reservation at <strong>${restaurant_name}</strong> has been cancelled.</p>
+
+            <div class="booking-details">
+                <p><strong>Date:</strong> ${date}</p>
+                <p><strong>Time:</strong> ${time}</p>
+                <p><strong>Party Size:</strong> ${party_size}</p>
+            </div>
+
+            <p>You can make a new reservation any time from our website.</p>
+            <a href="http://localhost:3000" class="button">Book a New Reservation</a>
+
+            <div class="footer">
+                <p>Thank you for using BookTable!</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """,
+)
+
+BOOKING_REMINDER = EmailTemplate(
+    "booking_reminder",
+    subject="BookTable Reminder: ${restaurant_name} at ${time}",
+    html_body="""
+    <html>
+    <head>
+        <style>""" + Template(_STYLE).substitute(accent="#0056b3") + """        </style>
+    </head>
+    <body>
+        <div class="container">
+            <h1>Upcoming Reservation</h1>
+            <p>This is a reminder of your reservation at <strong>${restaurant_name}</strong>.</p>
+
+            <div class="booking-details">
+                <p><strong>Date:</strong> ${date}</p>
+                <p><strong>Time:</strong> ${time}</p>
+                <p><strong>Party Size:</strong> ${party_size}</p>
+                <p><strong>Table:</strong> ${table_type}</p>
+            </div>
+
+            <p>Plans changed? Please cancel at least 2 hours in advance so others can book the table.</p>
+            <a href="http://localhost:3000/my-reservations" class="button">View My Reservations</a>
+
+            <div class="footer">
+                <p>Thank you for using BookTable!</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """,
+    text_body="""
+Hi,
+
+This is a reminder of your reservation at ${restaurant_name}.
+
+Date: ${date}
+Time: ${time}
+People: ${people}
+Table: ${table_type}
+
+Plans changed? Please cancel at least 2 hours in advance: http://localhost:3000/my-reservations
+
+- Team BookTable
+    """,
+)
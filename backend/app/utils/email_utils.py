@@ -1,14 +1,12 @@
-import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, HtmlContent
+import html
+import logging
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
-from dotenv import load_dotenv
-load_dotenv()
+from typing import List, Optional, Tuple
 
-# Load SendGrid API key and default sender email from environment variables
-SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-FROM_EMAIL = os.getenv("BOOKTABLE_EMAIL_FROM")
+from app.utils import mail_transport
+from app.utils.email_templates import BOOKING_CANCELLATION, BOOKING_CONFIRMATION, BOOKING_REMINDER
+
+logger = logging.getLogger(__name__)
 
 # Pydantic model representing booking details to include in emails
 class BookingConfirmationDetails(BaseModel):
@@ -21,154 +19,115 @@ class BookingConfirmationDetails(BaseModel):
     address: Optional[str] = None
     contact: Optional[str] = None
 
-# Send confirmation email using SendGrid
-def send_booking_confirmation(to_email: str, booking_details: BookingConfirmationDetails):
+def _booking_values(details: BookingConfirmationDetails) -> dict:
+    return {
+        "restaurant_name": details.restaurant_name,
+        "date": details.date,
+        "time": details.time,
+        "people": details.people,
+        "party_size": f"{details.people} {'person' if details.people == 1 else 'people'}",
+        "table_type": details.table_type,
+    }
+
+
+def render_booking_confirmation(to_email: str, booking_details: BookingConfirmationDetails):
+    """Render the confirmation email from its precompiled template."""
+    optional_lines = {
+        "location_line": (
+            f"<p><strong>Location:</strong> {html.escape(booking_details.address)}</p>" if booking_details.address else ""
+        ),
+        "contact_line": (
+            f"<p><strong>Contact:</strong> {html.escape(booking_details.contact)}</p>" if booking_details.contact else ""
+        ),
+    }
+    return BOOKING_CONFIRMATION.render(to_email, _booking_values(booking_details), optional_lines)
+
+
+def render_booking_cancellation(to_email: str, booking_details: BookingConfirmationDetails):
+    """Render the cancellation email from its precompiled template."""
+    return BOOKING_CANCELLATION.render(to_email, _booking_values(booking_details))
+
+
+def render_booking_reminder(to_email: str, booking_details: BookingConfirmationDetails):
+    """Render the reminder email from its precompiled template."""
+    return BOOKING_REMINDER.render(to_email, _booking_values(booking_details))
+
+
+def _send(messages, booking_ids, kind: str, dedupe_keys=None) -> List[Optional[str]]:
+    for message, dedupe_key in zip(messages, dedupe_keys or []):
+        message.dedupe_key = dedupe_key
+    try:
+        errors = mail_transport.mail_transport.send(messages)
+    except Exception as e:
+        errors = [str(e) or e.__class__.__name__] * len(messages)
+    failed = sum(1 for error in errors if error)
+    if failed:
+        logger.warning(f"{kind} email failed", extra={"booking_ids": booking_ids, "failed": failed, "error": next(e for e in errors if e)})
+    else:
+        logger.info(f"{kind} email sent", extra={"booking_ids": booking_ids})
+    return errors
+
+
+# Send confirmation emails in one batch through the shared transport
+def send_booking_confirmations(
+    bookings: List[Tuple[str, BookingConfirmationDetails]], dedupe_keys: List[Optional[str]] = None
+) -> List[Optional[str]]:
     """
-    Send a formatted HTML booking confirmation email using SendGrid.
+    Send booking confirmation emails as one batch.
 
     Args:
-        to_email (str): The recipient's email address.
-        booking_details (BookingConfirmationDetails): The booking info to include.
-    """
+        bookings (list): (to_email, BookingConfirmationDetails) pairs.
+        dedupe_keys (list): Optional key per booking, attached to the sent message.
 
-    # Create styled HTML content for confirmation
-    html_content = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; }}
-            .container {{ background-color: #f8f9fa; padding: 20px; border-radius: 5px; border-top: 4px solid #0056b3; }}
-            .booking-details {{ background-color: white; padding: 15px; border-radius: 5px; margin: 15px 0; }}
-            h1, h2 {{ color: #0056b3; }}
-            .footer {{ font-size: 0.9em; color: #666; margin-top: 20px; border-top: 1px solid #eee; padding-top: 15px; }}
-            .button {{ background-color: #0056b3; color: white; padding: 10px 15px; text-decoration: none; border-radius: 4px; display: inline-block; margin-top: 15px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Booking Confirmation</h1>
-            <p>Thank you for your reservation at <strong>{booking_details.restaurant_name}</strong>!</p>
-
-            <div class="booking-details">
-                <p><strong>Date:</strong> {booking_details.date}</p>
-                <p><strong>Time:</strong> {booking_details.time}</p>
-                <p><strong>Party Size:</strong> {booking_details.people} {'person' if booking_details.people == 1 else 'people'}</p>
-                <p><strong>Table:</strong> {booking_details.table_type}</p>
-                {f'<p><strong>Location:</strong> {booking_details.address}</p>' if booking_details.address else ''}
-                {f'<p><strong>Contact:</strong> {booking_details.contact}</p>' if booking_details.contact else ''}
-            </div>
-
-            <p>You can manage your reservations in your account dashboard.</p>
-            <a href="http://localhost:3000/my-reservations" class="button">View My Reservations</a>
-
-            <div class="footer">
-                <p>If you need to cancel or modify your reservation, please do so at least 2 hours in advance.</p>
-                <p>Thank you for using BookTable!</p>
-            </div>
-        </div>
-    </body>
-    </html>
+    Returns:
+        list: None for each email accepted by the transport, else an error message.
     """
+    messages = [render_booking_confirmation(to_email, details) for to_email, details in bookings]
+    return _send(messages, [details.id for _, details in bookings], "confirmation", dedupe_keys)
 
-    # Plain text fallback content for email clients that don't support HTML
-    plain_text_content = f"""
-Hi,
 
-Your reservation at {booking_details.restaurant_name} is confirmed.
+# Send cancellation emails in one batch through the shared transport
+def send_booking_cancellations(
+    bookings: List[Tuple[str, BookingConfirmationDetails]], dedupe_keys: List[Optional[str]] = None
+) -> List[Optional[str]]:
+    """Send booking cancellation emails as one batch; same contract as send_booking_confirmations()."""
+    messages = [render_booking_cancellation(to_email, details) for to_email, details in bookings]
+    return _send(messages, [details.id for _, details in bookings], "cancellation", dedupe_keys)
 
-Date: {booking_details.date}
-Time: {booking_details.time}
-People: {booking_details.people}
-Table: {booking_details.table_type}
 
-You can manage your reservations by visiting: http://localhost:3000/my-reservations
+# Send reminder emails in one batch through the shared transport
+def send_booking_reminders(
+    bookings: List[Tuple[str, BookingConfirmationDetails]], dedupe_keys: List[Optional[str]] = None
+) -> List[Optional[str]]:
+    """Send upcoming-reservation reminder emails as one batch; same contract as send_booking_confirmations()."""
+    messages = [render_booking_reminder(to_email, details) for to_email, details in bookings]
+    return _send(messages, [details.id for _, details in bookings], "reminder", dedupe_keys)
 
-If you need to cancel or modify your reservation, please do so at least 2 hours in advance.
 
-Thanks for using BookTable!
-- Team BookTable
+# Send confirmation email using the configured mail transport
+def send_booking_confirmation(to_email: str, booking_details: BookingConfirmationDetails):
     """
+    Send a formatted HTML booking confirmation email.
 
-    # Create and send the email via SendGrid
-    message = Mail(
-        from_email=FROM_EMAIL,
-        to_emails=to_email,
-        subject=f'BookTable Reservation Confirmation: {booking_details.restaurant_name}',
-        plain_text_content=plain_text_content,
-        html_content=HtmlContent(html_content)
-    )
-
-    try:
-        print("📤 Sending Email Debug Info:")
-        print("SENDGRID_API_KEY (first 10 chars):", SENDGRID_API_KEY[:10])
-        print("FROM_EMAIL:", FROM_EMAIL)
-        print("TO_EMAIL:", to_email)
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        print(f"Email sent successfully. Status code: {response.status_code}")
-        return {"success": True, "message": "Email sent successfully"}
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return {"success": False, "error": str(e)}
+    Args:
+        to_email (str): The recipient's email address.
+        booking_details (BookingConfirmationDetails): The booking info to include.
+    """
+    error = send_booking_confirmations([(to_email, booking_details)])[0]
+    if error:
+        return {"success": False, "error": error}
+    return {"success": True, "message": "Email sent successfully"}
 
-# Send cancellation email using SendGrid
+# Send cancellation email using the configured mail transport
 def send_booking_cancellation(to_email: str, booking_details: BookingConfirmationDetails):
     """
-    Send a formatted HTML booking cancellation email using SendGrid.
+    Send a formatted HTML booking cancellation email.
 
     Args:
         to_email (str): The recipient's email address.
         booking_details (BookingConfirmationDetails): The cancelled booking info.
     """
-
-    # Create styled HTML content for cancellation notice
-    html_content = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; max-width: 600px; margin: 0 auto; }}
-            .container {{ background-color: #f8f9fa; padding: 20px; border-radius: 5px; border-top: 4px solid #dc3545; }}
-            .booking-details {{ background-color: white; padding: 15px; border-radius: 5px; margin: 15px 0; }}
-            h1, h2 {{ color: #dc3545; }}
-            .footer {{ font-size: 0.9em; color: #666; margin-top: 20px; border-top: 1px solid #eee; padding-top: 15px; }}
-            .button {{ background-color: #0056b3; color: white; padding: 10px 15px; text-decoration: none; border-radius: 4px; display: inline-block; margin-top: 15px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <h1>Booking Cancellation</h1>
-            <p>Your reservation at <strong>{booking_details.restaurant_name}</strong> has been cancelled.</p>
-
-            <div class="booking-details">
-                <p><strong>Date:</strong> {booking_details.date}</p>
-                <p><strong>Time:</strong> {booking_details.time}</p>
-                <p><strong>Party Size:</strong> {booking_details.people} {'person' if booking_details.people == 1 else 'people'}</p>
-            </div>
-
-            <p>You can make a new reservation any time from our website.</p>
-            <a href="http://localhost:3000" class="button">Book a New Reservation</a>
-
-            <div class="footer">
-                <p>Thank you for using BookTable!</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-
-    # Create and send the cancellation email
-    message = Mail(
-        from_email=FROM_EMAIL,
-        to_emails=to_email,
-        subject=f'BookTable Reservation Cancelled: {booking_details.restaurant_name}',
-        html_content=HtmlContent(html_content)
-    )
-
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        print(f"Cancellation email sent successfully. Status code: {response.status_code}")
-        return {"success": True, "message": "Cancellation email sent successfully"}
-    except Exception as e:
-        print(f"Failed to send cancellation email: {e}")
-        return {"success": False, "error": str(e)}
+    error = send_booking_cancellations([(to_email, booking_details)])[0]
+    if error:
+        return {"success": False, "error": error}
+    return {"success": True, "message": "Cancellation email sent successfully"}
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Base level for all application loggers (the "app" namespace)
+LOG_LEVEL = os.getenv("BOOKTABLE_LOG_LEVEL", "INFO").upper()
+
+# Per-logger overrides, e.g. "app.auth=DEBUG,app.utils.email_utils=WARNING"
+LOG_LEVELS = os.getenv("BOOKTABLE_LOG_LEVELS", "")
+
+# Fraction of DEBUG records that are kept; DEBUG events on hot paths are high volume
+DEBUG_SAMPLE_RATE = float(os.getenv("BOOKTABLE_LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+# Maximum records buffered for the writer thread before new ones are dropped
+LOG_QUEUE_SIZE = int(os.getenv("BOOKTABLE_LOG_QUEUE_SIZE", "10000"))
+
+# Attributes present on every LogRecord; anything else was passed via `extra=`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line, including any `extra=` fields."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Keep every record at INFO and above, and only a sample of DEBUG records."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the writer falls behind."""
+
+    def prepare(self, record):
+        # Render the message and traceback now, keeping them separate so the
+        # JSON output can carry the traceback in its own field
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+def _parse_levels(spec: str) -> dict:
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """
+    Route all `app.*` loggers through a queue to a background writer thread.
+
+    Request threads only pay for an in-memory enqueue; JSON formatting and the
+    stdout write happen on the listener thread. Safe to call more than once.
+
+    Returns:
+        QueueListener: The running listener, stopped by shutdown_logging().
+    """
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(DEBUG_SAMPLE_RATE))
+
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [queue_handler]
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.propagate = False
+
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
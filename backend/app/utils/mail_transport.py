@@ -0,0 +1,219 @@
+import http.client
+import json
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# sendgrid (default), file or memory
+MAIL_TRANSPORT = os.getenv("BOOKTABLE_MAIL_TRANSPORT", "sendgrid")
+
+# Load SendGrid API key and default sender email from environment variables
+SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+FROM_EMAIL = os.getenv("BOOKTABLE_EMAIL_FROM")
+SENDGRID_API_URL = os.getenv("BOOKTABLE_SENDGRID_API_URL", "https://api.sendgrid.com/v3/mail/send")
+
+# Keep-alive connections held open to SendGrid per process
+SENDGRID_POOL_SIZE = int(os.getenv("BOOKTABLE_SENDGRID_POOL_SIZE", "4"))
+
+# SendGrid accepts up to 1000 personalizations per request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+# Statuses where SendGrid rejected the whole request over some of its messages
+# (one invalid address, too large a body); such batches are split in half and
+# resent until only the offending messages fail. Others (401, 429, 5xx) fail
+# the whole batch, to be retried by the job queue.
+SENDGRID_SPLIT_STATUSES = {400, 413}
+
+# Where the file transport appends messages, one JSON object per line
+MAIL_SINK_PATH = os.getenv("BOOKTABLE_MAIL_SINK_PATH", "mail_sink.jsonl")
+
+
+@dataclass
+class OutgoingEmail:
+    """
+    One rendered message. Messages built from the same template carry the
+    same batch_key, tagged content and per-message substitutions, so they
+    can share a single SendGrid request.
+    """
+    to_email: str
+    subject: str
+    html: str
+    text: Optional[str] = None
+    batch_key: Optional[str] = None
+    tagged_html: Optional[str] = None
+    tagged_text: Optional[str] = None
+    substitutions: Optional[Dict[str, str]] = None
+    dedupe_key: Optional[str] = None
+
+
+class HTTPConnectionPool:
+    """Thread-safe pool of keep-alive HTTP(S) connections to one host."""
+
+    def __init__(self, url: str, size: int, timeout: float = 30):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.host, self.port = parts.hostname, parts.port
+        self.path = parts.path or "/"
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connection(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _release(self, connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def post(self, body: bytes, headers: dict):
+        """POST to the pool's URL; returns (status, response body)."""
+        for attempt in (1, 2):
+            connection = self._connection()
+            try:
+                connection.request("POST", self.path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                # A pooled connection may have been closed by the server; retry once on a fresh one
+                if attempt == 2:
+                    raise
+                continue
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(connection)
+            return response.status, data
+
+
+class SendGridTransport:
+    """Sends through the SendGrid v3 API over pooled connections, batching with personalizations."""
+
+    def __init__(self, api_key: str, from_email: str, url: str = SENDGRID_API_URL, pool_size: int = SENDGRID_POOL_SIZE):
+        self.api_key = api_key
+        self.from_email = from_email
+        self.pool = HTTPConnectionPool(url, pool_size)
+
+    def _post(self, payload: dict):
+        """Returns (status, error); error is None on success."""
+        status, data = self.pool.post(
+            json.dumps(payload).encode("utf-8"),
+            {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"},
+        )
+        if status >= 300:
+            return status, f"SendGrid returned {status}: {data[:500].decode('utf-8', 'replace')}"
+        return status, None
+
+    @staticmethod
+    def _content(text: Optional[str], html: str) -> list:
+        content = [{"type": "text/plain", "value": text}] if text else []
+        return content + [{"type": "text/html", "value": html}]
+
+    @staticmethod
+    def _personalization(message: OutgoingEmail, batched: bool) -> dict:
+        personalization = {"to": [{"email": message.to_email}], "subject": message.subject}
+        if batched:
+            personalization["substitutions"] = message.substitutions
+        if message.dedupe_key:
+            # Shows up in SendGrid's event webhook, so redelivered messages can be recognised
+            personalization["custom_args"] = {"dedupe_key": message.dedupe_key}
+        return personalization
+
+    def send(self, messages: List[OutgoingEmail]) -> List[Optional[str]]:
+        """Send messages; returns None per delivered message or an error string."""
+        errors = [None] * len(messages)
+        groups = {}
+        for i, message in enumerate(messages):
+            key = message.batch_key if message.substitutions is not None else None
+            groups.setdefault(key, []).append(i)
+
+        for key, indexes in groups.items():
+            # Messages without a shared template go one per request
+            step = SENDGRID_MAX_PERSONALIZATIONS if key is not None else 1
+            for start in range(0, len(indexes), step):
+                self._send_chunk(messages, indexes[start:start + step], key is not None, errors)
+        return errors
+
+    def _send_chunk(self, messages: List[OutgoingEmail], chunk: List[int], batched: bool, errors: list):
+        first = messages[chunk[0]]
+        if batched:
+            content = self._content(first.tagged_text, first.tagged_html)
+        else:
+            content = self._content(first.text, first.html)
+        try:
+            status, error = self._post({
+                "personalizations": [self._personalization(messages[i], batched) for i in chunk],
+                "from": {"email": self.from_email},
+                "subject": first.subject,
+                "content": content,
+            })
+        except Exception as e:
+            status, error = None, str(e) or e.__class__.__name__
+
+        if status in SENDGRID_SPLIT_STATUSES and len(chunk) > 1:
+            # Bisect, so one bad recipient costs about 2*log2(n) requests and fails alone
+            middle = len(chunk) // 2
+            self._send_chunk(messages, chunk[:middle], batched, errors)
+            self._send_chunk(messages, chunk[middle:], batched, errors)
+            return
+        if error:
+            logger.warning("email send failed", extra={"recipients": len(chunk), "error": error})
+        for i in chunk:
+            errors[i] = error
+
+
+class FileSinkTransport:
+    """Appends rendered messages to a JSON-lines file instead of sending them (local runs, benchmarks)."""
+
+    def __init__(self, path: str = MAIL_SINK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, messages: List[OutgoingEmail]) -> List[Optional[str]]:
+        lines = "".join(
+            json.dumps({"to": m.to_email, "subject": m.subject, "html": m.html, "text": m.text, "dedupe_key": m.dedupe_key}) + "\n"
+            for m in messages
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+        return [None] * len(messages)
+
+
+class MemoryTransport:
+    """Keeps sent messages in memory; for tests."""
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, messages: List[OutgoingEmail]) -> List[Optional[str]]:
+        with self._lock:
+            self.sent.extend(asdict(m) for m in messages)
+        return [None] * len(messages)
+
+
+def create_transport(name: str = MAIL_TRANSPORT):
+    if name == "file":
+        return FileSinkTransport()
+    if name == "memory":
+        return MemoryTransport()
+    if name == "sendgrid":
+        return SendGridTransport(SENDGRID_API_KEY, FROM_EMAIL)
+    raise ValueError(f"Unknown BOOKTABLE_MAIL_TRANSPORT {name!r}")
+
+
+# Long-lived transport shared by every sender in this process
+mail_transport = create_transport()
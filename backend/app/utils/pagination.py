@@ -0,0 +1,55 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Response header carrying the cursor for the next page; absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: list) -> str:
+    """Encode the sort-key values of the last row on a page as an opaque cursor."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, length: int, datetime_positions=()) -> list:
+    """
+    Decode a cursor produced by encode_cursor().
+
+    Args:
+        cursor (str): Cursor from a previous page.
+        length (int): Number of sort columns the cursor must hold a value for.
+        datetime_positions (tuple[int]): Indexes of values to parse back into datetimes.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # Anything but a list of one plain value per sort column would fail later, in keyset_after() or the query
+        if not isinstance(values, list) or len(values) != length:
+            raise ValueError("wrong shape")
+        if not all(isinstance(v, (str, int, float)) for v in values):
+            raise ValueError("not a plain value")
+        for i in datetime_positions:
+            values[i] = datetime.fromisoformat(values[i])
+        return values
+    except (ValueError, TypeError, IndexError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def keyset_after(columns: list, values: list, descending: bool = True):
+    """
+    Build a WHERE clause selecting rows that sort after `values` in the order
+    of `columns`, i.e. (c1, c2, ...) < (v1, v2, ...) for descending order and
+    > for ascending, expanded so SQLite can still use the leading index columns.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        after = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tempfile
+
+UPLOADS_URL_PREFIX = "/static/uploads/"
+UPLOADS_DIR = os.path.join("static", "uploads")
+
+# Largest accepted photo upload
+PHOTO_MAX_BYTES = int(os.getenv("BOOKTABLE_PHOTO_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Bytes copied (and hashed) per read, so an upload never sits in memory whole
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Leading bytes of the accepted image formats, with the extension stored on disk
+_SIGNATURES = [
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+]
+
+
+class PhotoTooLarge(Exception):
+    pass
+
+
+class UnsupportedPhoto(Exception):
+    pass
+
+
+def _extension(head: bytes) -> str:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    for signature, extension in _SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    raise UnsupportedPhoto("Photos must be JPEG, PNG, GIF or WebP images.")
+
+
+def upload_path(photo_url: str):
+    """Local file for an uploaded photo URL, or None for anything outside static/uploads."""
+    if not photo_url or not photo_url.startswith(UPLOADS_URL_PREFIX):
+        return None
+    filename = photo_url[len(UPLOADS_URL_PREFIX):]
+    if not filename or "/" in filename or "\\" in filename or filename in (".", ".."):
+        return None
+    return os.path.join(UPLOADS_DIR, filename)
+
+
+def store_photo(source) -> str:
+    """
+    Copy an uploaded image from a binary file object into static/uploads.
+
+    The file is streamed in UPLOAD_CHUNK_SIZE chunks to a temporary file and
+    hashed as it goes, then renamed to `<sha256><ext>`; identical images
+    therefore share one file, and a user-supplied name can never overwrite
+    another upload. Blocking; call it from a worker thread.
+
+    Returns:
+        str: The photo URL under /static/uploads/.
+
+    Raises:
+        PhotoTooLarge: The upload exceeds PHOTO_MAX_BYTES.
+        UnsupportedPhoto: The upload is empty or not a supported image type.
+    """
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=UPLOADS_DIR, prefix=".upload-")
+    try:
+        digest = hashlib.sha256()
+        size, extension = 0, None
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if extension is None:
+                    extension = _extension(chunk)
+                size += len(chunk)
+                if size > PHOTO_MAX_BYTES:
+                    raise PhotoTooLarge(f"Photos may be at most {PHOTO_MAX_BYTES // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                out.write(chunk)
+        if extension is None:
+            raise UnsupportedPhoto("The uploaded file is empty.")
+
+        filename = digest.hexdigest() + extension
+        # Atomic; replacing an identical file also restores one a concurrent
+        # purge just removed
+        # mkstemp creates owner-only files; uploads are served as static files
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, os.path.join(UPLOADS_DIR, filename))
+        return UPLOADS_URL_PREFIX + filename
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,171 @@
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import update
+
+from app.utils.photo_storage import UPLOADS_DIR, UPLOADS_URL_PREFIX, upload_path
+from app.utils.static_assets import asset_url
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # optional dependency, only needed for thumbnails and WebP/AVIF variants
+    Image = None
+
+VARIANTS_DIR = os.path.join(UPLOADS_DIR, "variants")
+VARIANTS_URL_PREFIX = UPLOADS_URL_PREFIX + "variants/"
+
+# Shown when a restaurant has no photo
+PLACEHOLDER_IMAGE_URL = "/static/placeholder-restaurant.svg"
+
+# Longest edge per variant size; images are never scaled up
+PHOTO_VARIANT_SIZES = {"thumb": 400, "large": 1600}
+
+# Encoder quality for the lossy formats
+_QUALITY = {"avif": 55, "webp": 80, "jpeg": 82}
+
+# Processes resizing images; they run outside the API process's GIL
+PHOTO_VARIANT_WORKERS = int(os.getenv("BOOKTABLE_PHOTO_VARIANT_WORKERS", "2"))
+
+# AVIF is smaller still but slow to encode; only used when Pillow was built with it
+PHOTO_AVIF_ENABLED = os.getenv("BOOKTABLE_PHOTO_AVIF", "1") == "1"
+
+_variant_pool = None
+
+
+def variants_available() -> bool:
+    return Image is not None
+
+
+def _formats(size: str):
+    formats = ["webp"]
+    if PHOTO_AVIF_ENABLED and features.check("avif"):
+        formats.insert(0, "avif")
+    # The original already serves as the full-size fallback
+    if size == "thumb":
+        formats.append("jpeg")
+    return formats
+
+
+def render_variants(photo_url: str) -> dict:
+    """
+    Write the resized variants of one uploaded photo; runs in a worker process.
+
+    Files are named after the original (`<stem>.<size>.<ext>`), so photos
+    sharing an upload share their variants and existing files are reused.
+
+    Returns:
+        dict: {size: {format: url}}, e.g. {"thumb": {"webp": "/static/uploads/variants/...", ...}}.
+    """
+    source = upload_path(photo_url)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    os.makedirs(VARIANTS_DIR, exist_ok=True)
+
+    variants = {}
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "PA", "P") and "transparency" in image.info else "RGB")
+
+        for size, edge in PHOTO_VARIANT_SIZES.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            for fmt in _formats(size):
+                filename = f"{stem}.{size}.{fmt}"
+                path = os.path.join(VARIANTS_DIR, filename)
+                if not os.path.exists(path):
+                    encoded = resized.convert("RGB") if fmt == "jpeg" and resized.mode != "RGB" else resized
+                    fd, temp_path = tempfile.mkstemp(dir=VARIANTS_DIR, prefix=".variant-")
+                    try:
+                        with os.fdopen(fd, "wb") as out:
+                            encoded.save(out, format=fmt.upper(), quality=_QUALITY[fmt])
+                        os.chmod(temp_path, 0o644)
+                        os.replace(temp_path, path)
+                    except BaseException:
+                        os.remove(temp_path)
+                        raise
+                variants.setdefault(size, {})[fmt] = VARIANTS_URL_PREFIX + filename
+    return variants
+
+
+def _get_variant_pool() -> ProcessPoolExecutor:
+    global _variant_pool
+    if _variant_pool is None:
+        # spawn avoids forking a process that already runs server and logging threads
+        _variant_pool = ProcessPoolExecutor(
+            max_workers=PHOTO_VARIANT_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _variant_pool
+
+
+def shutdown_variant_pool():
+    global _variant_pool
+    if _variant_pool is not None:
+        _variant_pool.shutdown(wait=False, cancel_futures=True)
+        _variant_pool = None
+
+
+def generate_photo_variants(photo_url: str):
+    """
+    Render the variants of an uploaded photo in the process pool and store
+    their URLs on every photo row using that upload. Blocking; called by
+    the photo_variants job. A no-op without Pillow or for remote URLs.
+    """
+    # Imported here so the spawned worker processes never load the database layer
+    from app.db import models
+    from app.db.database import SessionLocal
+
+    if not variants_available() or upload_path(photo_url) is None:
+        return
+    variants = _get_variant_pool().submit(render_variants, photo_url).result()
+
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(models.RestaurantPhoto)
+            .where(models.RestaurantPhoto.photo_url == photo_url)
+            .values(variants=json.dumps(variants))
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    finally:
+        db.close()
+    logger.info("photo variants generated", extra={"photo_url": photo_url, "sizes": list(variants)})
+
+
+def remove_variants(photo_url: str):
+    """Delete the variant files of an upload that is no longer referenced."""
+    path = upload_path(photo_url)
+    if path is None:
+        return
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for size in PHOTO_VARIANT_SIZES:
+        for fmt in _QUALITY:
+            variant = os.path.join(VARIANTS_DIR, f"{stem}.{size}.{fmt}")
+            try:
+                os.remove(variant)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.exception("photo variant not removed", extra={"path": variant})
+
+
+def image_fields(photo_url: str = None, variants: str = None, size: str = "thumb") -> dict:
+    """
+    Image URLs for an API response: `image` is the smallest widely supported
+    file for `size` (WebP when available), `image_variants` lists every
+    format of that size plus the original, for <picture>/srcset use. Local
+    URLs are versioned (see asset_url), so browsers cache them for good.
+    """
+    if not photo_url:
+        placeholder = asset_url(PLACEHOLDER_IMAGE_URL)
+        return {"image": placeholder, "image_variants": {"original": placeholder}}
+    formats = {fmt: asset_url(url) for fmt, url in json.loads(variants).get(size, {}).items()} if variants else {}
+    formats["original"] = asset_url(photo_url)
+    return {"image": formats.get("webp", formats["original"]), "image_variants": formats}
@@ -1,13 +1,230 @@
+import asyncio
+import base64
+import json
+import logging
 import os
-from twilio.rest import Client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+from urllib.parse import urlencode
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.utils.mail_transport import HTTPConnectionPool
+
+logger = logging.getLogger(__name__)
 
 # Load Twilio credentials and sender number from environment variables
 account_sid = os.getenv("TWILIO_ACCOUNT_SID", "your_account_sid")
 auth_token = os.getenv("TWILIO_AUTH_TOKEN", "your_auth_token")
 from_number = os.getenv("TWILIO_PHONE_NUMBER", "your_twilio_phone_number")
 
-# Initialize Twilio client with account credentials
-client = Client(account_sid, auth_token)
+# twilio (default), file or memory
+SMS_TRANSPORT = os.getenv("BOOKTABLE_SMS_TRANSPORT", "twilio")
+TWILIO_API_URL = os.getenv("BOOKTABLE_TWILIO_API_URL", "https://api.twilio.com")
+
+# Messages in flight at once per process; also the keep-alive connections kept to Twilio
+SMS_CONCURRENCY = int(os.getenv("BOOKTABLE_SMS_CONCURRENCY", "4"))
+
+# Messages per second handed to Twilio per process (0 = unlimited); Twilio queues
+# anything above the sender number's throughput and eventually rejects it
+SMS_RATE_PER_SECOND = float(os.getenv("BOOKTABLE_SMS_RATE_PER_SECOND", "10"))
+
+# Where the file transport appends messages, one JSON object per line
+SMS_SINK_PATH = os.getenv("BOOKTABLE_SMS_SINK_PATH", "sms_sink.jsonl")
+
+
+@dataclass
+class SmsMessage:
+    to_phone: str
+    body: str
+    dedupe_key: Optional[str] = None
+
+
+class TwilioTransport:
+    """Sends through the Twilio Messages API over pooled keep-alive connections."""
+
+    rate_limited = True
+
+    def __init__(self, sid: str, token: str, sender: str, url: str = TWILIO_API_URL):
+        self.sender = sender
+        self.pool = HTTPConnectionPool(f"{url}/2010-04-01/Accounts/{sid}/Messages.json", SMS_CONCURRENCY)
+        self.authorization = "Basic " + base64.b64encode(f"{sid}:{token}".encode()).decode()
+
+    def send(self, message: SmsMessage) -> str:
+        """Send one message; returns its Twilio SID or raises."""
+        status, data = self.pool.post(
+            urlencode({"To": message.to_phone, "From": self.sender, "Body": message.body}).encode(),
+            {"Authorization": self.authorization, "Content-Type": "application/x-www-form-urlencoded"},
+        )
+        if status >= 300:
+            raise RuntimeError(f"Twilio returned {status}: {data[:500].decode('utf-8', 'replace')}")
+        return json.loads(data)["sid"]
+
+
+class FileSinkTransport:
+    """Appends messages to a JSON-lines file instead of sending them (local runs, benchmarks)."""
+
+    rate_limited = False
+
+    def __init__(self, path: str = SMS_SINK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def send(self, message: SmsMessage) -> str:
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(asdict(message)) + "\n")
+            self._count += 1
+            return f"file-{self._count}"
+
+
+class MemoryTransport:
+    """Keeps sent messages in memory; for tests."""
+
+    rate_limited = False
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, message: SmsMessage) -> str:
+        with self._lock:
+            self.sent.append(message)
+            return f"memory-{len(self.sent)}"
+
+
+def create_transport(name: str = SMS_TRANSPORT):
+    if name == "file":
+        return FileSinkTransport()
+    if name == "memory":
+        return MemoryTransport()
+    if name == "twilio":
+        return TwilioTransport(account_sid, auth_token, from_number)
+    raise ValueError(f"Unknown BOOKTABLE_SMS_TRANSPORT {name!r}")
+
+
+class RateLimiter:
+    """Thread-safe pacing: hands out evenly spaced send slots across all callers."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1 / per_second if per_second > 0 else 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Claim the next slot; returns how many seconds to wait for it."""
+        if not self.interval:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            return slot - now
+
+
+sms_rate_limiter = RateLimiter(SMS_RATE_PER_SECOND)
+
+# The transport (and its connections) and the sender threads are created on
+# first use, so importing this module costs nothing
+_transport = None
+_executor = None
+_init_lock = threading.Lock()
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        with _init_lock:
+            if _transport is None:
+                _transport = create_transport()
+    return _transport
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=SMS_CONCURRENCY, thread_name_prefix="sms")
+    return _executor
+
+
+def set_transport(transport):
+    """Replace the process-wide transport, e.g. with MemoryTransport() in tests."""
+    global _transport
+    with _init_lock:
+        _transport = transport
+
+
+async def send_sms_batch(messages: List[SmsMessage]) -> List[Optional[str]]:
+    """
+    Send many messages concurrently without blocking the event loop.
+
+    At most SMS_CONCURRENCY messages are in flight per process and sends are
+    paced to SMS_RATE_PER_SECOND; one failed message does not affect the rest.
+
+    Returns:
+        list: None for each message accepted by the transport, else an error message.
+    """
+    transport = get_transport()
+    executor = _get_executor()
+    loop = asyncio.get_running_loop()
+
+    async def send_one(message: SmsMessage):
+        if transport.rate_limited:
+            await asyncio.sleep(sms_rate_limiter.reserve())
+        try:
+            await loop.run_in_executor(executor, transport.send, message)
+            return None
+        except Exception as e:
+            return str(e) or e.__class__.__name__
+
+    errors = await asyncio.gather(*(send_one(message) for message in messages))
+    failed = sum(1 for error in errors if error)
+    if failed:
+        logger.warning("sms failed", extra={"sent": len(messages) - failed, "failed": failed, "error": next(e for e in errors if e)})
+    else:
+        logger.info("sms sent", extra={"sent": len(messages)})
+    return errors
+
+
+def send_sms_bulk(messages: List[SmsMessage]) -> List[Optional[str]]:
+    """Blocking wrapper around send_sms_batch() for worker threads; same contract."""
+    return asyncio.run(send_sms_batch(messages))
+
+
+def _send_now(message: SmsMessage) -> str:
+    transport = get_transport()
+    if transport.rate_limited:
+        time.sleep(sms_rate_limiter.reserve())
+    return transport.send(message)
+
+
+def booking_confirmation_sms(to_phone, restaurant_name, date, time, number_of_people, dedupe_key=None) -> SmsMessage:
+    return SmsMessage(
+        to_phone,
+        f"Your reservation at {restaurant_name} on {date} at {time} "
+        f"for {number_of_people} {'person' if number_of_people == 1 else 'people'} has been confirmed!",
+        dedupe_key,
+    )
+
+
+def booking_cancellation_sms(to_phone, restaurant_name, date, time, dedupe_key=None) -> SmsMessage:
+    return SmsMessage(to_phone, f"Your reservation at {restaurant_name} on {date} at {time} has been cancelled.", dedupe_key)
+
+
+def booking_reminder_sms(to_phone, restaurant_name, date, time, number_of_people, dedupe_key=None) -> SmsMessage:
+    return SmsMessage(
+        to_phone,
+        f"Reminder: your reservation at {restaurant_name} on {date} at {time} "
+        f"for {number_of_people} {'person' if number_of_people == 1 else 'people'}.",
+        dedupe_key,
+    )
+
 
 # Function to send booking confirmation via SMS
 def send_booking_sms(to_phone, restaurant_name, date, time, number_of_people):
@@ -24,19 +241,15 @@ def send_booking_sms(to_phone, restaurant_name, date, time, number_of_people):
     Returns:
         str: The message SID from Twilio if the message is successfully sent.
     """
+    return _send_now(booking_confirmation_sms(to_phone, restaurant_name, date, time, number_of_people))
 
-    # Construct the SMS message body
-    message_body = (
-        f"Your reservation at {restaurant_name} on {date} at {time} "
-        f"for {number_of_people} {'person' if number_of_people == 1 else 'people'} has been confirmed!"
-    )
 
-    # Send the SMS message using Twilio API
-    message = client.messages.create(
-        body=message_body,
-        from_=from_number,
-        to=to_phone
-    )
+# Function to send booking cancellation via SMS
+def send_booking_cancellation_sms(to_phone, restaurant_name, date, time):
+    """
+    Send an SMS notice that a reservation was cancelled.
 
-    # Return the unique message SID for tracking
-    return message.sid
+    Returns:
+        str: The message SID from Twilio.
+    """
+    return _send_now(booking_cancellation_sms(to_phone, restaurant_name, date, time))
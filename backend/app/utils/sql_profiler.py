@@ -0,0 +1,159 @@
+import os
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+# Profiling is opt-in: set BOOKTABLE_SQL_PROFILE=1 to enable the middleware
+SQL_PROFILE_ENABLED = os.getenv("BOOKTABLE_SQL_PROFILE", "0") == "1"
+
+# A statement shape repeated at least this many times in one request is flagged as a probable N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("BOOKTABLE_SQL_N_PLUS_ONE_THRESHOLD", "3"))
+
+# Number of request reports kept in memory for the debug endpoint
+REPORT_HISTORY_SIZE = int(os.getenv("BOOKTABLE_SQL_PROFILE_HISTORY", "100"))
+
+# Profile collected for the request currently being handled (None when not profiling)
+_current_profile: ContextVar[Optional["QueryProfile"]] = ContextVar("sql_query_profile", default=None)
+
+# Profiles opened by query_budget(); these see statements from every thread,
+# since test clients run the app on a different thread than the test body
+_global_profiles = []
+
+# Most recent request reports, newest last
+recent_reports = deque(maxlen=REPORT_HISTORY_SIZE)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST_RE = re.compile(r"IN \((?:\?|%\(\w+\)s|:\w+)(?:, ?(?:\?|%\(\w+\)s|:\w+))*\)", re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by query_budget() when a block runs more statements than allowed."""
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    Reduce a SQL statement to its shape so repeated lookups can be grouped.
+
+    Literals and IN-lists are collapsed so that `WHERE id = 1` and
+    `WHERE id = 2` count as the same statement.
+    """
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _STRING_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _IN_LIST_RE.sub("IN (...)", shape)
+    return shape
+
+
+class QueryProfile:
+    """Statement counts and timings collected for a single request or block."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.total_ms = 0.0
+        self.shapes = Counter()
+        self.shape_ms = Counter()
+
+    def record(self, statement: str, elapsed_ms: float):
+        shape = normalize_statement(statement)
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.shapes[shape] += 1
+        self.shape_ms[shape] += elapsed_ms
+
+    def suspected_n_plus_one(self, threshold: int = None):
+        threshold = threshold or N_PLUS_ONE_THRESHOLD
+        return [
+            {"statement": shape, "count": count, "total_ms": round(self.shape_ms[shape], 3)}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+    def header_value(self) -> str:
+        return f"count={self.count}; time_ms={self.total_ms:.2f}; n_plus_one={len(self.suspected_n_plus_one())}"
+
+    def report(self) -> dict:
+        return {
+            "label": self.label,
+            "query_count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "suspected_n_plus_one": self.suspected_n_plus_one(),
+            "statements": [
+                {"statement": shape, "count": count, "total_ms": round(self.shape_ms[shape], 3)}
+                for shape, count in self.shapes.most_common()
+            ],
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None or _global_profiles:
+        conn.info.setdefault("sql_profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("sql_profile_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(statement, elapsed_ms)
+    for budget_profile in list(_global_profiles):
+        budget_profile.record(statement, elapsed_ms)
+
+
+def install(engine):
+    """
+    Attach the profiling hooks to an engine. Safe to call more than once.
+
+    Args:
+        engine: The SQLAlchemy engine whose statements should be counted.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_profile(label: str = ""):
+    """Begin collecting statements for the current context; returns the profile and a reset token."""
+    profile = QueryProfile(label)
+    token = _current_profile.set(profile)
+    return profile, token
+
+
+def finish_profile(profile: QueryProfile, token):
+    """Stop collecting and store the report in the recent history."""
+    _current_profile.reset(token)
+    recent_reports.append(profile.report())
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "query_budget"):
+    """
+    Fail when the wrapped block executes more than `max_queries` statements.
+
+    Intended for tests, e.g. `with query_budget(3): client.get("/admin/restaurants/pending")`.
+    The engine must have been passed to install() first.
+
+    Raises:
+        QueryBudgetExceeded: If the budget is exceeded. Subclasses AssertionError so
+        pytest reports it as a normal test failure.
+    """
+    profile = QueryProfile(label)
+    _global_profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        _global_profiles.remove(profile)
+    if profile.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{label}: {profile.count} queries executed, budget is {max_queries}. "
+            f"Suspected N+1: {profile.suspected_n_plus_one()}"
+        )
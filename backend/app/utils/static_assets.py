@@ -0,0 +1,220 @@
+import gzip
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+from urllib.parse import parse_qs
+
+import anyio
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # optional dependency; without it only gzip siblings are served
+    brotli = None
+
+STATIC_URL_PREFIX = "/static/"
+STATIC_DIR = "static"
+
+# Long-lived caching for URLs that change whenever the content does
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Everything else is revalidated with its ETag (a 304 carries no body)
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Uploads and their variants are named after their sha256
+_HASHED_NAME = re.compile(r"^[0-9a-f]{64}(\.|$)")
+
+# Text formats worth serving precompressed; images are compressed already
+COMPRESSIBLE_EXTENSIONS = {".css", ".html", ".js", ".json", ".map", ".svg", ".txt", ".xml"}
+
+# Sibling suffix per Content-Encoding, in order of preference
+_PRECOMPRESSED = [("br", ".br"), ("gzip", ".gz")]
+
+# Optional sendfile fast path behind a proxy: X-Accel-Redirect (nginx) or
+# X-Sendfile (Apache, lighttpd). The app then only sends headers and the
+# proxy serves the file, ranges included.
+STATIC_SENDFILE_HEADER = os.getenv("BOOKTABLE_STATIC_SENDFILE_HEADER", "")
+# X-Accel-Redirect target prefix, an `internal` nginx location aliased to static/
+STATIC_SENDFILE_PREFIX = os.getenv("BOOKTABLE_STATIC_SENDFILE_PREFIX", "/internal-static/")
+
+# path -> (mtime_ns, size, version)
+_versions = {}
+
+
+def _is_hashed(path: str) -> bool:
+    return bool(_HASHED_NAME.match(os.path.basename(path)))
+
+
+def _file_version(path: str, stat_result: os.stat_result) -> str:
+    cached = _versions.get(path)
+    if cached and cached[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+        return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    version = digest.hexdigest()[:12]
+    _versions[path] = (stat_result.st_mtime_ns, stat_result.st_size, version)
+    return version
+
+
+def asset_url(url: str) -> str:
+    """
+    Cache-busting URL for a file under /static/.
+
+    Content-hashed uploads are returned as they are; any other local file
+    gets `?v=<content hash>`, so both can be cached as immutable. Remote and
+    missing files are returned unchanged.
+    """
+    if not url or not url.startswith(STATIC_URL_PREFIX) or "?" in url:
+        return url
+    relative = url[len(STATIC_URL_PREFIX):]
+    if _is_hashed(relative) or ".." in relative.split("/"):
+        return url
+    path = os.path.join(STATIC_DIR, relative)
+    try:
+        version = _file_version(path, os.stat(path))
+    except OSError:
+        return url
+    return f"{url}?v={version}"
+
+
+def _accepted_encodings(scope) -> set:
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            return {
+                part.split(";")[0].strip()
+                for part in value.decode("latin-1").lower().split(",")
+                if not part.replace(" ", "").endswith(";q=0")
+            }
+    return set()
+
+
+def _compress(path: str, encoding: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def precompress(path: str, stat_result: os.stat_result = None, encodings=("br", "gzip")):
+    """
+    Write the .br/.gz siblings of a compressible file unless they are up to
+    date. Blocking.
+
+    Returns:
+        list: (encoding, sibling path) for each sibling now on disk.
+    """
+    stat_result = stat_result or os.stat(path)
+    written = []
+    for encoding, suffix in _PRECOMPRESSED:
+        if encoding not in encodings or (encoding == "br" and brotli is None):
+            continue
+        sibling = path + suffix
+        try:
+            if os.stat(sibling).st_mtime_ns >= stat_result.st_mtime_ns:
+                written.append((encoding, sibling))
+                continue
+        except FileNotFoundError:
+            pass
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".precompress-")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(_compress(path, encoding))
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, sibling)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        written.append((encoding, sibling))
+    return written
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with cache headers suited to versioned URLs.
+
+    - Content-hashed files and `?v=` URLs (see asset_url) are sent with
+      `Cache-Control: immutable`, so browsers reuse them without a request;
+      other files must revalidate and get a bodyless 304 when unchanged.
+    - Compressible files are served from a .br/.gz sibling when the client
+      accepts it; missing siblings are written on first request.
+    - Range requests are answered by FileResponse.
+    - With BOOKTABLE_STATIC_SENDFILE_HEADER set, the file itself is left to
+      the proxy in front of the app.
+    """
+
+    async def get_response(self, path: str, scope) -> Response:
+        compressible = os.path.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+        response = None
+        if compressible and scope["method"] in ("GET", "HEAD"):
+            encodings = _accepted_encodings(scope)
+            if encodings & {"br", "gzip"}:
+                response = await self._precompressed_response(path, scope, encodings)
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if response.status_code in (200, 206, 304):
+            response.headers["cache-control"] = self._cache_control(path, scope)
+            if compressible:
+                response.headers["vary"] = "Accept-Encoding"
+        return response
+
+    async def _precompressed_response(self, path: str, scope, encodings: set):
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if stat_result is None or not os.path.isfile(full_path):
+            return None
+        try:
+            siblings = await anyio.to_thread.run_sync(precompress, full_path, stat_result, encodings)
+        except OSError:
+            # Read-only static directory; serve the file uncompressed
+            logger.warning("static file not precompressed", extra={"path": full_path}, exc_info=True)
+            return None
+        if not siblings:
+            return None
+        encoding, sibling = siblings[0]
+        response = self.file_response(sibling, os.stat(sibling), scope)
+        # The content type is guessed from the original name (a.svg.gz -> image/svg+xml)
+        if response.status_code != 304:
+            response.headers["content-encoding"] = encoding
+        return response
+
+    @staticmethod
+    def _cache_control(path: str, scope) -> str:
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if _is_hashed(path) or "v" in query:
+            return IMMUTABLE_CACHE_CONTROL
+        return REVALIDATE_CACHE_CONTROL
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if not STATIC_SENDFILE_HEADER or response.status_code == 304:
+            return response
+
+        if STATIC_SENDFILE_HEADER.lower() == "x-accel-redirect":
+            relative = os.path.relpath(full_path, os.path.realpath(self.directory))
+            target = STATIC_SENDFILE_PREFIX.rstrip("/") + "/" + relative.replace(os.sep, "/")
+        else:
+            target = os.path.realpath(full_path)
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name in ("content-type", "etag", "last-modified")
+        }
+        headers[STATIC_SENDFILE_HEADER] = target
+        return Response(status_code=status_code, headers=headers)
+
+
+if __name__ == "__main__":
+    # python -m app.utils.static_assets: precompress everything under static/ ahead of deploys
+    count = 0
+    for root, dirs, files in os.walk(sys.argv[1] if len(sys.argv) > 1 else STATIC_DIR):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                count += len(precompress(os.path.join(root, name)))
+    print(f"{count} precompressed files up to date")
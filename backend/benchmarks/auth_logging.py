@@ -0,0 +1,73 @@
+"""
+Per-call cost of get_current_user's logging: the baseline print() calls
+against the queued JSON logging that replaced them.
+
+Both variants decode the token and load the user from the database on
+every call (the user cache is cleared between calls), so the difference
+is the logging. Run from backend/ with stdout discarded or piped, as in
+production; the results are printed to stderr:
+
+    python -m benchmarks.auth_logging --calls 5000 --runs 5 > /dev/null
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from jose import jwt
+
+from app.auth.auth_dependency import get_current_user, get_token_claims
+from app.auth.auth_handler import ALGORITHM, SECRET_KEY, create_access_token
+from app.auth.user_cache import user_cache
+from app.db import models
+from app.db.database import SessionLocal
+from app.utils.logging_config import configure_logging, shutdown_logging
+
+
+def print_variant(header: str, db):
+    # get_current_user as it was before structured logging
+    print("\nRaw Authorization Header:", header)
+    payload = jwt.decode(header.split(" ")[1], SECRET_KEY, algorithms=[ALGORITHM])
+    print("Decoded JWT Payload:", payload)
+    print("Looking up user with email:", payload["sub"])
+    user = db.query(models.User).filter(models.User.email == payload["sub"]).first()
+    print("Authenticated user:", user.email, user.role)
+    return user
+
+
+def logging_variant(header: str, db):
+    user_cache.clear()
+    return get_current_user(get_token_claims(header), db)
+
+
+def time_calls(func, header: str, db, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func(header, db)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    configure_logging()
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).first()
+        if user is None:
+            sys.exit("No users in the database; start the server once to seed it.")
+        header = "Bearer " + create_access_token({"sub": user.email, "uid": user.id, "role": user.role})
+
+        for name, func in (("print", print_variant), ("logging", logging_variant)):
+            timings = [time_calls(func, header, db, args.calls) for _ in range(args.runs)]
+            print(f"{name:8} {statistics.median(timings):8.1f} us/call (median of {args.runs} x {args.calls})", file=sys.stderr)
+    finally:
+        db.close()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Cost of fanning booking events out to live feed connections.
+
+fanout: BookingFeed.fan_out() of --events events for one restaurant to
+--subscribers subscriptions of it (events x subscribers deliveries), on
+an event loop as in the server:
+
+    python -m benchmarks.booking_feed fanout --subscribers 10000 --events 100
+
+sse: starts the app with uvicorn on a scratch database, opens --clients
+GET /manager/bookings/feed connections, books a table over HTTP and
+reports how long until the last connection received the event:
+
+    python -m benchmarks.booking_feed sse --clients 2000
+
+Run from backend/.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+
+def fanout(subscribers: int, events: int, runs: int):
+    from app.utils.booking_feed import BookingFeed, MemoryBackend
+
+    async def run_once() -> float:
+        feed = BookingFeed(MemoryBackend())
+        subscriptions = [feed.subscribe([1], max_pending=events) for _ in range(subscribers)]
+        batch = [{"type": "booking.created", "restaurant_id": 1, "reservation_id": n} for n in range(events)]
+        start = time.perf_counter()
+        feed.fan_out(batch)
+        elapsed = time.perf_counter() - start
+        delivered = 0
+        for subscription in subscriptions:
+            delivered += len(await subscription.next_batch(timeout=0))
+        assert delivered == subscribers * events, delivered
+        return elapsed
+
+    timings = [asyncio.run(run_once()) for _ in range(runs)]
+    print(f"{subscribers} subscribers x {events} events = {subscribers * events} deliveries: "
+          f"{statistics.median(timings):.2f}s (median of {runs})")
+
+
+def sse(clients: int):
+    # A private database and no real email/SMS; set before the app is imported
+    scratch = tempfile.mkdtemp(prefix="booktable-bench-")
+    os.environ["BOOKTABLE_DATABASE_URL"] = f"sqlite:///{scratch}/booktable.db"
+    os.environ.setdefault("BOOKTABLE_BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("BOOKTABLE_MAIL_TRANSPORT", "memory")
+    os.environ.setdefault("BOOKTABLE_SMS_TRANSPORT", "memory")
+    os.environ.setdefault("BOOKTABLE_LOG_LEVEL", "WARNING")
+
+    import httpx
+    import uvicorn
+
+    from app.auth.auth_handler import create_access_token
+    from app.db import models
+    from app.db.database import SessionLocal
+    from app.main import app
+
+    # Each connection needs a descriptor on both ends
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < 2 * clients + 100:
+        raise SystemExit(f"Open file limit {hard} is too low for {clients} clients.")
+
+    db = SessionLocal()
+    try:
+        manager = models.User(email="bench-manager@example.com", hashed_password="x", full_name="Bench", role="RestaurantManager")
+        customer = models.User(email="bench-customer@example.com", hashed_password="x", full_name="Bench", role="Customer")
+        db.add_all([manager, customer])
+        db.flush()
+        restaurant = models.Restaurant(
+            name="Bench Bistro", cuisine="Italian", cost_rating=2, city="San Jose", state="CA", zip_code="95112",
+            manager_id=manager.id,
+        )
+        db.add(restaurant)
+        db.flush()
+        db.add(models.RestaurantApproval(restaurant_id=restaurant.id, status="approved"))
+        table = models.Table(restaurant_id=restaurant.id, size=4, available_times="19:00")
+        db.add(table)
+        db.commit()
+        manager_token = create_access_token({"sub": manager.email, "uid": manager.id, "role": manager.role})
+        customer_token = create_access_token({"sub": customer.email, "uid": customer.id, "role": customer.role})
+        restaurant_id, table_id = restaurant.id, table.id
+    finally:
+        db.close()
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="warning", backlog=4096, timeout_graceful_shutdown=1,
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    async def follow(connected: asyncio.Semaphore, received: list):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            f"GET /manager/bookings/feed HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Authorization: Bearer {manager_token}\r\nAccept: text/event-stream\r\n\r\n".encode()
+        )
+        await writer.drain()
+        await reader.readuntil(b"retry:")
+        connected.release()
+        await reader.readuntil(b"event: booking.created")
+        received.append(time.perf_counter())
+        writer.close()
+
+    async def run():
+        connected, received = asyncio.Semaphore(0), []
+        start = time.perf_counter()
+        followers = [asyncio.create_task(follow(connected, received)) for _ in range(clients)]
+        for _ in range(clients):
+            await connected.acquire()
+        print(f"{clients} feed connections open after {time.perf_counter() - start:.1f}s")
+
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as http:
+            booked_at = time.perf_counter()
+            response = await http.post(
+                f"/restaurants/{restaurant_id}/book",
+                headers={"Authorization": f"Bearer {customer_token}"},
+                json={"table_id": table_id, "date": (date.today() + timedelta(days=1)).isoformat(), "time": "19:00",
+                      "number_of_people": 2},
+            )
+            response.raise_for_status()
+        await asyncio.gather(*followers)
+        received.sort()
+        print(f"booking event: first client after {received[0] - booked_at:.2f}s, "
+              f"median {statistics.median(received) - booked_at:.2f}s, last {received[-1] - booked_at:.2f}s")
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.should_exit = True
+        thread.join(10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    modes = parser.add_subparsers(dest="mode", required=True)
+    fan = modes.add_parser("fanout")
+    fan.add_argument("--subscribers", type=int, default=10000)
+    fan.add_argument("--events", type=int, default=100)
+    fan.add_argument("--runs", type=int, default=5)
+    stream = modes.add_parser("sse")
+    stream.add_argument("--clients", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.mode == "fanout":
+        fanout(args.subscribers, args.events, args.runs)
+    else:
+        sse(args.clients)
+
+
+if __name__ == "__main__":
+    main()
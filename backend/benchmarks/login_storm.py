@@ -0,0 +1,104 @@
+"""
+Search latency during a login storm.
+
+Starts the app with uvicorn on a scratch (seeded) database, times
+--searches sequential /restaurants/search calls on their own, then again
+while --logins concurrent /users/login requests are in flight. With
+bcrypt in the bounded process pool the two should be close; logins past
+BOOKTABLE_PASSWORD_HASH_MAX_PENDING get 429 instead of queueing:
+
+    python -m benchmarks.login_storm --logins 200 --searches 40
+
+Run from backend/.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+PASSWORD = "Secret123!"
+
+
+def percentiles(latencies: list) -> str:
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return f"p50/p95 {statistics.median(latencies) * 1000:.0f}/{p95 * 1000:.0f} ms"
+
+
+async def time_searches(http, count: int) -> list:
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await http.get("/restaurants/search")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def login(http) -> int:
+    response = await http.post("/users/login", json={"email": "storm@example.com", "password": PASSWORD})
+    return response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--searches", type=int, default=40)
+    args = parser.parse_args()
+
+    # A private database and no real email/SMS; set before the app is imported
+    scratch = tempfile.mkdtemp(prefix="booktable-bench-")
+    os.environ["BOOKTABLE_DATABASE_URL"] = f"sqlite:///{scratch}/booktable.db"
+    os.environ.setdefault("BOOKTABLE_MAIL_TRANSPORT", "memory")
+    os.environ.setdefault("BOOKTABLE_SMS_TRANSPORT", "memory")
+    os.environ.setdefault("BOOKTABLE_LOG_LEVEL", "WARNING")
+
+    import httpx
+    import uvicorn
+
+    from app.main import app
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", timeout_graceful_shutdown=1))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    async def run():
+        limits = httpx.Limits(max_connections=args.logins + 10)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=120) as http:
+            response = await http.post("/users/register", json={
+                "email": "storm@example.com", "password": PASSWORD, "full_name": "Storm", "role": "Customer",
+            })
+            response.raise_for_status()
+            # Warm up the hashing pool's worker processes
+            await login(http)
+
+            idle = await time_searches(http, args.searches)
+            print(f"search, idle:        {percentiles(idle)}")
+
+            start = time.perf_counter()
+            logins = [asyncio.create_task(login(http)) for _ in range(args.logins)]
+            storm = await time_searches(http, args.searches)
+            statuses = Counter(await asyncio.gather(*logins))
+            print(f"search, during storm: {percentiles(storm)}")
+            print(f"{args.logins} logins in {time.perf_counter() - start:.1f}s: "
+                  + ", ".join(f"{count}x {status}" for status, count in sorted(statuses.items())))
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.should_exit = True
+        thread.join(10)
+
+
+if __name__ == "__main__":
+    main()
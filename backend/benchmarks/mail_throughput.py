@@ -0,0 +1,121 @@
+"""
+Booking email throughput through the mail transports.
+
+A local keep-alive HTTP server stands in for the SendGrid API (it answers
+202 to every request), so this measures the client side: rendering,
+batching into personalizations, and connection reuse.
+
+    python -m benchmarks.mail_throughput --batch 10000 --single 1000
+
+- batched: send_booking_confirmations() of --batch bookings (one request
+  per SENDGRID_MAX_PERSONALIZATIONS messages)
+- single: --single send_booking_confirmation() calls, one request each over
+  the pooled connections
+- legacy: --single messages through a new SendGridAPIClient each, as the
+  senders did before the pooled transport, rendered with today's templates
+  (skipped without the sendgrid package)
+- file: --batch bookings appended to the file sink
+
+Run from backend/.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# No real transport is created at import; each variant installs its own
+os.environ.setdefault("BOOKTABLE_MAIL_TRANSPORT", "memory")
+
+from app.utils import email_utils, mail_transport  # noqa: E402
+from app.utils.email_utils import BookingConfirmationDetails  # noqa: E402
+
+
+class FakeSendGrid(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with FakeSendGrid.lock:
+            FakeSendGrid.requests += 1
+        self.send_response(202)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def bookings(count: int):
+    return [
+        (f"guest{n}@example.com", BookingConfirmationDetails(
+            id=str(n), restaurant_name="Test Bistro", date="Friday, March 14, 2025", time="19:00",
+            people=2, table_type="Table #3", address="San Jose, CA 95112",
+        ))
+        for n in range(count)
+    ]
+
+
+def report(name: str, count: int, elapsed: float):
+    with FakeSendGrid.lock:
+        requests, FakeSendGrid.requests = FakeSendGrid.requests, 0
+    print(f"{name:8} {count:6} messages in {elapsed:.2f}s ({count / elapsed:,.0f}/s, {requests} requests)")
+
+
+def legacy_send(url: str, to_email: str, details: BookingConfirmationDetails):
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+
+    rendered = email_utils.render_booking_confirmation(to_email, details)
+    message = Mail(from_email="bookings@example.com", to_emails=to_email, subject=rendered.subject, html_content=rendered.html)
+    SendGridAPIClient("bench-key", host=url).send(message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", type=int, default=10000)
+    parser.add_argument("--single", type=int, default=1000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSendGrid)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        mail_transport.mail_transport = mail_transport.SendGridTransport("bench-key", "bookings@example.com", url=f"{url}/v3/mail/send")
+        batch = bookings(args.batch)
+        start = time.perf_counter()
+        errors = email_utils.send_booking_confirmations(batch)
+        report("batched", args.batch, time.perf_counter() - start)
+        assert not any(errors), errors[:3]
+
+        start = time.perf_counter()
+        for to_email, details in bookings(args.single):
+            assert email_utils.send_booking_confirmation(to_email, details)["success"]
+        report("single", args.single, time.perf_counter() - start)
+
+        try:
+            import sendgrid  # noqa: F401
+        except ImportError:
+            print("legacy   skipped (sendgrid package not installed)")
+        else:
+            start = time.perf_counter()
+            for to_email, details in bookings(args.single):
+                legacy_send(url, to_email, details)
+            report("legacy", args.single, time.perf_counter() - start)
+
+        with tempfile.TemporaryDirectory() as scratch:
+            mail_transport.mail_transport = mail_transport.FileSinkTransport(os.path.join(scratch, "mail_sink.jsonl"))
+            start = time.perf_counter()
+            email_utils.send_booking_confirmations(batch)
+            report("file", args.batch, time.perf_counter() - start)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import logging
+import os
+
+# Point the app at a private in-memory database before any app module creates the engine
+os.environ.setdefault("BOOKTABLE_DATABASE_URL", "sqlite://")
+os.environ.setdefault("BOOKTABLE_BCRYPT_ROUNDS", "4")
+
+import pytest
+
+from app.auth.auth_handler import create_access_token, hash_password
+from app.auth.user_cache import user_cache
+from app.db import models
+from app.db.database import Base, SessionLocal, engine
+from app.db.migrations import upgrade_schema
+from app.db.reservation_analytics import closed_bucket_cache
+from app.utils import sql_profiler
+
+
+@pytest.fixture(autouse=True)
+def fresh_database():
+    """Every test starts from empty tables and empty in-process caches."""
+    Base.metadata.drop_all(bind=engine)
+    upgrade_schema(engine)
+    user_cache.clear()
+    closed_bucket_cache.clear()
+    yield
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    # Without `with`, the startup hooks (seeding, job worker, feed) do not run
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_user(db):
+    """Factory creating a user and returning (user, Authorization headers)."""
+    def factory(role: str = "Customer", email: str = None):
+        user = models.User(
+            email=email or f"{role.lower()}{db.query(models.User).count() + 1}@example.com",
+            hashed_password=hash_password("password"),
+            full_name=f"Test {role}",
+            role=role,
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        token = create_access_token({"sub": user.email, "uid": user.id, "role": user.role})
+        return user, {"Authorization": f"Bearer {token}"}
+    return factory
+
+
+@pytest.fixture
+def admin_headers(make_user):
+    return make_user("Admin")[1]
+
+
+@pytest.fixture
+def make_restaurant(db, make_user):
+    """Factory creating an approved restaurant with one table bookable at 18:00, 19:00 and 20:00."""
+    def factory(name: str = "Test Bistro", table_size: int = 4):
+        manager, _ = make_user("RestaurantManager")
+        restaurant = models.Restaurant(
+            name=name, cuisine="Italian", cost_rating=2, city="San Jose", state="CA", zip_code="95112",
+            manager_id=manager.id,
+        )
+        db.add(restaurant)
+        db.flush()
+        db.add(models.RestaurantApproval(restaurant_id=restaurant.id, status="approved"))
+        db.add(models.Table(restaurant_id=restaurant.id, size=table_size, available_times="18:00,19:00,20:00"))
+        db.commit()
+        db.refresh(restaurant)
+        return restaurant
+    return factory
+
+
+@pytest.fixture
+def book(client, db):
+    """Book a restaurant's first table through the API; returns the response."""
+    def factory(headers, restaurant, day, at: str = "19:00", people: int = 2, phone: str = None):
+        table = db.query(models.Table).filter(models.Table.restaurant_id == restaurant.id).first()
+        return client.post(f"/restaurants/{restaurant.id}/book", headers=headers, json={
+            "table_id": table.id, "date": day.isoformat(), "time": at, "number_of_people": people, "phone": phone,
+        })
+    return factory
+
+
+@pytest.fixture
+def app_logs(caplog, monkeypatch):
+    """caplog that also sees the "app" loggers, which stop propagating once app.main configures logging."""
+    monkeypatch.setattr(logging.getLogger("app"), "propagate", True)
+    return caplog
+
+
+@pytest.fixture
+def query_budget():
+    """
+    sql_profiler.query_budget with the profiling hooks installed, e.g.
+    `with query_budget(3): client.get(...)` fails the test past 3 statements.
+    """
+    sql_profiler.install(engine)
+    return sql_profiler.query_budget
@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+
+from app.db import models
+from app.utils.booking_feed import BookingFeed, DatabaseBackend, MemoryBackend
+
+
+def test_booking_without_a_started_feed_logs_no_error(app_logs, make_user, make_restaurant, book):
+    restaurant = make_restaurant()
+    _, headers = make_user("Customer")
+
+    with app_logs.at_level(logging.ERROR, logger="app.utils.booking_feed"):
+        assert book(headers, restaurant, date.today() + timedelta(days=1)).status_code == 200
+
+    assert [r.message for r in app_logs.records if r.name == "app.utils.booking_feed"] == []
+
+
+def test_fan_out_reaches_subscribers_of_that_restaurant():
+    async def run():
+        feed = BookingFeed(MemoryBackend())
+        first, second, other = feed.subscribe([1]), feed.subscribe([1, 2]), feed.subscribe([3])
+        feed.fan_out([{"type": "booking.created", "restaurant_id": 1}, {"type": "booking.created", "restaurant_id": 2}])
+        batches = [await s.next_batch(timeout=0) for s in (first, second, other)]
+        feed.unsubscribe(first)
+        return batches, feed.subscribers()
+
+    (first, second, other), remaining = asyncio.run(run())
+    assert [e["restaurant_id"] for e in first] == [1]
+    assert [e["restaurant_id"] for e in second] == [1, 2]
+    assert other == []
+    assert remaining == 2
+
+
+def test_slow_subscriber_gets_a_resync():
+    async def run():
+        feed = BookingFeed(MemoryBackend())
+        subscription = feed.subscribe([1], max_pending=2)
+        feed.fan_out([{"type": "booking.created", "restaurant_id": 1, "n": n} for n in range(5)])
+        return await subscription.next_batch(timeout=0)
+
+    batch = asyncio.run(run())
+    assert batch[0] == {"type": "resync", "dropped": 3}
+    assert [e["n"] for e in batch[1:]] == [3, 4]
+
+
+def database_backend():
+    """A database backend polled by hand, collecting what it delivers."""
+    backend, received = DatabaseBackend(), []
+    backend._deliver = received.extend
+    backend._last_id = 0
+    return backend, received
+
+
+def test_database_backend_delivers_after_cleanup_empties_the_table(db):
+    publisher, _ = database_backend()
+    reader, received = database_backend()
+    publisher.publish([{"type": "booking.created", "restaurant_id": 1, "n": n} for n in range(3)])
+    reader.poll()
+    assert [e["n"] for e in received] == [0, 1, 2]
+
+    # An idle hour later, the retention cleanup runs
+    db.query(models.BookingEvent).update({"created_at": datetime.utcnow() - timedelta(hours=2)})
+    db.commit()
+    reader._last_cleanup = datetime.utcnow() - timedelta(minutes=5)
+    reader.poll()
+    assert db.query(models.BookingEvent).count() == 1  # the newest row is kept
+
+    publisher.publish([{"type": "booking.created", "restaurant_id": 1, "n": 3}])
+    reader.poll()
+    assert [e["n"] for e in received] == [0, 1, 2, 3]
@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+
+from app.db import models
+
+
+def notification_jobs(db):
+    db.expire_all()
+    return sorted((job.type, job.dedupe_key) for job in db.query(models.Job))
+
+
+def test_rebooking_a_reused_reservation_id_queues_its_own_notifications(client, db, make_user, make_restaurant, book):
+    restaurant = make_restaurant()
+    _, headers = make_user("Customer")
+    day = date.today() + timedelta(days=3)
+
+    first = book(headers, restaurant, day, phone="+15550100").json()["reservation_id"]
+    assert client.delete(f"/restaurants/reservations/{first}/cancel", headers=headers).status_code == 200
+    second = book(headers, restaurant, day, phone="+15550100").json()["reservation_id"]
+
+    # SQLite hands the cancelled (deleted) booking's id to the next one
+    assert second == first
+
+    jobs = notification_jobs(db)
+    types = [job_type for job_type, _ in jobs]
+    assert types.count("booking_confirmation_email") == 2
+    assert types.count("booking_confirmation_sms") == 2
+    assert types.count("booking_cancellation_email") == 1
+    assert len({key for _, key in jobs}) == len(jobs)
+
+    assert client.delete(f"/restaurants/reservations/{second}/cancel", headers=headers).status_code == 200
+    types = [job_type for job_type, _ in notification_jobs(db)]
+    assert types.count("booking_cancellation_email") == 2
+    assert types.count("booking_cancellation_sms") == 2
+
+
+def test_retried_notifications_for_one_booking_are_deduplicated(db, make_user, make_restaurant, book):
+    from app.jobs.notifications import enqueue_booking_notifications
+
+    restaurant = make_restaurant()
+    user, headers = make_user("Customer")
+    book(headers, restaurant, date.today() + timedelta(days=3))
+    reservation = db.query(models.Reservation).one()
+
+    enqueue_booking_notifications(db, "confirmation", reservation, restaurant, user.email)
+    db.commit()
+
+    assert [job_type for job_type, _ in notification_jobs(db)] == ["booking_confirmation_email"]
@@ -0,0 +1,50 @@
+import io
+import json
+
+from app.db import models
+from app.db.bulk_import import IMPORT_MAX_LINE_BYTES, LineSplitter, iter_lines
+
+
+def restaurant_line(name: str) -> bytes:
+    return json.dumps({
+        "name": name, "cuisine": "Thai", "cost_rating": 2, "city": "Austin", "state": "TX", "zip_code": "73301",
+    }).encode() + b"\n"
+
+
+def test_line_splitter_joins_pieces_and_multibyte_characters():
+    splitter = LineSplitter()
+    data = "café,1\nnaïve,2\nlast".encode()
+    lines = []
+    for i in range(len(data)):
+        lines += splitter.feed(data[i:i + 1])
+    lines += splitter.finish()
+    assert lines == ["café,1", "naïve,2", "last"]
+
+
+def test_line_splitter_discards_over_long_lines():
+    splitter = LineSplitter(max_line_bytes=8)
+    lines = splitter.feed(b"short\n" + b"x" * 5) + splitter.feed(b"y" * 50) + splitter.feed(b"\nok\n")
+    assert lines == ["short", None, "ok"]
+    assert len(splitter._buffer) == 0
+
+
+def test_iter_lines_reads_a_binary_file():
+    assert list(iter_lines(io.BytesIO(b"a\nb\r\n"), read_size=1)) == ["a", "b\r"]
+
+
+def test_upload_rejects_over_long_line_and_imports_the_rest(client, db, admin_headers):
+    body = restaurant_line("First") + b'{"name": "' + b"x" * IMPORT_MAX_LINE_BYTES + b'"}\n' + restaurant_line("Second")
+
+    response = client.post("/admin/import/restaurants", content=body, headers=admin_headers)
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 2
+    assert report["errors"] == [{"row": 2, "error": f"Line longer than {IMPORT_MAX_LINE_BYTES} bytes"}]
+    assert {r.name for r in db.query(models.Restaurant)} == {"First", "Second"}
+
+
+def test_upload_without_trailing_newline(client, admin_headers):
+    body = b"name,cuisine,cost_rating,city,state,zip_code\nLast,Thai,2,Austin,TX,73301"
+    response = client.post("/admin/import/restaurants", params={"format": "csv"}, content=body, headers=admin_headers)
+    assert response.json()["imported"] == 1
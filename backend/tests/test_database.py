@@ -0,0 +1,33 @@
+from sqlalchemy import text
+
+from app.db import models
+from app.db.database import begin_atomic
+
+
+def in_transaction(db) -> bool:
+    return db.connection().connection.dbapi_connection.in_transaction
+
+
+def test_begin_atomic_starts_transaction_before_first_write(db):
+    begin_atomic(db)
+    db.execute(text("SELECT 1"))
+    assert in_transaction(db)
+
+
+def test_atomic_writes_roll_back_together(db, make_user):
+    user, _ = make_user("Customer")
+    db.close()
+
+    begin_atomic(db)
+    db.query(models.User).filter(models.User.id == user.id).update({"full_name": "Changed"})
+    db.add(models.User(email="other@example.com", hashed_password="x", role="Customer"))
+    db.flush()
+    db.rollback()
+
+    assert db.query(models.User).count() == 1
+    assert db.get(models.User, user.id).full_name == "Test Customer"
+
+
+def test_plain_sessions_stay_in_autocommit(db):
+    db.execute(text("SELECT 1"))
+    assert not in_transaction(db)
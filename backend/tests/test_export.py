@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db import export, models
+from app.db.database import Base
+
+
+def add_review(conn, n):
+    conn.execute(insert(models.Review).values(restaurant_id=1, user_id=1, rating=5, comment=f"review {n}", created_at=datetime(2025, 1, 1)))
+
+
+def test_export_holds_no_read_between_batches(tmp_path, monkeypatch):
+    # A file database (the shared in-memory one has no locking) whose writers give up at once
+    file_engine = create_engine(f"sqlite:///{tmp_path}/export.db", connect_args={"timeout": 0})
+    Base.metadata.create_all(file_engine)
+    with file_engine.begin() as conn:
+        for n in range(5):
+            add_review(conn, n)
+    monkeypatch.setattr(export, "SessionLocal", sessionmaker(bind=file_engine))
+    monkeypatch.setattr(export, "EXPORT_BATCH_SIZE", 2)
+
+    chunks = export.iter_csv("reviews", export.export_query("reviews"))
+    first = next(chunks)
+    # A booking committed while the download is paused must not hit "database is locked"
+    with file_engine.begin() as conn:
+        add_review(conn, 5)
+    rows = (first + b"".join(chunks)).decode().splitlines()
+
+    assert rows[0].startswith("id,restaurant_id")
+    assert [row.split(",")[0] for row in rows[1:]] == ["1", "2", "3", "4", "5", "6"]
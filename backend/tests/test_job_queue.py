@@ -0,0 +1,165 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import models
+from app.jobs import queue
+from app.jobs.queue import JobFailed, JobWorker, enqueue, job_handler, retry_delay
+
+
+class InlinePool:
+    """Stands in for the worker's thread pool, running each batch as it is submitted."""
+
+    def submit(self, func, *args):
+        func(*args)
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    # Only the fake handlers registered by each test are dispatched
+    monkeypatch.setattr(queue, "_job_types", {})
+    monkeypatch.setattr(queue.random, "uniform", lambda low, high: 1.0)
+    worker = JobWorker(threads=2)
+    worker._pool = InlinePool()
+    return worker
+
+
+def add_jobs(db, job_type, count, **kwargs):
+    jobs = [enqueue(db, job_type, {"n": n}, **kwargs) for n in range(count)]
+    db.commit()
+    return [job.id for job in jobs]
+
+
+def jobs_by_id(db):
+    db.expire_all()
+    return {job.id: job for job in db.query(models.Job)}
+
+
+def make_due(db):
+    db.query(models.Job).filter(models.Job.status == "queued").update({"run_after": datetime.utcnow()})
+    db.commit()
+
+
+def test_claims_due_jobs_in_batches(db, worker):
+    batches = []
+
+    @job_handler("fake_batch", concurrency=2, batch_size=2)
+    def handler(payloads):
+        batches.append([p["n"] for p in payloads])
+        return [None] * len(payloads)
+
+    add_jobs(db, "fake_batch", 3)
+    later = enqueue(db, "fake_batch", {"n": 99}, delay_seconds=3600)
+    db.commit()
+
+    assert worker.dispatch() == 3
+    assert batches == [[0, 1], [2]]
+    jobs = jobs_by_id(db)
+    assert jobs.pop(later.id).status == "queued"
+    assert {job.status for job in jobs.values()} == {"done"}
+    assert worker.running() == {}
+
+
+def test_claimed_job_is_not_claimed_again(db, worker):
+    @job_handler("fake_once")
+    def handler(payload):
+        pass
+
+    add_jobs(db, "fake_once", 1)
+    spec = queue._job_types["fake_once"]
+
+    assert len(worker._claim(spec, 10)) == 1
+    assert JobWorker()._claim(spec, 10) == []
+    job = next(iter(jobs_by_id(db).values()))
+    assert (job.status, job.attempts, job.locked_at is not None) == ("running", 1, True)
+
+
+def test_failure_is_retried_with_exponential_backoff(db, worker):
+    @job_handler("fake_flaky", max_attempts=5)
+    def handler(payload):
+        raise JobFailed("upstream timeout")
+
+    [job_id] = add_jobs(db, "fake_flaky", 1)
+
+    for attempt in (1, 2):
+        before = datetime.utcnow()
+        worker.dispatch()
+        job = jobs_by_id(db)[job_id]
+        assert (job.status, job.attempts, job.last_error) == ("queued", attempt, "upstream timeout")
+        expected = timedelta(seconds=queue.JOB_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+        assert before + expected <= job.run_after <= datetime.utcnow() + expected
+        # Not due yet: nothing to claim until the backoff has passed
+        assert worker.dispatch() == 0
+        make_due(db)
+
+
+def test_retry_delay_doubles_and_is_capped(worker, monkeypatch):
+    monkeypatch.setattr(queue, "JOB_RETRY_BASE_SECONDS", 5)
+    monkeypatch.setattr(queue, "JOB_RETRY_MAX_SECONDS", 30)
+    assert [retry_delay(n) for n in (1, 2, 3, 4, 5)] == [5, 10, 20, 30, 30]
+
+
+def test_job_is_dead_lettered_after_max_attempts(db, worker):
+    @job_handler("fake_broken", max_attempts=2)
+    def handler(payload):
+        raise ValueError("bad payload")
+
+    [job_id] = add_jobs(db, "fake_broken", 1)
+    worker.dispatch()
+    make_due(db)
+    worker.dispatch()
+
+    job = jobs_by_id(db)[job_id]
+    assert (job.status, job.attempts, job.last_error) == ("failed", 2, "bad payload")
+    assert job.finished_at is not None
+    make_due(db)
+    assert worker.dispatch() == 0
+
+    stats = queue.queue_stats(db)
+    assert stats["counts"] == {"fake_broken": {"failed": 1}}
+    assert stats["recent_failures"][0]["job_id"] == job_id
+
+    # An admin retry gives it a fresh set of attempts
+    assert queue.retry_failed_job(db, job_id)
+    job = jobs_by_id(db)[job_id]
+    assert (job.status, job.attempts) == ("queued", 0)
+
+
+def test_batch_failures_are_per_job(db, worker):
+    @job_handler("fake_partial", batch_size=10)
+    def handler(payloads):
+        return [None if p["n"] % 2 == 0 else f"job {p['n']} rejected" for p in payloads]
+
+    ids = add_jobs(db, "fake_partial", 4)
+    worker.dispatch()
+
+    jobs = jobs_by_id(db)
+    assert [jobs[i].status for i in ids] == ["done", "queued", "done", "queued"]
+    assert jobs[ids[1]].last_error == "job 1 rejected"
+
+
+def test_stale_running_job_is_requeued(db, worker):
+    lost = models.Job(
+        type="fake_lost", payload=json.dumps({}), status="running", attempts=1,
+        locked_at=datetime.utcnow() - timedelta(seconds=queue.JOB_LOCK_TIMEOUT_SECONDS + 60),
+    )
+    busy = models.Job(type="fake_lost", payload=json.dumps({}), status="running", attempts=1, locked_at=datetime.utcnow())
+    db.add_all([lost, busy])
+    db.commit()
+
+    worker._maintenance()
+
+    jobs = jobs_by_id(db)
+    assert (jobs[lost.id].status, jobs[lost.id].locked_at) == ("queued", None)
+    assert jobs[lost.id].last_error == "worker lost while running"
+    assert jobs[busy.id].status == "running"
+
+
+def test_dedupe_key_queues_one_job(db, worker):
+    first = enqueue(db, "fake_dedupe", {}, dedupe_key="reservation:1:confirmation_email")
+    second = enqueue(db, "fake_dedupe", {}, dedupe_key="reservation:1:confirmation_email")
+    db.commit()
+    assert first is second
+    assert json.loads(first.payload)["dedupe_key"] == "reservation:1:confirmation_email"
+    assert db.query(models.Job).count() == 1
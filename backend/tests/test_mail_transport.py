@@ -0,0 +1,67 @@
+import json
+
+from app.utils.mail_transport import OutgoingEmail, SendGridTransport
+
+
+class FakePool:
+    """Records request bodies and answers like SendGrid: 400 for the whole request if any address is invalid."""
+
+    def __init__(self, status: int = None):
+        self.status = status
+        self.requests = []
+        self.delivered = []
+
+    def post(self, body: bytes, headers: dict):
+        payload = json.loads(body)
+        recipients = [p["to"][0]["email"] for p in payload["personalizations"]]
+        self.requests.append(recipients)
+        if self.status:
+            return self.status, b'{"errors": [{"message": "unavailable"}]}'
+        if any(not email.endswith("@example.com") for email in recipients):
+            return 400, b'{"errors": [{"message": "Does not contain a valid address."}]}'
+        self.delivered += recipients
+        return 202, b""
+
+
+def batch(emails):
+    return [
+        OutgoingEmail(
+            to_email=email, subject="Booking confirmed", html=f"<p>{email}</p>",
+            batch_key="confirmation", tagged_html="<p>-email-</p>", substitutions={"-email-": email},
+        )
+        for email in emails
+    ]
+
+
+def transport(pool):
+    sender = SendGridTransport("key", "from@example.com", url="http://sendgrid.invalid/v3/mail/send")
+    sender.pool = pool
+    return sender
+
+
+def test_valid_batch_is_one_request():
+    pool = FakePool()
+    errors = transport(pool).send(batch([f"user{i}@example.com" for i in range(100)]))
+    assert errors == [None] * 100
+    assert len(pool.requests) == 1
+
+
+def test_bad_address_fails_alone():
+    emails = [f"user{i}@example.com" for i in range(100)]
+    emails[37] = "not-an-address"
+    pool = FakePool()
+
+    errors = transport(pool).send(batch(emails))
+
+    assert [i for i, error in enumerate(errors) if error] == [37]
+    assert errors[37].startswith("SendGrid returned 400")
+    # Bisection: far fewer requests than one per message
+    assert len(pool.requests) <= 2 * 7 + 1
+    assert sorted(pool.delivered) == sorted(e for e in emails if e != "not-an-address")
+
+
+def test_whole_batch_failures_are_not_split():
+    pool = FakePool(status=503)
+    errors = transport(pool).send(batch([f"user{i}@example.com" for i in range(10)]))
+    assert all(error.startswith("SendGrid returned 503") for error in errors)
+    assert len(pool.requests) == 1
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.db import models
+from app.jobs import reminders
+from app.jobs.reminders import ReminderScheduler
+
+
+@pytest.fixture
+def scheduler():
+    return ReminderScheduler(offsets_hours=[2])
+
+
+@pytest.fixture
+def add_reservation(db, make_user, make_restaurant):
+    """Factory inserting a reservation starting at `start`, optionally with a given id."""
+    user, _ = make_user("Customer")
+    restaurant = make_restaurant()
+
+    def factory(start: datetime, reservation_id: int = None):
+        reservation = models.Reservation(
+            id=reservation_id, user_id=user.id, restaurant_id=restaurant.id, table_id=restaurant.tables[0].id,
+            date=start.date(), time=start.time(), number_of_people=2,
+        )
+        db.add(reservation)
+        db.commit()
+        return reservation
+    return factory
+
+
+def reminder_keys(db):
+    db.expire_all()
+    return sorted(job.dedupe_key for job in db.query(models.Job).filter(models.Job.type == "booking_reminder_email"))
+
+
+def upcoming_start():
+    # Its 2h reminder falls inside the first slice the scheduler loads
+    return (datetime.now() + timedelta(hours=2, minutes=5)).replace(microsecond=0)
+
+
+def test_due_reminder_is_queued_once(db, scheduler, add_reservation):
+    start = upcoming_start()
+    reservation = add_reservation(start)
+
+    scheduler.poll()
+    assert scheduler.pending() == 1
+    assert scheduler.poll(now=start - timedelta(hours=2)) == 1
+
+    assert reminder_keys(db) == [f"booking:{reservation.booking_ref}:reminder_2h_email"]
+
+
+def test_reused_id_gets_its_own_reminder_only(db, scheduler, add_reservation):
+    start = upcoming_start()
+    cancelled = add_reservation(start)
+    cancelled_id, cancelled_ref = cancelled.id, cancelled.booking_ref
+    scheduler.poll()
+
+    db.delete(cancelled)
+    db.commit()
+    rebooked = add_reservation(start, reservation_id=cancelled_id)
+    scheduler.add(rebooked.id, rebooked.booking_ref, start)
+    assert scheduler.pending() == 2
+
+    # Both entries come due; the cancelled booking's is dropped even though its id still exists
+    assert scheduler.poll(now=start - timedelta(hours=2)) == 2
+    assert reminder_keys(db) == [f"booking:{rebooked.booking_ref}:reminder_2h_email"]
+    assert rebooked.booking_ref != cancelled_ref
+
+
+def test_booking_added_while_its_slice_is_loading_is_kept(db, scheduler, add_reservation, monkeypatch):
+    start = upcoming_start()
+    starts_between = reminders._starts_between
+    booked = []
+
+    def book_during_poll(after, until):
+        # The booking commits after the slice query has run, so only add() can schedule it
+        if not booked:
+            booked.append(True)
+            scheduler.add(999, "late-booking", start)
+        return starts_between(after, until)
+
+    monkeypatch.setattr(reminders, "_starts_between", book_during_poll)
+    scheduler.poll()
+
+    assert scheduler.pending() == 1
@@ -0,0 +1,40 @@
+from datetime import date, time, timedelta
+
+import pytest
+
+from app.db.database import SessionLocal, begin_atomic
+from app.db.reservation_analytics import closed_bucket_cache
+from app.db.reservation_rollups import apply_reservation_change
+
+
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_rollup_change_invalidates_cached_bucket_after_commit(make_restaurant):
+    restaurant_id = make_restaurant().id
+    yesterday = date.today() - timedelta(days=1)
+    key = ("day", None, yesterday.isoformat())
+    closed_bucket_cache.set(key, [{"reservations": 0}])
+
+    # A fresh session, so the SERIALIZABLE option applies to the connection it opens
+    db = SessionLocal()
+    try:
+        begin_atomic(db)
+        apply_reservation_change(db, restaurant_id, yesterday, time(19, 0), 2, cancelled=True)
+        assert db.connection().connection.dbapi_connection.in_transaction
+        assert closed_bucket_cache.get(key) is not None
+
+        db.commit()
+        assert closed_bucket_cache.get(key) is None
+    finally:
+        db.close()
+
+
+def test_restaurant_rename_clears_cache_after_commit(db, make_restaurant):
+    restaurant = make_restaurant()
+    closed_bucket_cache.set(("day", "restaurant", "2025-01-01"), [])
+
+    restaurant.name = "Renamed"
+    db.flush()
+    assert closed_bucket_cache.get(("day", "restaurant", "2025-01-01")) is not None
+
+    db.commit()
+    assert closed_bucket_cache.get(("day", "restaurant", "2025-01-01")) is None
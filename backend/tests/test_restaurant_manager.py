@@ -0,0 +1,51 @@
+import pytest
+
+from app.auth.auth_handler import create_access_token
+from app.db import models
+
+
+@pytest.fixture
+def owned(db, make_restaurant):
+    """A restaurant with one table and one schedule template, plus its manager's headers."""
+    restaurant = make_restaurant()
+    manager = db.get(models.User, restaurant.manager_id)
+    template = models.ScheduleTemplate(restaurant_id=restaurant.id, name="Weekdays", weekly_slots=",".join(["0"] * 7))
+    db.add(template)
+    db.commit()
+    token = create_access_token({"sub": manager.email, "uid": manager.id, "role": manager.role})
+    return restaurant, restaurant.tables[0].id, template.id, {"Authorization": f"Bearer {token}"}
+
+
+def table_and_schedule_edits(restaurant_id, table_id, template_id):
+    return [
+        ("post", f"/manager/restaurants/{restaurant_id}/tables", {"size": 2, "available_times": ["18:00"]}),
+        ("post", f"/manager/restaurants/{restaurant_id}/tables/bulk", {"tables": [{"size": 2, "available_times": ["18:00"]}]}),
+        ("put", f"/manager/tables/{table_id}", {"size": 6}),
+        ("put", f"/manager/restaurants/{restaurant_id}/tables/bulk", {"tables": [{"id": table_id, "size": 6}]}),
+        ("get", f"/manager/restaurants/{restaurant_id}/schedules", None),
+        ("post", f"/manager/restaurants/{restaurant_id}/schedules", {"name": "Weekends", "weekdays": {"sat": ["18:00"]}}),
+        ("put", f"/manager/schedules/{template_id}", {"weekdays": {"mon": ["19:00"]}}),
+        ("put", f"/manager/restaurants/{restaurant_id}", {"name": "Renamed"}),
+    ]
+
+
+def test_other_managers_cannot_edit_tables_or_schedules(client, db, make_user, owned):
+    restaurant, table_id, template_id, _ = owned
+    _, other_headers = make_user("RestaurantManager")
+
+    for method, url, body in table_and_schedule_edits(restaurant.id, table_id, template_id):
+        response = client.request(method, url, json=body, headers=other_headers)
+        assert response.status_code == 403, (method, url)
+
+    db.expire_all()
+    assert [t.size for t in db.query(models.Table)] == [4]
+    assert db.query(models.ScheduleTemplate).count() == 1
+    assert db.get(models.Restaurant, restaurant.id).name == "Test Bistro"
+
+
+def test_owner_can_edit_tables_and_schedules(client, owned):
+    restaurant, table_id, template_id, headers = owned
+
+    for method, url, body in table_and_schedule_edits(restaurant.id, table_id, template_id):
+        response = client.request(method, url, json=body, headers=headers)
+        assert response.status_code == 200, (method, url, response.json())
@@ -0,0 +1,56 @@
+import base64
+import json
+
+from app.db import models
+
+
+def test_review_pages_follow_next_cursor(client, db, make_user, make_restaurant):
+    restaurant = make_restaurant()
+    for n in range(5):
+        author, _ = make_user("Customer")
+        db.add(models.Review(user_id=author.id, restaurant_id=restaurant.id, rating=n % 5 + 1, comment=f"review {n}"))
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/restaurants/{restaurant.id}/reviews", params=params)
+        assert response.status_code == 200
+        seen += [review["review_id"] for review in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen)) == 5
+
+
+def test_summary_counts_every_review(client, make_user, make_restaurant):
+    restaurant = make_restaurant()
+    for rating in (5, 5, 4, 1):
+        _, headers = make_user("Customer")
+        response = client.post(f"/restaurants/{restaurant.id}/reviews", params={"rating": rating}, headers=headers)
+        assert response.status_code == 200
+
+    summary = client.get(f"/restaurants/{restaurant.id}/reviews/summary").json()
+    assert summary["count"] == 4
+    assert summary["mean"] == 3.75
+    assert summary["histogram"] == {"1": 1, "2": 0, "3": 0, "4": 1, "5": 2}
+    assert summary["recent_trend"]["this_month"]["count"] == 4
+
+
+def test_malformed_cursor_is_rejected(client, make_restaurant):
+    restaurant = make_restaurant()
+    for payload in ({"a": 1}, [1], ["2024-01-01T00:00:00", 1, 2], "x", [[], 1], ["not a date", 1]):
+        cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+        response = client.get(f"/restaurants/{restaurant.id}/reviews", params={"cursor": cursor})
+        assert response.status_code == 400, payload
+    assert client.get(f"/restaurants/{restaurant.id}/reviews", params={"cursor": "!!"}).status_code == 400
+
+
+def test_out_of_range_rating_is_rejected(client, make_user, make_restaurant):
+    restaurant = make_restaurant()
+    _, headers = make_user("Customer")
+    for rating in (0, 6, -1):
+        response = client.post(f"/restaurants/{restaurant.id}/reviews", params={"rating": rating}, headers=headers)
+        assert response.status_code == 422
+    assert client.get(f"/restaurants/{restaurant.id}/reviews/summary").json()["count"] == 0
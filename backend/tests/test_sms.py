@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from app.utils import sms_utils
+from app.utils.sms_utils import MemoryTransport, RateLimiter, SmsMessage, send_sms_bulk, set_transport
+
+
+class FakeTransport:
+    """Records when each message reached the transport and fails numbers listed in `failing`."""
+
+    def __init__(self, rate_limited=False, failing=()):
+        self.rate_limited = rate_limited
+        self.failing = set(failing)
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, message: SmsMessage) -> str:
+        if message.to_phone in self.failing:
+            raise RuntimeError(f"Twilio returned 400: invalid number {message.to_phone}")
+        with self._lock:
+            self.sent.append((time.monotonic(), message.to_phone))
+            return f"fake-{len(self.sent)}"
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    """Installs a fake transport for the test and restores the original afterwards."""
+    monkeypatch.setattr(sms_utils, "_transport", None)
+
+    def install(fake):
+        set_transport(fake)
+        return fake
+    return install
+
+
+def messages(count):
+    return [SmsMessage(f"+1555000{n:04d}", f"message {n}") for n in range(count)]
+
+
+def test_set_transport_does_not_build_the_default_transport(transport, monkeypatch):
+    def create_transport(*args):
+        raise AssertionError("default transport should not be created")
+
+    monkeypatch.setattr(sms_utils, "create_transport", create_transport)
+    fake = transport(MemoryTransport())
+
+    assert send_sms_bulk(messages(2)) == [None, None]
+    assert [m.body for m in fake.sent] == ["message 0", "message 1"]
+
+
+def test_rate_limited_transport_is_paced(transport, monkeypatch):
+    monkeypatch.setattr(sms_utils, "sms_rate_limiter", RateLimiter(50))
+    fake = transport(FakeTransport(rate_limited=True))
+
+    start = time.monotonic()
+    assert send_sms_bulk(messages(6)) == [None] * 6
+
+    times = sorted(sent_at for sent_at, _ in fake.sent)
+    assert times[-1] - start >= 5 * 0.02 - 0.005
+    assert all(later - earlier >= 0.02 - 0.005 for earlier, later in zip(times, times[1:]))
+
+
+def test_unlimited_transport_is_not_paced(transport, monkeypatch):
+    monkeypatch.setattr(sms_utils, "sms_rate_limiter", RateLimiter(1))
+    fake = transport(FakeTransport(rate_limited=False))
+
+    start = time.monotonic()
+    send_sms_bulk(messages(5))
+    assert len(fake.sent) == 5
+    assert time.monotonic() - start < 1
+
+
+def test_failures_are_reported_per_message(transport):
+    batch = messages(4)
+    fake = transport(FakeTransport(failing={batch[1].to_phone, batch[3].to_phone}))
+
+    errors = send_sms_bulk(batch)
+
+    assert errors[0] is None and errors[2] is None
+    assert errors[1] == f"Twilio returned 400: invalid number {batch[1].to_phone}"
+    assert errors[3].endswith(batch[3].to_phone)
+    assert sorted(phone for _, phone in fake.sent) == [batch[0].to_phone, batch[2].to_phone]
+
+
+def test_rate_limiter_hands_out_evenly_spaced_slots():
+    limiter = RateLimiter(10)
+    waits = [limiter.reserve() for _ in range(3)]
+    assert waits[0] == pytest.approx(0, abs=0.01)
+    assert waits[1] == pytest.approx(0.1, abs=0.01)
+    assert waits[2] == pytest.approx(0.2, abs=0.01)
+    assert RateLimiter(0).reserve() == 0
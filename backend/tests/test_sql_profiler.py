@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import text
+
+from app.utils.sql_profiler import QueryBudgetExceeded, normalize_statement
+
+
+def test_normalize_statement_groups_literals():
+    assert normalize_statement("SELECT * FROM users WHERE id = 1") == normalize_statement(
+        "SELECT *  FROM users\n WHERE id = 27"
+    )
+    assert normalize_statement("SELECT 1 WHERE id IN (?, ?, ?)") == "SELECT ? WHERE id IN (...)"
+
+
+def test_query_budget_fixture_counts_request_queries(client, admin_headers, query_budget):
+    with query_budget(3) as profile:
+        response = client.get("/admin/restaurants/pending", headers=admin_headers)
+    assert response.status_code == 200
+    assert profile.count >= 1
+
+
+def test_query_budget_fixture_fails_past_budget(db, query_budget):
+    with pytest.raises(QueryBudgetExceeded):
+        with query_budget(1):
+            for _ in range(3):
+                db.execute(text("SELECT 1"))
+
+
+def test_sql_profile_endpoint_requires_admin(client, make_user, admin_headers):
+    assert client.get("/debug/sql-profile").status_code == 403
+    _, customer_headers = make_user("Customer")
+    assert client.get("/debug/sql-profile", headers=customer_headers).status_code == 403
+    assert client.get("/debug/sql-profile", headers=admin_headers).status_code == 200
@@ -0,0 +1,48 @@
+import logging
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+from app.db import models
+from app.db.database import engine
+from app.db.migrations import upgrade_schema
+from app.db.table_schedules import legacy_mask, mask_to_times, snap_to_grid
+
+
+def test_snap_to_grid_moves_off_grid_times_to_the_next_slot():
+    assert snap_to_grid("18:00,19:00") is None
+    assert snap_to_grid("") is None
+    assert snap_to_grid("18:10, 18:15,19:00,7pm") == "18:15,19:00"
+    assert snap_to_grid("23:55") == "23:45"
+
+
+def test_legacy_mask_warns_about_skipped_times(app_logs):
+    # Cached per string, so the warning is logged once per process, not on every availability request
+    legacy_mask.cache_clear()
+    with app_logs.at_level(logging.WARNING, logger="app.db.table_schedules"):
+        assert mask_to_times(legacy_mask("18:00,18:07")) == ["18:00"]
+        assert mask_to_times(legacy_mask("18:00,18:07")) == ["18:00"]
+    assert [r.message for r in app_logs.records if r.name == "app.db.table_schedules"] == ["table time skipped"]
+
+
+def test_upgrade_moves_stored_times_onto_the_grid(db, client, make_user, make_restaurant, book):
+    restaurant = make_restaurant()
+    table = restaurant.tables[0]
+    table.available_times = "18:10,19:00"
+    db.commit()
+
+    # A database from before schedule templates, whose tables predate the grid check
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE old_tables (id INTEGER PRIMARY KEY, restaurant_id INTEGER REFERENCES restaurants (id),"
+            " size INTEGER NOT NULL, available_times VARCHAR)"
+        ))
+        conn.execute(text("INSERT INTO old_tables SELECT id, restaurant_id, size, available_times FROM tables"))
+        conn.execute(text("DROP TABLE tables"))
+        conn.execute(text("ALTER TABLE old_tables RENAME TO tables"))
+    assert ("tables", "schedule_template_id") in upgrade_schema(engine)
+
+    db.expire_all()
+    assert db.get(models.Table, table.id).available_times == "18:15,19:00"
+    _, headers = make_user("Customer")
+    assert book(headers, restaurant, date.today() + timedelta(days=1), at="18:15").status_code == 200
@@ -0,0 +1,52 @@
+from app.auth.user_cache import CachedUser, user_cache
+from app.db import models
+
+
+def cache(user):
+    user_cache.set(user.email, CachedUser.from_model(user))
+
+
+def test_orm_change_invalidates_after_commit_not_at_flush(db, make_user):
+    user, _ = make_user("Customer")
+    cache(user)
+
+    user.full_name = "Renamed"
+    db.flush()
+    assert user_cache.get(user.email) is not None
+
+    db.commit()
+    assert user_cache.get(user.email) is None
+
+
+def test_email_change_invalidates_old_address(db, make_user):
+    user, _ = make_user("Customer", email="old@example.com")
+    cache(user)
+
+    user.email = "new@example.com"
+    db.commit()
+    assert user_cache.get("old@example.com") is None
+
+
+def test_bulk_update_invalidates_named_users_only(db, make_user):
+    first, _ = make_user("Customer")
+    second, _ = make_user("Customer")
+    cache(first)
+    cache(second)
+
+    db.query(models.User).filter(models.User.id == first.id).execution_options(
+        invalidate_users=[first.email]
+    ).update({"full_name": "Bulk"})
+    assert user_cache.get(first.email) is not None
+    db.commit()
+
+    assert user_cache.get(first.email) is None
+    assert user_cache.get(second.email) is not None
+
+
+def test_unnamed_bulk_update_clears_cache(db, make_user):
+    user, _ = make_user("Customer")
+    cache(user)
+
+    db.query(models.User).update({"full_name": "Everyone"})
+    db.commit()
+    assert user_cache.get(user.email) is None
@@ -0,0 +1,48 @@
+import asyncio
+
+from app.routers import users
+
+
+def register(client, email="new@example.com", password="Secret123!"):
+    return client.post("/users/register", json={
+        "email": email, "password": password, "full_name": "New User", "role": "Customer",
+    })
+
+
+def test_register_then_login(client):
+    assert register(client).status_code == 200
+    assert register(client).status_code == 400
+
+    response = client.post("/users/login", json={"email": "new@example.com", "password": "Secret123!"})
+    assert response.status_code == 200
+    assert response.json()["token_type"] == "bearer"
+
+    response = client.post("/users/login", json={"email": "new@example.com", "password": "wrong"})
+    assert response.status_code == 401
+
+
+def test_login_queries_run_off_the_event_loop(client, monkeypatch):
+    register(client)
+    threads = []
+
+    def find_user(db, email):
+        try:
+            asyncio.get_running_loop()
+            threads.append("event loop")
+        except RuntimeError:
+            threads.append("worker thread")
+        return users_find_user(db, email)
+
+    users_find_user = users._find_user
+    monkeypatch.setattr(users, "_find_user", find_user)
+
+    assert client.post("/users/login", json={"email": "new@example.com", "password": "Secret123!"}).status_code == 200
+    assert threads == ["worker thread"]
+
+
+def test_user_lookup_releases_its_connection(client, db):
+    register(client)
+    # Closing in the same threadpool call means a login never waits for a thread
+    # just to hand its connection back while holding it
+    assert users._find_user(db, "new@example.com").email == "new@example.com"
+    assert not db.in_transaction()
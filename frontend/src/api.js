@@ -119,15 +119,30 @@ export const getRestaurantAvailability = async (params) => {
 
 
 
-export const getRestaurantReviews = async (id) => {
-  const res = await fetch(`http://localhost:8000/restaurants/${id}/reviews`);
+// One page of reviews, newest first; pass the returned nextCursor to get the
+// following page (null on the last one)
+export const getRestaurantReviews = async (id, cursor = null) => {
+  const params = new URLSearchParams();
+  if (cursor) params.set('cursor', cursor);
+  const res = await fetch(`http://localhost:8000/restaurants/${id}/reviews?${params}`);
   if (!res.ok) {
     console.error("Failed to fetch reviews:", res.status);
     throw new Error('Failed to fetch reviews');
   }
   const data = await res.json();
   console.log("Fetched reviews:", data);
-  return data;
+  return { reviews: data, nextCursor: res.headers.get('X-Next-Cursor') };
+};
+
+
+// Star histogram, mean and month-over-month trend, precomputed on the server
+export const getReviewSummary = async (id) => {
+    try {
+        const response = await instance.get(`/restaurants/${id}/reviews/summary`);
+        return response.data;
+    } catch (error) {
+        throw error;
+    }
 };
 
 
@@ -349,6 +364,42 @@ export const getMyRestaurants = async () => {
     }
 };
 
+export const getManagerDashboard = async () => {
+    try {
+        const response = await instance.get('/manager/dashboard');
+        return response.data;
+    } catch (error) {
+        throw error;
+    }
+};
+
+// Live booking events (Server-Sent Events). fetch is used instead of
+// EventSource so the auth header can be sent; abort the signal to stop.
+export const followBookingFeed = async (onEvent, signal) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${process.env.REACT_APP_API_BASE}/manager/bookings/feed`, {
+        headers: { Authorization: `Bearer ${token}` },
+        signal,
+    });
+    if (!response.ok) {
+        throw new Error(`Live booking feed unavailable (${response.status})`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) return;
+        buffer += decoder.decode(value, { stream: true });
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop();
+        for (const message of messages) {
+            const data = message.split('\n').find((line) => line.startsWith('data: '));
+            if (data) onEvent(JSON.parse(data.slice(6)));
+        }
+    }
+};
+
 
 // In api.js
 export const createReservation = async (restaurantId, bookingData) => {
@@ -1,8 +1,10 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
-import { getMyRestaurants, getRestaurantById } from '../api';
+import { getManagerDashboard, followBookingFeed } from '../api';
 import './ManagerDashboard.css';
 
+const BASE_API = process.env.REACT_APP_API_BASE || 'http://localhost:8000';
+
 const ManagerDashboard = () => {
   const [myRestaurants, setMyRestaurants] = useState([]);
   const [error, setError] = useState('');
@@ -13,6 +15,33 @@ const ManagerDashboard = () => {
     fetchRestaurants();
   }, []);
 
+  // Refresh counts when bookings change instead of polling
+  useEffect(() => {
+    const controller = new AbortController();
+    let refreshTimer = null;
+    const onEvent = () => {
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(fetchRestaurants, 500);
+    };
+    const follow = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          await followBookingFeed(onEvent, controller.signal);
+        } catch (err) {
+          if (controller.signal.aborted) return;
+        }
+        // Reconnected: catch up on anything missed while disconnected
+        await new Promise((resolve) => setTimeout(resolve, 5000));
+        if (!controller.signal.aborted) fetchRestaurants();
+      }
+    };
+    follow();
+    return () => {
+      controller.abort();
+      clearTimeout(refreshTimer);
+    };
+  }, []);
+
   useEffect(() => {
     if (location.state?.refresh) {
       fetchRestaurants();
@@ -22,25 +51,9 @@ const ManagerDashboard = () => {
 
   const fetchRestaurants = async () => {
     try {
-      const baseList = await getMyRestaurants();
-
-      // Enrich with photo_url using detailed fetch
-      const enriched = await Promise.all(
-        baseList.map(async (r) => {
-          try {
-            const fullDetails = await getRestaurantById(r.id);
-            return {
-              ...r,
-              photo_url: fullDetails.photo_url || null,
-            };
-          } catch (e) {
-            console.error(`Failed to fetch photo for restaurant ${r.id}`, e);
-            return { ...r, photo_url: null };
-          }
-        })
-      );
-
-      setMyRestaurants(enriched);
+      // One request for every location: status, bookings, covers, rating and photo
+      const restaurants = await getManagerDashboard();
+      setMyRestaurants(restaurants);
     } catch (err) {
       setError('❌ Failed to fetch your restaurants.');
     }
@@ -72,9 +85,9 @@ const ManagerDashboard = () => {
               <span className={`status-${r.status}`}>({r.status})</span>
             </h3>
 
-            {r.photo_url && (
+            {r.image && (
               <img
-                src={r.photo_url}
+                src={r.image.startsWith('/') ? `${BASE_API}${r.image}` : r.image}
                 alt={`${r.name} photo`}
                 style={{
                   maxWidth: '100%',
@@ -88,6 +101,9 @@ const ManagerDashboard = () => {
 
             <p><strong>Cuisine:</strong> {r.cuisine}</p>
             <p><strong>City:</strong> {r.city}</p>
+            <p><strong>Bookings today:</strong> {r.bookings_today}</p>
+            <p><strong>Upcoming covers:</strong> {r.upcoming_covers}</p>
+            <p><strong>Rating:</strong> {r.rating} ({r.review_count} reviews)</p>
 
             <button
               className="edit-restaurant-btn"
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { getRestaurantReviews, getRestaurantById } from '../api';
+import { getRestaurantReviews, getRestaurantById, getReviewSummary } from '../api';
 
 const ReviewsPage = () => {
   const { id } = useParams(); // /reviews/:id
@@ -8,7 +8,10 @@ const ReviewsPage = () => {
 
   const [restaurant, setRestaurant] = useState(null);
   const [reviews, setReviews] = useState([]);
+  const [summary, setSummary] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
   useEffect(() => {
@@ -18,13 +21,16 @@ const ReviewsPage = () => {
       try {
         console.log("🔍 Fetching restaurant and reviews for ID:", id);
 
-        const [restaurantData, reviewData] = await Promise.all([
+        const [restaurantData, reviewData, summaryData] = await Promise.all([
           getRestaurantById(id),
-          getRestaurantReviews(id)
+          getRestaurantReviews(id),
+          getReviewSummary(id)
         ]);
 
         setRestaurant(restaurantData);
-        setReviews(reviewData);
+        setSummary(summaryData);
+        setReviews(reviewData.reviews);
+        setNextCursor(reviewData.nextCursor);
 
         console.log("🏠 Restaurant:", restaurantData);
         console.log("📝 Reviews:", reviewData);
@@ -40,6 +46,21 @@ const ReviewsPage = () => {
     if (id) fetchData();
   }, [id]);
 
+  // Reviews are served a page at a time; append the next page on request
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const reviewData = await getRestaurantReviews(id, nextCursor);
+      setReviews((current) => [...current, ...reviewData.reviews]);
+      setNextCursor(reviewData.nextCursor);
+    } catch (err) {
+      console.error("❌ Error fetching more reviews:", err);
+      alert('Failed to load more reviews. Please try again.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return <div style={{ padding: '40px', textAlign: 'center' }}>Loading reviews...</div>;
   }
@@ -69,6 +90,48 @@ const ReviewsPage = () => {
         Reviews for <em>{restaurant?.name || 'Restaurant'}</em>
       </h2>
 
+      {/* Breakdown over all reviews, not just the pages loaded below */}
+      {summary && summary.count > 0 && (
+        <div
+          style={{
+            border: '1px solid #ccc',
+            borderRadius: '8px',
+            padding: '15px',
+            marginBottom: '20px',
+            backgroundColor: '#fdfdfd'
+          }}
+        >
+          <strong style={{ fontSize: '18px' }}>
+            ⭐ {summary.mean} average from {summary.count} review{summary.count === 1 ? '' : 's'}
+          </strong>
+          {[5, 4, 3, 2, 1].map((star) => {
+            const count = summary.histogram[String(star)] || 0;
+            return (
+              <div key={star} style={{ display: 'flex', alignItems: 'center', gap: '10px', marginTop: '8px' }}>
+                <span style={{ width: '30px' }}>{star}★</span>
+                <div style={{ flex: 1, height: '10px', backgroundColor: '#eee', borderRadius: '5px' }}>
+                  <div
+                    style={{
+                      width: `${(count / summary.count) * 100}%`,
+                      height: '100%',
+                      backgroundColor: '#FFD700',
+                      borderRadius: '5px'
+                    }}
+                  />
+                </div>
+                <span style={{ width: '40px', textAlign: 'right', color: '#555' }}>{count}</span>
+              </div>
+            );
+          })}
+          {summary.recent_trend.mean_change !== null && (
+            <small style={{ display: 'block', marginTop: '10px', color: '#555' }}>
+              This month: {summary.recent_trend.this_month.mean} ({summary.recent_trend.mean_change >= 0 ? '+' : ''}
+              {summary.recent_trend.mean_change} vs last month)
+            </small>
+          )}
+        </div>
+      )}
+
       {reviews.length === 0 ? (
         <p>No reviews yet for this restaurant.</p>
       ) : (
@@ -95,6 +158,23 @@ const ReviewsPage = () => {
               </small>
             </div>
           ))}
+          {nextCursor && (
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              style={{
+                alignSelf: 'center',
+                padding: '10px 20px',
+                backgroundColor: '#8B0000',
+                color: 'white',
+                border: 'none',
+                borderRadius: '5px',
+                cursor: loadingMore ? 'default' : 'pointer'
+              }}
+            >
+              {loadingMore ? 'Loading...' : 'Load more reviews'}
+            </button>
+          )}
         </div>
       )}
     </div>